@@ -346,9 +346,69 @@ REDIS_SETTINGS = {
 # Pub-Sub specific settings
 PUBSUB_SETTINGS = {
     'TICK_CHANNEL_PREFIX': 'tick:',
-    'MESSAGE_EXPIRY': 60,
+    'MESSAGE_EXPIRY': 60,                  # Also the TTL of the last-tick snapshot cache
+    'SNAPSHOT_KEY_PREFIX': 'snapshot:',    # snapshot:<channel> holds the last message published
     'MAX_RETRIES': 3,
     'RETRY_DELAY': 1,
+    'TICK_BUFFER_SIZE': 1000,              # Max raw tick batches awaiting publish
+    'TICK_OVERFLOW_POLICY': 'conflate',    # 'conflate' (latest tick per token) or 'drop_oldest'
+}
+
+# Live greeks enrichment in the ticker pipeline (published on greeks:<token>)
+GREEKS_STREAM = {
+    'ENABLED': os.environ.get('GREEKS_STREAM_ENABLED', 'False').lower() == 'true',
+    'THROTTLE_SECONDS': float(os.environ.get('GREEKS_THROTTLE_SECONDS', 1.0)),
+    'UNDERLYING_TOKENS': {
+        'NIFTY': 256265,      # NIFTY 50 index
+        'BANKNIFTY': 260105,  # NIFTY BANK index
+    },
+}
+
+# KiteTicker connection sharding (Kite allows 3 connections of 3000 tokens per API key).
+# Only the run_ticker daemon shards; embedded web workers keep one connection each.
+# All shards of a process share KiteTicker's single reactor thread, so sharding raises
+# the token cap and isolates socket failures but does not parallelise tick decoding
+TICKER_SHARDING = {
+    'MAX_CONNECTIONS': int(os.environ.get('TICKER_MAX_CONNECTIONS', 3)),
+    'MAX_TOKENS_PER_CONNECTION': int(os.environ.get('TICKER_MAX_TOKENS_PER_CONNECTION', 3000)),
+    'BALANCING_POLICY': os.environ.get('TICKER_BALANCING_POLICY', 'least_loaded'),  # or 'fill_first'
+    'FAILOVER_SECONDS': float(os.environ.get('TICKER_FAILOVER_SECONDS', 15)),  # Move tokens off a shard down this long
+}
+
+# Tick history recorder: columnar files under ROOT/<date>/<underlying>/<column>.bin,
+# written only by the run_ticker daemon (one writer per ROOT)
+TICK_RECORDER = {
+    'ENABLED': os.environ.get('TICK_RECORDER_ENABLED', 'False').lower() == 'true',
+    'ROOT': os.environ.get('TICK_RECORDER_ROOT', str(BASE_DIR / 'tick_data')),
+    'FLUSH_SECONDS': float(os.environ.get('TICK_RECORDER_FLUSH_SECONDS', 5)),
+    'MAX_BATCHES': 10000,  # Raw batches held in memory between flushes
+}
+
+# Live OHLCV+OI candles (published on candle:<interval>:<token>), built only by the run_ticker daemon
+CANDLE_STREAM = {
+    'ENABLED': os.environ.get('CANDLE_STREAM_ENABLED', 'False').lower() == 'true',
+    'INTERVALS': ['1s', '1m', '5m', '15m'],
+    'PERSIST_INTERVALS': ['1m', '5m', '15m'],  # Completed bars saved to the Candle table
+    'PUBLISH_INTERVAL': 0.25,                   # Seconds between bar update publishes
+    'FLUSH_SECONDS': 5.0,                       # Seconds between bulk DB writes
+}
+
+# Ticker ingest: 'embedded' runs KiteTicker inside each web worker, 'standalone'
+# sends subscribe intents through Redis to a single `manage.py run_ticker` daemon
+TICKER_INGEST = {
+    'MODE': os.environ.get('TICKER_INGEST_MODE', 'embedded'),
+    'INTENT_QUEUE': 'ticker:intents',
+    'EPOCH_KEY': 'ticker:daemon:epoch',
+    'WORKER_KEY_PREFIX': 'ticker:worker:',
+    'WORKER_TTL_SECONDS': int(os.environ.get('TICKER_WORKER_TTL_SECONDS', 30)),
+}
+
+# Instrument registry: workers memory-map the snapshot a sync writes to
+# SNAPSHOT_PATH and remap when the version in VERSION_KEY changes
+INSTRUMENT_REGISTRY = {
+    'VERSION_KEY': 'instruments:version',
+    'CHECK_SECONDS': 5.0,  # Max staleness of a worker's registry after a sync
+    'SNAPSHOT_PATH': os.environ.get('INSTRUMENT_SNAPSHOT_PATH', str(BASE_DIR / 'instrument_data' / 'instruments.snap')),
 }
 
 # Print startup info
@@ -0,0 +1,228 @@
+# zerodhatrader/benchmarks.py
+import os
+import json
+import glob
+import time
+import platform
+import subprocess
+import numpy as np
+from datetime import date, datetime
+from .calculations import (OptionsCalculator, RiskValidator, VerticalSpreadCalculator,
+                           IronCondorCalculator, ButterflyCalculator, CalendarSpreadCalculator,
+                           DiagonalSpreadCalculator, RatioSpreadCalculator)
+from .synthetic import DEFAULT_UNDERLYINGS, SyntheticMarket, build_instrument_universe
+
+# Trade date the synthetic universe is built for, so every run prices the
+# same chain; must fall inside the trading calendar's holiday data
+BENCHMARK_TRADE_DATE = date(2025, 1, 6)
+
+# Metrics compared against the baseline and the direction that counts as worse
+REGRESSION_METRICS = {
+    'p50_us': 'higher',
+    'ops_per_sec': 'lower',
+}
+
+def _chain_legs(market, underlying, expiry):
+    """Sorted strikes and CE/PE premiums of one expiry of the synthetic chain"""
+    chain = market.chain_arrays()
+    index = market.names.index(underlying)
+    mask = (market.underlying_index == index) & (market.expiries == np.datetime64(expiry, 'D'))
+
+    strikes = np.unique(chain['strike'][mask])
+    premiums = {}
+    for option_type in ('CE', 'PE'):
+        legs = mask & (chain['option_type'] == option_type)
+        order = np.argsort(chain['strike'][legs])
+        premiums[option_type] = chain['price'][legs][order]
+    return strikes.tolist(), {key: value.tolist() for key, value in premiums.items()}
+
+class _TradeDateCalculator(OptionsCalculator):
+    """OptionsCalculator counting days to expiry from a fixed trade date"""
+
+    def __init__(self, trade_date):
+        super().__init__()
+        self.trade_date = trade_date
+
+    def calculate_days_to_expiry(self, expiry_date):
+        return self.trading_calendar.days_to_expiry(expiry_date, today=self.trade_date)
+
+def build_benchmarks(strikes_each_side=100, seed=7, trade_date=BENCHMARK_TRADE_DATE):
+    """
+    Benchmark cases as name -> (function, items per call).
+
+    Single-call cases price one ATM contract or strategy. Chain cases run
+    the batch math over the whole synthetic universe, or evaluate a strategy
+    for every valid strike combination of one NIFTY expiry. Everything is
+    priced as of trade_date, independent of the day the run happens.
+    """
+    rows = build_instrument_universe(trade_date, DEFAULT_UNDERLYINGS, weekly_expiries=4,
+                                     monthly_expiries=3, strikes_each_side=strikes_each_side)
+    market = SyntheticMarket(rows, trade_date, seed=seed)
+    chain = market.chain_arrays()
+
+    calc = _TradeDateCalculator(trade_date)
+    validator = RiskValidator()
+    vertical = VerticalSpreadCalculator(calc, validator)
+    condor = IronCondorCalculator(calc, validator)
+    butterfly = ButterflyCalculator(calc, validator)
+    calendar_calc = CalendarSpreadCalculator(calc, validator)
+    diagonal = DiagonalSpreadCalculator(calc, validator)
+    ratio = RatioSpreadCalculator(calc, validator)
+
+    expiries = sorted({row['expiry'] for row in rows if row['name'] == 'NIFTY' and row['expiry']})
+    near, far = expiries[1], expiries[-1]
+    near_str, far_str = near.isoformat(), far.isoformat()
+    strikes, premiums = _chain_legs(market, 'NIFTY', near)
+    _, far_premiums = _chain_legs(market, 'NIFTY', far)
+    ce, pe, far_ce = premiums['CE'], premiums['PE'], far_premiums['CE']
+
+    spot = float(market.spots[market.names.index('NIFTY')])
+    atm = int(np.argmin(np.abs(np.array(strikes) - spot)))
+    time_to_expiry = calc.calculate_time_to_expiry(calc.calculate_days_to_expiry(near_str))
+    quantity = DEFAULT_UNDERLYINGS['NIFTY']['lot_size']
+    count = len(strikes)
+
+    def bull_call(i):
+        return vertical.calculate_bull_call_spread(spot, strikes[i], strikes[i + 1], near_str,
+                                                   ce[i], ce[i + 1], quantity, 'NIFTY')
+
+    def bear_put(i):
+        return vertical.calculate_bear_put_spread(spot, strikes[i + 1], strikes[i], near_str,
+                                                  pe[i + 1], pe[i], quantity, 'NIFTY')
+
+    def iron_condor(i):
+        return condor.calculate_iron_condor(spot, strikes[i], strikes[i + 1], strikes[i + 2], strikes[i + 3],
+                                            near_str, pe[i], pe[i + 1], ce[i + 2], ce[i + 3], quantity, 'NIFTY')
+
+    def long_butterfly(i):
+        return butterfly.calculate_long_butterfly(spot, strikes[i], strikes[i + 1], strikes[i + 2], near_str,
+                                                  ce[i], ce[i + 1], ce[i + 2], quantity, 'CE', 'NIFTY')
+
+    def calendar_spread(i):
+        return calendar_calc.calculate_calendar_spread(spot, strikes[i], near_str, far_str, ce[i], far_ce[i],
+                                                       quantity, 'CE', 'NIFTY')
+
+    def diagonal_spread(i):
+        return diagonal.calculate_diagonal_spread(spot, strikes[i + 1], strikes[i], near_str, far_str,
+                                                  ce[i + 1], far_ce[i], quantity, 'CE', 'bullish', 'NIFTY')
+
+    def ratio_spread(i):
+        return ratio.calculate_ratio_spread(spot, strikes[i], strikes[i + 1], near_str, ce[i], ce[i + 1],
+                                            quantity, 2 * quantity, 'CE', 'NIFTY')
+
+    strategies = {
+        'vertical.bull_call_spread': (bull_call, 1),
+        'vertical.bear_put_spread': (bear_put, 1),
+        'iron_condor.iron_condor': (iron_condor, 3),
+        'butterfly.long_butterfly': (long_butterfly, 2),
+        'calendar.calendar_spread': (calendar_spread, 0),
+        'diagonal.diagonal_spread': (diagonal_spread, 1),
+        'ratio.ratio_spread': (ratio_spread, 1),
+    }
+
+    atm_strike = strikes[atm]
+    benchmarks = {
+        'options.price.single': (lambda: calc.black_scholes_price(spot, atm_strike, time_to_expiry, 0.13, 'CE'), 1),
+        'options.greeks.single': (lambda: calc.calculate_all_greeks(spot, atm_strike, near_str, 0.13, 'CE'), 1),
+        'options.iv.single': (lambda: calc.calculate_implied_volatility(ce[atm], spot, atm_strike,
+                                                                        time_to_expiry, 'CE'), 1),
+        'options.price_greeks.chain': (lambda: calc.black_scholes_batch(
+            chain['spot'], chain['strike'], chain['time_to_expiry'], chain['volatility'], chain['option_type']
+        ), len(chain['strike'])),
+        'options.iv.chain': (lambda: calc.calculate_implied_volatility_batch(
+            chain['price'], chain['spot'], chain['strike'], chain['time_to_expiry'], chain['option_type']
+        ), len(chain['strike'])),
+    }
+
+    for name, (strategy, extra_strikes) in strategies.items():
+        last = count - extra_strikes
+        benchmarks[f'{name}.single'] = (lambda strategy=strategy: strategy(min(atm, last - 1)), 1)
+        benchmarks[f'{name}.chain'] = (lambda strategy=strategy, last=last: [strategy(i) for i in range(last)], last)
+
+    return benchmarks
+
+def run_benchmark(function, items=1, min_time=1.0, min_runs=5, max_runs=100000, warmup=3):
+    """Time repeated calls and summarize ops/sec and latency percentiles"""
+    for _ in range(warmup):
+        function()
+
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < max_runs:
+        call_started = time.perf_counter_ns()
+        function()
+        durations.append(time.perf_counter_ns() - call_started)
+        if len(durations) >= min_runs and time.perf_counter() - started >= min_time:
+            break
+
+    durations_us = np.array(durations) / 1000.0
+    mean_us = float(durations_us.mean())
+    return {
+        'runs': len(durations),
+        'items': items,
+        'ops_per_sec': 1e6 / mean_us,
+        'items_per_sec': items * 1e6 / mean_us,
+        'mean_us': mean_us,
+        'p50_us': float(np.percentile(durations_us, 50)),
+        'p99_us': float(np.percentile(durations_us, 99)),
+    }
+
+def get_git_commit(path=None):
+    """Short hash of the checked out commit, or None outside a git tree"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=path, capture_output=True,
+                                text=True, timeout=5)
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+def build_report(results, commit=None, trade_date=BENCHMARK_TRADE_DATE):
+    """Result document stored per run"""
+    return {
+        'commit': commit,
+        'trade_date': trade_date.isoformat(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+def save_report(report, results_dir):
+    """Write a run to <results_dir>/<timestamp>-<commit>.json"""
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = datetime.fromisoformat(report['created_at']).strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(results_dir, f"{stamp}-{report['commit'] or 'nocommit'}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+def latest_report_path(results_dir):
+    """Most recent stored run, or None"""
+    paths = sorted(glob.glob(os.path.join(results_dir, '*.json')))
+    return paths[-1] if paths else None
+
+def compare_reports(current, baseline, threshold=0.2):
+    """
+    Regressions of current against baseline as a list of dicts. A metric
+    regresses when it is worse than the baseline by more than threshold
+    (0.2 = 20%). Cases missing from either run are skipped.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline['results'].get(name)
+        if not previous:
+            continue
+        for metric, worse in REGRESSION_METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (worse == 'higher' and change > threshold) or (worse == 'lower' and -change > threshold):
+                regressions.append({'name': name, 'metric': metric, 'baseline': old, 'current': new,
+                                    'change': change})
+    return regressions
@@ -2,9 +2,11 @@
 
 import numpy as np
 from scipy.stats import norm
-from datetime import datetime, timedelta
+from scipy.special import ndtr
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Union
 import math
+from .trading_calendar import TradingCalendar
 
 class OptionsCalculator:
     """
@@ -20,158 +22,199 @@ class OptionsCalculator:
             'BANKNIFTY': 30
         }
         self.tick_size = 0.05
+        self.trading_calendar = TradingCalendar.get_instance()
         
     def calculate_days_to_expiry(self, expiry_date: str) -> float:
-        """Calculate trading days to expiry from current date."""
-        expiry = datetime.strptime(expiry_date, '%Y-%m-%d')
-        current = datetime.now()
-        
-        # Calculate business days (excluding weekends)
-        days = 0
-        current_date = current.date()
-        expiry_date_obj = expiry.date()
-        
-        while current_date < expiry_date_obj:
-            if current_date.weekday() < 5:  # Monday to Friday
-                days += 1
-            current_date += timedelta(days=1)
-            
-        return max(days, 1)  # Minimum 1 day to avoid division by zero
+        """Calculate NSE trading days to expiry from current date (memoized per day and expiry)."""
+        return self.trading_calendar.days_to_expiry(expiry_date)
     
     def calculate_time_to_expiry(self, days_to_expiry: float) -> float:
         """Convert days to expiry to years."""
         return days_to_expiry / self.trading_days_per_year
     
+    def black_scholes_batch(self, spot, strike, time_to_expiry, volatility,
+                            option_type) -> Dict[str, np.ndarray]:
+        """
+        Vectorized Black-Scholes price and Greeks for a whole option chain.
+
+        All inputs may be scalars or NumPy arrays and are broadcast together;
+        option_type holds 'CE'/'PE' strings. d1/d2 are computed once and every
+        output shares them. Prices are not tick-rounded. Theta is per day and
+        vega/rho are per 1% change, matching the scalar methods.
+        """
+        spot, strike, time_to_expiry, volatility = np.broadcast_arrays(
+            *(np.asarray(x, dtype=np.float64) for x in (spot, strike, time_to_expiry, volatility))
+        )
+        is_call = np.char.upper(np.asarray(option_type, dtype=str)) == 'CE'
+        is_call = np.broadcast_to(is_call, spot.shape)
+        
+        # Expired options are priced at intrinsic value; keep the formula
+        # inputs finite for them and overwrite the results afterwards
+        live = time_to_expiry > 0
+        t = np.where(live, time_to_expiry, 1.0)
+        r = self.risk_free_rate
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sqrt_t = np.sqrt(t)
+            vol_sqrt_t = volatility * sqrt_t
+            d1 = (np.log(spot / strike) + (r + 0.5 * volatility ** 2) * t) / vol_sqrt_t
+            d2 = d1 - vol_sqrt_t
+            
+            discounted_strike = strike * np.exp(-r * t)
+            pdf_d1 = np.exp(-0.5 * d1 ** 2) / math.sqrt(2 * math.pi)
+            cdf_d1 = ndtr(d1)
+            cdf_d2 = ndtr(d2)
+            cdf_neg_d1 = ndtr(-d1)
+            cdf_neg_d2 = ndtr(-d2)
+            
+            price = np.where(is_call,
+                             spot * cdf_d1 - discounted_strike * cdf_d2,
+                             discounted_strike * cdf_neg_d2 - spot * cdf_neg_d1)
+            delta = np.where(is_call, cdf_d1, cdf_d1 - 1)
+            gamma = pdf_d1 / (spot * vol_sqrt_t)
+            decay = -spot * pdf_d1 * volatility / (2 * sqrt_t)
+            theta = np.where(is_call,
+                             decay - r * discounted_strike * cdf_d2,
+                             decay + r * discounted_strike * cdf_neg_d2) / self.trading_days_per_year
+            vega = spot * pdf_d1 * sqrt_t / 100
+            rho = np.where(is_call,
+                           discounted_strike * t * cdf_d2,
+                           -discounted_strike * t * cdf_neg_d2) / 100
+        
+        if not live.all():
+            expired = ~live
+            intrinsic = np.where(is_call, np.maximum(spot - strike, 0), np.maximum(strike - spot, 0))
+            expired_delta = np.where(is_call,
+                                     np.where(spot > strike, 1.0, 0.0),
+                                     np.where(spot < strike, -1.0, 0.0))
+            price = np.where(expired, intrinsic, price)
+            delta = np.where(expired, expired_delta, delta)
+            gamma = np.where(expired, 0.0, gamma)
+            theta = np.where(expired, 0.0, theta)
+            vega = np.where(expired, 0.0, vega)
+            rho = np.where(expired, 0.0, rho)
+        
+        return {
+            'price': price,
+            'delta': delta,
+            'gamma': gamma,
+            'theta': theta,
+            'vega': vega,
+            'rho': rho
+        }
+    
     def black_scholes_price(self, spot: float, strike: float, time_to_expiry: float,
                            volatility: float, option_type: str) -> float:
         """
         Calculate option price using Black-Scholes formula.
         NSE-compliant implementation for Indian markets.
         """
-        if time_to_expiry <= 0:
-            # Handle expired options
-            if option_type.upper() == 'CE':
-                return max(spot - strike, 0)
-            else:
-                return max(strike - spot, 0)
-        
-        # Calculate d1 and d2
-        d1 = (np.log(spot / strike) + (self.risk_free_rate + 0.5 * volatility ** 2) * time_to_expiry) / (volatility * np.sqrt(time_to_expiry))
-        d2 = d1 - volatility * np.sqrt(time_to_expiry)
-        
-        if option_type.upper() == 'CE':
-            # Call option
-            price = spot * norm.cdf(d1) - strike * np.exp(-self.risk_free_rate * time_to_expiry) * norm.cdf(d2)
-        else:
-            # Put option
-            price = strike * np.exp(-self.risk_free_rate * time_to_expiry) * norm.cdf(-d2) - spot * norm.cdf(-d1)
+        price = float(self.black_scholes_batch(spot, strike, time_to_expiry, volatility, option_type)['price'])
         
         # Round to nearest tick size
         return round(price / self.tick_size) * self.tick_size
     
-    def calculate_implied_volatility(self, option_price: float, spot: float, strike: float,
-                                   time_to_expiry: float, option_type: str) -> float:
+    def calculate_implied_volatility_batch(self, option_price, spot, strike, time_to_expiry,
+                                           option_type, tolerance: float = 0.0001,
+                                           max_iterations: int = 100) -> Dict[str, np.ndarray]:
         """
-        Calculate implied volatility using Newton-Raphson method.
+        Calculate implied volatility for a whole option chain at once.
+
+        Newton-Raphson on the untick-rounded price, kept inside a per-strike
+        [low, high] volatility bracket that falls back to bisection whenever
+        a Newton step leaves it. Converged strikes are masked out of later
+        iterations. Returns 'iv', 'converged' and 'iterations' arrays.
         """
-        # Initial guess
-        iv = 0.20  # 20% volatility as starting point
-        tolerance = 0.0001
-        max_iterations = 100
-        
-        for i in range(max_iterations):
-            # Calculate theoretical price and vega
-            theoretical_price = self.black_scholes_price(spot, strike, time_to_expiry, iv, option_type)
-            vega = self.calculate_vega(spot, strike, time_to_expiry, iv) / 100  # Vega per 1% change
+        option_price, spot, strike, time_to_expiry = np.broadcast_arrays(
+            *(np.asarray(x, dtype=np.float64) for x in (option_price, spot, strike, time_to_expiry))
+        )
+        option_type = np.broadcast_to(np.asarray(option_type, dtype=str), spot.shape)
+        shape = spot.shape
+        option_price, spot, strike, time_to_expiry = (
+            x.ravel() for x in (option_price, spot, strike, time_to_expiry)
+        )
+        option_type = option_type.ravel()
+        
+        # Between 1% and 500%, the same bounds as the scalar solver used
+        low = np.full(spot.shape, 0.01)
+        high = np.full(spot.shape, 5.0)
+        iv = np.full(spot.shape, 0.20)  # 20% volatility as starting point
+        converged = np.zeros(spot.shape, dtype=bool)
+        iterations = np.zeros(spot.shape, dtype=np.int64)
+        
+        # Expired options have no time value to invert
+        active = np.flatnonzero(time_to_expiry > 0)
+        
+        for _ in range(max_iterations):
+            if active.size == 0:
+                break
             
-            # Check convergence
-            price_diff = option_price - theoretical_price
-            if abs(price_diff) < tolerance:
-                return iv
+            result = self.black_scholes_batch(spot[active], strike[active], time_to_expiry[active],
+                                              iv[active], option_type[active])
+            price_diff = result['price'] - option_price[active]
+            iterations[active] += 1
             
-            # Newton-Raphson update
-            if vega != 0:
-                iv = iv + price_diff / vega
-                # Ensure IV stays within reasonable bounds
-                iv = max(0.01, min(iv, 5.0))  # Between 1% and 500%
-            else:
-                # If vega is zero, use bisection method fallback
-                if theoretical_price > option_price:
-                    iv *= 0.9
-                else:
-                    iv *= 1.1
+            done = np.abs(price_diff) < tolerance
+            converged[active[done]] = True
+            
+            # Price is increasing in volatility, so the sign of the error
+            # tells which side of the root the current guess sits on
+            too_high = price_diff > 0
+            high[active] = np.where(too_high, iv[active], high[active])
+            low[active] = np.where(too_high, low[active], iv[active])
+            
+            vega = result['vega'] * 100  # Vega per unit of volatility
+            with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+                newton = iv[active] - price_diff / vega
+            in_bracket = (vega > 1e-12) & (newton > low[active]) & (newton < high[active])
+            bisection = 0.5 * (low[active] + high[active])
+            next_iv = np.where(in_bracket, newton, bisection)
+            
+            iv[active] = np.where(done, iv[active], next_iv)
+            
+            # Stop once converged or once the bracket has collapsed onto a
+            # bound, which means the price is outside the model's range
+            collapsed = (high[active] - low[active]) < 1e-10
+            active = active[~(done | collapsed)]
         
-        return iv
+        return {
+            'iv': iv.reshape(shape),
+            'converged': converged.reshape(shape),
+            'iterations': iterations.reshape(shape)
+        }
+    
+    def calculate_implied_volatility(self, option_price: float, spot: float, strike: float,
+                                   time_to_expiry: float, option_type: str) -> float:
+        """
+        Calculate implied volatility using Newton-Raphson method.
+        """
+        result = self.calculate_implied_volatility_batch(option_price, spot, strike, time_to_expiry, option_type)
+        return float(result['iv'])
     
     def calculate_delta(self, spot: float, strike: float, time_to_expiry: float,
                        volatility: float, option_type: str) -> float:
         """Calculate option delta."""
-        if time_to_expiry <= 0:
-            # Expired option delta
-            if option_type.upper() == 'CE':
-                return 1.0 if spot > strike else 0.0
-            else:
-                return -1.0 if spot < strike else 0.0
-        
-        d1 = (np.log(spot / strike) + (self.risk_free_rate + 0.5 * volatility ** 2) * time_to_expiry) / (volatility * np.sqrt(time_to_expiry))
-        
-        if option_type.upper() == 'CE':
-            return norm.cdf(d1)
-        else:
-            return norm.cdf(d1) - 1
+        return float(self.black_scholes_batch(spot, strike, time_to_expiry, volatility, option_type)['delta'])
     
     def calculate_gamma(self, spot: float, strike: float, time_to_expiry: float,
                        volatility: float) -> float:
         """Calculate option gamma (same for calls and puts)."""
-        if time_to_expiry <= 0:
-            return 0.0
-        
-        d1 = (np.log(spot / strike) + (self.risk_free_rate + 0.5 * volatility ** 2) * time_to_expiry) / (volatility * np.sqrt(time_to_expiry))
-        
-        return norm.pdf(d1) / (spot * volatility * np.sqrt(time_to_expiry))
+        return float(self.black_scholes_batch(spot, strike, time_to_expiry, volatility, 'CE')['gamma'])
     
     def calculate_theta(self, spot: float, strike: float, time_to_expiry: float,
                        volatility: float, option_type: str) -> float:
         """Calculate option theta (time decay) per day."""
-        if time_to_expiry <= 0:
-            return 0.0
-        
-        d1 = (np.log(spot / strike) + (self.risk_free_rate + 0.5 * volatility ** 2) * time_to_expiry) / (volatility * np.sqrt(time_to_expiry))
-        d2 = d1 - volatility * np.sqrt(time_to_expiry)
-        
-        if option_type.upper() == 'CE':
-            theta = (-spot * norm.pdf(d1) * volatility / (2 * np.sqrt(time_to_expiry)) 
-                    - self.risk_free_rate * strike * np.exp(-self.risk_free_rate * time_to_expiry) * norm.cdf(d2))
-        else:
-            theta = (-spot * norm.pdf(d1) * volatility / (2 * np.sqrt(time_to_expiry)) 
-                    + self.risk_free_rate * strike * np.exp(-self.risk_free_rate * time_to_expiry) * norm.cdf(-d2))
-        
-        # Convert to per day
-        return theta / self.trading_days_per_year
+        return float(self.black_scholes_batch(spot, strike, time_to_expiry, volatility, option_type)['theta'])
     
     def calculate_vega(self, spot: float, strike: float, time_to_expiry: float,
                       volatility: float) -> float:
         """Calculate option vega (same for calls and puts)."""
-        if time_to_expiry <= 0:
-            return 0.0
-        
-        d1 = (np.log(spot / strike) + (self.risk_free_rate + 0.5 * volatility ** 2) * time_to_expiry) / (volatility * np.sqrt(time_to_expiry))
-        
-        return spot * norm.pdf(d1) * np.sqrt(time_to_expiry) / 100  # Per 1% change in volatility
+        return float(self.black_scholes_batch(spot, strike, time_to_expiry, volatility, 'CE')['vega'])
     
     def calculate_rho(self, spot: float, strike: float, time_to_expiry: float,
                      volatility: float, option_type: str) -> float:
         """Calculate option rho."""
-        if time_to_expiry <= 0:
-            return 0.0
-        
-        d1 = (np.log(spot / strike) + (self.risk_free_rate + 0.5 * volatility ** 2) * time_to_expiry) / (volatility * np.sqrt(time_to_expiry))
-        d2 = d1 - volatility * np.sqrt(time_to_expiry)
-        
-        if option_type.upper() == 'CE':
-            return strike * time_to_expiry * np.exp(-self.risk_free_rate * time_to_expiry) * norm.cdf(d2) / 100
-        else:
-            return -strike * time_to_expiry * np.exp(-self.risk_free_rate * time_to_expiry) * norm.cdf(-d2) / 100
+        return float(self.black_scholes_batch(spot, strike, time_to_expiry, volatility, option_type)['rho'])
     
     def calculate_all_greeks(self, spot: float, strike: float, expiry_date: str,
                            volatility: float, option_type: str) -> Dict[str, float]:
@@ -179,13 +222,9 @@ class OptionsCalculator:
         days_to_expiry = self.calculate_days_to_expiry(expiry_date)
         time_to_expiry = self.calculate_time_to_expiry(days_to_expiry)
         
-        return {
-            'delta': self.calculate_delta(spot, strike, time_to_expiry, volatility, option_type),
-            'gamma': self.calculate_gamma(spot, strike, time_to_expiry, volatility),
-            'theta': self.calculate_theta(spot, strike, time_to_expiry, volatility, option_type),
-            'vega': self.calculate_vega(spot, strike, time_to_expiry, volatility),
-            'rho': self.calculate_rho(spot, strike, time_to_expiry, volatility, option_type)
-        }
+        result = self.black_scholes_batch(spot, strike, time_to_expiry, volatility, option_type)
+        
+        return {greek: float(result[greek]) for greek in ('delta', 'gamma', 'theta', 'vega', 'rho')}
 
 
 class RiskValidator:
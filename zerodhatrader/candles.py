@@ -0,0 +1,295 @@
+# zerodhatrader/candles.py
+import logging
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from .models import Candle
+
+logger = logging.getLogger(__name__)
+
+# Kite exchange timestamps are naive IST
+IST = ZoneInfo('Asia/Kolkata')
+
+# Supported bar intervals in seconds
+INTERVAL_SECONDS = {
+    '1s': 1,
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+}
+
+# Bar list layout: [start epoch, open, high, low, close, volume, oi]
+START, OPEN, HIGH, LOW, CLOSE, VOLUME, OI = range(7)
+
+def _tick_epoch(tick, default):
+    """Exchange time of a tick as epoch seconds, or default when absent"""
+    timestamp = tick.get('exchange_timestamp') or tick.get('last_trade_time')
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=IST)
+        return timestamp.timestamp()
+    return default
+
+class CandleAggregator:
+    """
+    Incremental OHLCV+OI bars per token and interval, built from live ticks.
+
+    KiteTickerManager.on_ticks only queues raw batches with submit(). A
+    background thread folds them into the bars with update(), which does
+    constant work per tick and interval, publishes the latest state of every
+    bar touched since the last pass on candle:<interval>:<token> (one
+    pipelined round trip), closes bars whose interval has passed, and bulk
+    upserts completed bars into Candle.
+
+    Volume is the change in the cumulative day volume_traded within the bar;
+    OI is the last OI seen in the bar.
+    """
+
+    def __init__(self, redis_client, build_message, intervals=('1s', '1m', '5m', '15m'),
+                 persist_intervals=('1m', '5m', '15m'), publish_interval=0.25,
+                 flush_seconds=5.0, close_grace_seconds=2.0, max_pending_batches=10000):
+        unknown = [interval for interval in intervals if interval not in INTERVAL_SECONDS]
+        if unknown:
+            raise ValueError(f"Unknown candle intervals: {unknown}")
+
+        self.redis_client = redis_client
+        self.build_message = build_message
+        self.intervals = [(interval, INTERVAL_SECONDS[interval]) for interval in intervals]
+        self.persist_intervals = set(persist_intervals)
+        self.publish_interval = publish_interval
+        self.flush_seconds = flush_seconds
+        self.close_grace_seconds = close_grace_seconds
+        self.max_pending_batches = max_pending_batches
+
+        # Raw tick batches queued by submit() for the worker thread
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+
+        # (interval, token) -> current bar list
+        self.bars = {}
+
+        # (interval, token) -> start of the last closed bar; older ticks are ignored
+        self.closed_starts = {}
+
+        # Token -> last cumulative volume_traded seen
+        self.last_volume = {}
+
+        # Bars touched since the last publish, closed bars to publish and to persist
+        self.dirty = set()
+        self.closed_to_publish = []
+        self.closed_to_persist = []
+
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'ticks_aggregated': 0,
+            'dropped_batches': 0,
+            'bars_closed': 0,
+            'bar_updates_published': 0,
+            'bars_persisted': 0,
+            'last_flush_ms': 0.0,
+            'errors': 0,
+        }
+
+        self.worker_thread = threading.Thread(target=self._run, name='candle-aggregator', daemon=True)
+        self.worker_thread.start()
+
+    def _get_channel_name(self, interval, instrument_token):
+        """Get Redis channel name for bar updates of a token"""
+        return f"candle:{interval}:{instrument_token}"
+
+    def _close_bar(self, key, bar):
+        """Move a finished bar to the publish and persist queues (lock held)"""
+        self.closed_starts[key] = bar[START]
+        self.closed_to_publish.append((key, bar))
+        if key[0] in self.persist_intervals:
+            self.closed_to_persist.append((key, bar))
+        self.dirty.discard(key)
+        self.stats['bars_closed'] += 1
+
+    def submit(self, ticks):
+        """Queue a raw tick batch for the worker thread"""
+        with self._pending_lock:
+            if len(self._pending) >= self.max_pending_batches:
+                self._pending.popleft()
+                self.stats['dropped_batches'] += 1
+            self._pending.append(ticks)
+
+    def drain(self):
+        """Fold every queued batch into the bars"""
+        with self._pending_lock:
+            batches = self._pending
+            self._pending = deque()
+        for ticks in batches:
+            self.update(ticks)
+
+    def update(self, ticks):
+        """Fold a tick batch into the open bars"""
+        now = time.time()
+        with self._lock:
+            for tick in ticks:
+                price = tick.get('last_price')
+                if not price:
+                    continue
+
+                token = tick['instrument_token']
+                epoch = int(_tick_epoch(tick, now))
+
+                volume_delta = 0
+                cumulative_volume = tick.get('volume_traded')
+                if cumulative_volume is not None:
+                    last_volume = self.last_volume.get(token)
+                    if last_volume is not None and cumulative_volume >= last_volume:
+                        volume_delta = cumulative_volume - last_volume
+                    self.last_volume[token] = cumulative_volume
+
+                oi = tick.get('oi')
+
+                for interval, seconds in self.intervals:
+                    key = (interval, token)
+                    start = epoch - epoch % seconds
+                    bar = self.bars.get(key)
+
+                    if bar is None or bar[START] != start:
+                        # Late tick for a bar that is already closed
+                        if start <= self.closed_starts.get(key, -1) or (bar is not None and start < bar[START]):
+                            continue
+                        if bar is not None:
+                            self._close_bar(key, bar)
+                        bar = [start, price, price, price, price, 0, oi or 0]
+                        self.bars[key] = bar
+                    else:
+                        if price > bar[HIGH]:
+                            bar[HIGH] = price
+                        elif price < bar[LOW]:
+                            bar[LOW] = price
+                        bar[CLOSE] = price
+
+                    bar[VOLUME] += volume_delta
+                    if oi is not None:
+                        bar[OI] = oi
+                    self.dirty.add(key)
+
+            self.stats['ticks_aggregated'] += len(ticks)
+
+    def close_stale_bars(self, now=None):
+        """Close bars whose interval ended more than the grace period ago"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for key, bar in list(self.bars.items()):
+                if bar[START] + INTERVAL_SECONDS[key[0]] + self.close_grace_seconds <= now:
+                    del self.bars[key]
+                    self._close_bar(key, bar)
+
+    def _bar_payload(self, key, bar, closed):
+        """Client payload of one bar"""
+        interval, token = key
+        return {
+            'instrument_token': token,
+            'interval': interval,
+            'start': datetime.fromtimestamp(bar[START], IST).strftime('%Y-%m-%d %H:%M:%S'),
+            'open': bar[OPEN],
+            'high': bar[HIGH],
+            'low': bar[LOW],
+            'close': bar[CLOSE],
+            'volume': bar[VOLUME],
+            'oi': bar[OI],
+            'closed': closed,
+        }
+
+    def publish_updates(self):
+        """Publish closed bars and the latest state of bars touched since the last pass"""
+        with self._lock:
+            closed = self.closed_to_publish
+            self.closed_to_publish = []
+            updates = [(key, list(self.bars[key])) for key in self.dirty if key in self.bars]
+            self.dirty = set()
+
+        if not closed and not updates:
+            return
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key, bar in closed:
+            pipe.publish(self._get_channel_name(*key), self.build_message('candle', self._bar_payload(key, bar, True)))
+        for key, bar in updates:
+            pipe.publish(self._get_channel_name(*key), self.build_message('candle', self._bar_payload(key, bar, False)))
+
+        try:
+            pipe.execute()
+            self.stats['bar_updates_published'] += len(closed) + len(updates)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Error publishing {len(closed) + len(updates)} candle updates: {e}")
+
+    def flush(self):
+        """Bulk upsert completed bars into the database"""
+        with self._lock:
+            bars = self.closed_to_persist
+            self.closed_to_persist = []
+
+        if not bars:
+            return
+
+        started = time.perf_counter()
+        candles = [
+            Candle(
+                instrument_token=token,
+                interval=interval,
+                start=datetime.fromtimestamp(bar[START], IST),
+                open=bar[OPEN],
+                high=bar[HIGH],
+                low=bar[LOW],
+                close=bar[CLOSE],
+                volume=bar[VOLUME],
+                oi=bar[OI],
+            )
+            for (interval, token), bar in bars
+        ]
+
+        try:
+            Candle.objects.bulk_create(
+                candles,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['instrument_token', 'interval', 'start'],
+                update_fields=['open', 'high', 'low', 'close', 'volume', 'oi'],
+            )
+            self.stats['bars_persisted'] += len(candles)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Error saving {len(candles)} candles: {e}")
+
+        self.stats['last_flush_ms'] = (time.perf_counter() - started) * 1000
+
+    def get_stats(self):
+        """Snapshot of aggregator counters"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['open_bars'] = len(self.bars)
+            stats['pending_persist'] = len(self.closed_to_persist)
+        stats['pending_batches'] = len(self._pending)
+        return stats
+
+    def _run(self):
+        """Worker thread: publish on a short cadence, close and persist bars less often"""
+        last_sweep = last_flush = time.monotonic()
+        while True:
+            time.sleep(self.publish_interval)
+            try:
+                self.drain()
+
+                now = time.monotonic()
+                if now - last_sweep >= 1.0:
+                    self.close_stale_bars()
+                    last_sweep = now
+
+                self.publish_updates()
+
+                if now - last_flush >= self.flush_seconds:
+                    self.flush()
+                    last_flush = now
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Error in candle aggregator thread: {e}")
@@ -2,29 +2,40 @@
 import json
 import logging
 import asyncio
-import redis
 from channels.generic.websocket import AsyncWebsocketConsumer
 from asgiref.sync import sync_to_async
-from django.conf import settings
-from .ticker import KiteTickerManager, DateTimeEncoder
+from .ticker import TICK_MODES
+from .ticker_intents import get_ticker_backend
+from .fanout import RedisFanoutHub
+from .candles import INTERVAL_SECONDS
 
 logger = logging.getLogger(__name__)
 
 class TickerConsumer(AsyncWebsocketConsumer):
-    """WebSocket consumer for ticker data using Redis pub-sub"""
+    """WebSocket consumer for ticker data fed by the shared Redis fan-out hub"""
     
     # Class variable to track active consumers
     active_consumers = {}
     
+    # Allowed flush cadence for conflation mode
+    MIN_CONFLATION_MS = 50
+    MAX_CONFLATION_MS = 5000
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.consumer_id = None
-        self.subscription_task = None
-        self.is_running = False
-        self.redis_client = None
-        self.pubsub = None
+        self.fanout_hub = None
         self.subscribed_channels = set()
         
+        # Newly subscribed channels that have not had a live message yet
+        self.awaiting_snapshot = set()
+        
+        # Conflation mode: latest message per channel, flushed on a cadence
+        self.conflation_interval = None
+        self.conflated_messages = {}
+        self.conflation_event = asyncio.Event()
+        self.conflation_task = None
+        
     async def connect(self):
         """Handle WebSocket connection"""
         # Get consumer ID
@@ -33,16 +44,12 @@ class TickerConsumer(AsyncWebsocketConsumer):
         # Accept the connection
         await self.accept()
         
-        # Initialize Redis connection for this consumer
-        await self._initialize_redis()
+        # Ticks arrive through the process-wide fan-out hub
+        self.fanout_hub = RedisFanoutHub.get_instance()
         
         # Store consumer instance
         TickerConsumer.active_consumers[self.consumer_id] = self
         
-        # Start Redis subscription task
-        self.is_running = True
-        self.subscription_task = asyncio.create_task(self._handle_redis_subscriptions())
-        
         # Send connection success message
         await self.send(text_data=json.dumps({
             'type': 'connection_established',
@@ -56,22 +63,15 @@ class TickerConsumer(AsyncWebsocketConsumer):
         """Handle WebSocket disconnection"""
         logger.info(f"WebSocket client disconnecting: {self.consumer_id}, code: {close_code}")
         
-        # Stop subscription processing
-        self.is_running = False
+        # Stop receiving messages from the fan-out hub
+        await self._unsubscribe_from_all_redis_channels()
         
-        if self.subscription_task and not self.subscription_task.done():
-            self.subscription_task.cancel()
-            try:
-                await self.subscription_task
-            except asyncio.CancelledError:
-                pass
+        # Stop the conflation flush task, dropping anything still pending
+        await self._stop_conflation(flush=False)
         
         # Unsubscribe from all tokens
         await sync_to_async(self._unsubscribe_all)()
         
-        # Clean up Redis connections
-        await self._cleanup_redis()
-        
         # Remove from active consumers
         if self.consumer_id in TickerConsumer.active_consumers:
             del TickerConsumer.active_consumers[self.consumer_id]
@@ -99,17 +99,51 @@ class TickerConsumer(AsyncWebsocketConsumer):
                 
                 logger.info(f"Subscribe request for tokens: {tokens} from consumer {self.consumer_id}")
                 
+                # Tick mode: ltp, quote or full (market depth)
+                mode = str(data.get('mode', 'full')).lower()
+                if mode not in TICK_MODES:
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': f'Invalid mode: {mode}. Use one of {", ".join(TICK_MODES)}'
+                    }))
+                    return
+                
+                # Optionally also stream live greeks for option tokens
+                include_greeks = bool(data.get('greeks', False))
+                
+                # Optionally also stream live candles, e.g. ["1m", "5m"]
+                candle_intervals = data.get('candles') or []
+                invalid_intervals = [interval for interval in candle_intervals if interval not in INTERVAL_SECONDS]
+                if invalid_intervals:
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': f'Invalid candle intervals: {invalid_intervals}. Use {", ".join(INTERVAL_SECONDS)}'
+                    }))
+                    return
+                
+                # Optional conflation cadence for slow clients (0 disables it)
+                if 'conflation_ms' in data:
+                    error = await self._set_conflation(data['conflation_ms'])
+                    if error:
+                        await self.send(text_data=json.dumps({
+                            'type': 'error',
+                            'message': error
+                        }))
+                        return
+                
                 # Subscribe to tokens both in ticker manager and Redis
-                success = await sync_to_async(self._subscribe_to_tokens)(tokens)
+                success = await sync_to_async(self._subscribe_to_tokens)(tokens, mode)
                 
                 if success:
                     # Subscribe to Redis channels for these tokens
-                    await self._subscribe_to_redis_channels(tokens)
+                    await self._subscribe_to_redis_channels(tokens, include_greeks, candle_intervals)
                 
                 await self.send(text_data=json.dumps({
                     'type': 'subscription_status',
                     'success': success,
                     'tokens': tokens,
+                    'mode': mode,
+                    'conflation_ms': int(self.conflation_interval * 1000) if self.conflation_interval else 0,
                     'message': 'Subscribed to tokens' if success else 'Failed to subscribe to tokens'
                 }))
                 
@@ -147,56 +181,28 @@ class TickerConsumer(AsyncWebsocketConsumer):
                 'message': str(e)
             }))
     
-    async def _initialize_redis(self):
-        """Initialize Redis connection for pub-sub"""
+    async def _subscribe_to_redis_channels(self, tokens, include_greeks=False, candle_intervals=()):
+        """Subscribe to Redis channels for given tokens through the fan-out hub"""
         try:
-            # Get Redis configuration from Django settings
-            redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
-            
-            # Test connection
-            await sync_to_async(self.redis_client.ping)()
-            
-            # Create pubsub instance
-            self.pubsub = self.redis_client.pubsub()
+            channel_names = []
+            for token in tokens:
+                channel_names.append(f"tick:{token}")
+                if include_greeks:
+                    channel_names.append(f"greeks:{token}")
+                for interval in candle_intervals:
+                    channel_names.append(f"candle:{interval}:{token}")
             
-            logger.info(f"Redis pub-sub initialized for consumer {self.consumer_id}")
+            new_channels = [channel_name for channel_name in channel_names
+                            if channel_name not in self.subscribed_channels]
+            self.awaiting_snapshot.update(new_channels)
             
-        except Exception as e:
-            logger.error(f"Failed to initialize Redis for consumer {self.consumer_id}: {e}")
-            # Fallback to localhost
-            try:
-                self.redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-                await sync_to_async(self.redis_client.ping)()
-                self.pubsub = self.redis_client.pubsub()
-                logger.info(f"Redis pub-sub initialized on localhost fallback for consumer {self.consumer_id}")
-            except Exception as fallback_error:
-                logger.error(f"Redis fallback also failed for consumer {self.consumer_id}: {fallback_error}")
-                raise Exception("Could not establish Redis connection for consumer")
-    
-    async def _cleanup_redis(self):
-        """Clean up Redis connections"""
-        try:
-            if self.pubsub:
-                await sync_to_async(self.pubsub.close)()
-            if self.redis_client:
-                await sync_to_async(self.redis_client.close)()
-            logger.info(f"Redis connections cleaned up for consumer {self.consumer_id}")
-        except Exception as e:
-            logger.error(f"Error cleaning up Redis for consumer {self.consumer_id}: {e}")
-    
-    async def _subscribe_to_redis_channels(self, tokens):
-        """Subscribe to Redis channels for given tokens"""
-        try:
-            if not self.pubsub:
-                logger.error("Pubsub not initialized")
-                return
+            await self.fanout_hub.subscribe(self, channel_names)
+            self.subscribed_channels.update(channel_names)
+            logger.debug(f"Subscribed to Redis channels: {channel_names}")
             
-            for token in tokens:
-                channel_name = f"tick:{token}"
-                await sync_to_async(self.pubsub.subscribe)(channel_name)
-                self.subscribed_channels.add(channel_name)
-                logger.debug(f"Subscribed to Redis channel: {channel_name}")
+            # First paint from the last-value cache instead of waiting for the next tick
+            if new_channels:
+                await self._send_snapshots(new_channels)
                 
         except Exception as e:
             logger.error(f"Error subscribing to Redis channels: {e}")
@@ -204,15 +210,19 @@ class TickerConsumer(AsyncWebsocketConsumer):
     async def _unsubscribe_from_redis_channels(self, tokens):
         """Unsubscribe from Redis channels for given tokens"""
         try:
-            if not self.pubsub:
-                return
-                
+            channel_names = []
             for token in tokens:
-                channel_name = f"tick:{token}"
-                if channel_name in self.subscribed_channels:
-                    await sync_to_async(self.pubsub.unsubscribe)(channel_name)
-                    self.subscribed_channels.remove(channel_name)
-                    logger.debug(f"Unsubscribed from Redis channel: {channel_name}")
+                token_channels = [f"tick:{token}", f"greeks:{token}"]
+                token_channels.extend(f"candle:{interval}:{token}" for interval in INTERVAL_SECONDS)
+                for channel_name in token_channels:
+                    if channel_name in self.subscribed_channels:
+                        channel_names.append(channel_name)
+            
+            if channel_names:
+                await self.fanout_hub.unsubscribe(self, channel_names)
+                self.subscribed_channels.difference_update(channel_names)
+                self.awaiting_snapshot.difference_update(channel_names)
+                logger.debug(f"Unsubscribed from Redis channels: {channel_names}")
                     
         except Exception as e:
             logger.error(f"Error unsubscribing from Redis channels: {e}")
@@ -220,65 +230,116 @@ class TickerConsumer(AsyncWebsocketConsumer):
     async def _unsubscribe_from_all_redis_channels(self):
         """Unsubscribe from all Redis channels"""
         try:
-            if not self.pubsub:
+            if not self.fanout_hub or not self.subscribed_channels:
                 return
-                
-            channels_to_unsubscribe = list(self.subscribed_channels)
-            for channel_name in channels_to_unsubscribe:
-                await sync_to_async(self.pubsub.unsubscribe)(channel_name)
-                self.subscribed_channels.remove(channel_name)
-                logger.debug(f"Unsubscribed from Redis channel: {channel_name}")
+            
+            channel_names = list(self.subscribed_channels)
+            await self.fanout_hub.unsubscribe(self, channel_names)
+            self.subscribed_channels.clear()
+            self.awaiting_snapshot.clear()
+            logger.debug(f"Unsubscribed from Redis channels: {channel_names}")
                 
         except Exception as e:
             logger.error(f"Error unsubscribing from all Redis channels: {e}")
     
-    async def _handle_redis_subscriptions(self):
-        """Handle incoming messages from Redis pub-sub"""
-        logger.info(f"Starting Redis subscription handler for consumer {self.consumer_id}")
+    async def _send_snapshots(self, channel_names):
+        """Push cached last messages for channels that have not gone live yet"""
+        try:
+            snapshots = await self.fanout_hub.get_snapshots(channel_names)
+        except Exception as e:
+            logger.error(f"Error reading snapshots for consumer {self.consumer_id}: {e}")
+            return
+        
+        for channel_name in channel_names:
+            # A live message that already arrived is newer than the snapshot
+            if channel_name not in self.awaiting_snapshot:
+                continue
+            self.awaiting_snapshot.discard(channel_name)
+            if channel_name in snapshots:
+                await self.send(text_data=snapshots[channel_name])
+    
+    async def forward_message(self, channel_name, text_data):
+        """Send a message fanned out by the hub to the WebSocket client"""
+        self.awaiting_snapshot.discard(channel_name)
+        
+        if self.conflation_interval:
+            # Keep only the latest message per channel until the next flush
+            self.conflated_messages[channel_name] = text_data
+            self.conflation_event.set()
+            return
+        
+        await self.send(text_data=text_data)
+    
+    async def _set_conflation(self, conflation_ms):
+        """Enable, change or disable conflation; returns an error message if invalid"""
+        try:
+            conflation_ms = int(conflation_ms)
+        except (TypeError, ValueError):
+            return f'Invalid conflation_ms: {conflation_ms}'
+        
+        if conflation_ms == 0:
+            await self._stop_conflation()
+            return None
+        
+        if not self.MIN_CONFLATION_MS <= conflation_ms <= self.MAX_CONFLATION_MS:
+            return (f'conflation_ms must be 0 or between {self.MIN_CONFLATION_MS} '
+                    f'and {self.MAX_CONFLATION_MS}')
+        
+        self.conflation_interval = conflation_ms / 1000
+        if self.conflation_task is None or self.conflation_task.done():
+            self.conflation_task = asyncio.create_task(self._flush_conflated_messages())
+        
+        logger.info(f"Conflation enabled at {conflation_ms} ms for consumer {self.consumer_id}")
+        return None
+    
+    async def _stop_conflation(self, flush=True):
+        """Disable conflation and optionally flush anything still pending"""
+        self.conflation_interval = None
         
-        while self.is_running:
+        if self.conflation_task and not self.conflation_task.done():
+            self.conflation_task.cancel()
             try:
-                if not self.pubsub:
-                    await asyncio.sleep(0.1)
-                    continue
-                
-                # Get message from Redis pub-sub (non-blocking)
-                message = await sync_to_async(self.pubsub.get_message)(timeout=0.05)
-                
-                if message and message['type'] == 'message':
-                    try:
-                        # Parse the tick data
-                        tick_data = json.loads(message['data'])
-                        
-                        # Send tick to WebSocket client
-                        await self.send(text_data=json.dumps({
-                            'type': 'tick',
-                            'data': tick_data
-                        }, cls=DateTimeEncoder))
-                        
-                        logger.debug(f"Forwarded tick from Redis to WebSocket for consumer {self.consumer_id}")
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing Redis message: {e}")
+                await self.conflation_task
+            except asyncio.CancelledError:
+                pass
+        self.conflation_task = None
+        
+        pending, self.conflated_messages = self.conflated_messages, {}
+        self.conflation_event.clear()
+        if not flush:
+            return
+        
+        for text_data in pending.values():
+            try:
+                await self.send(text_data=text_data)
+            except Exception as e:
+                logger.error(f"Error flushing conflated message for consumer {self.consumer_id}: {e}")
+                break
+    
+    async def _flush_conflated_messages(self):
+        """Send the latest message per channel once per conflation interval"""
+        while True:
+            try:
+                # Idle clients wait here instead of waking every interval
+                await self.conflation_event.wait()
+                await asyncio.sleep(self.conflation_interval)
                 
-                # Small sleep to prevent CPU spinning
-                await asyncio.sleep(0.01)  # 10ms interval
+                pending, self.conflated_messages = self.conflated_messages, {}
+                self.conflation_event.clear()
                 
+                for text_data in pending.values():
+                    await self.send(text_data=text_data)
+                    
             except asyncio.CancelledError:
-                # Task was cancelled, exit gracefully
-                logger.info(f"Redis subscription handler cancelled for consumer {self.consumer_id}")
                 break
             except Exception as e:
-                logger.error(f"Error in Redis subscription handler for consumer {self.consumer_id}: {e}")
-                await asyncio.sleep(0.1)  # Prevent cpu spinning on error
-        
-        logger.info(f"Redis subscription handler stopped for consumer {self.consumer_id}")
+                logger.error(f"Error flushing conflated messages for consumer {self.consumer_id}: {e}")
     
-    def _subscribe_to_tokens(self, tokens):
+    def _subscribe_to_tokens(self, tokens, mode='full'):
         """Subscribe to instrument tokens in ticker manager"""
         try:
-            ticker_manager = KiteTickerManager.get_instance()
-            return ticker_manager.subscribe(self.consumer_id, tokens)
+            ticker_manager = get_ticker_backend()
+            return ticker_manager.subscribe(self.consumer_id, tokens, mode)
         except Exception as e:
             logger.error(f"Error subscribing to tokens: {e}")
             return False
@@ -286,7 +347,7 @@ class TickerConsumer(AsyncWebsocketConsumer):
     def _unsubscribe_from_tokens(self, tokens):
         """Unsubscribe from instrument tokens in ticker manager"""
         try:
-            ticker_manager = KiteTickerManager.get_instance()
+            ticker_manager = get_ticker_backend()
             return ticker_manager.unsubscribe(self.consumer_id, tokens)
         except Exception as e:
             logger.error(f"Error unsubscribing from tokens: {e}")
@@ -295,7 +356,7 @@ class TickerConsumer(AsyncWebsocketConsumer):
     def _unsubscribe_all(self):
         """Unsubscribe from all tokens in ticker manager"""
         try:
-            ticker_manager = KiteTickerManager.get_instance()
+            ticker_manager = get_ticker_backend()
             return ticker_manager.unsubscribe(self.consumer_id)
         except Exception as e:
             logger.error(f"Error unsubscribing from all tokens: {e}")
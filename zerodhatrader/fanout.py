@@ -0,0 +1,187 @@
+# zerodhatrader/fanout.py
+import logging
+import asyncio
+from redis import asyncio as aioredis
+from django.conf import settings
+from .snapshots import get_snapshot_key
+
+logger = logging.getLogger(__name__)
+
+class RedisFanoutHub:
+    """
+    Per-process Redis pub-sub hub shared by all WebSocket consumers.
+
+    Holds a single Redis connection and multi-channel subscription for the
+    whole worker and a channel -> local consumers map. Each Redis message is
+    read once per process and fanned out to local sockets in memory. Redis
+    channels are reference counted: subscribed when the first local consumer
+    needs them and unsubscribed when the last one leaves. Messages already
+    carry the final client envelope and are forwarded without re-encoding.
+    """
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get or create the hub for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if cls._instance is None or cls._instance.loop is not loop:
+            if cls._instance is not None:
+                cls._instance._discard()
+            cls._instance = cls(loop)
+        return cls._instance
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.redis_client = None
+        self.pubsub = None
+        self.reader_task = None
+
+        # Channel name -> set of local consumers
+        self.channel_consumers = {}
+
+        # Serializes Redis (un)subscribe commands with the map updates
+        self._lock = asyncio.Lock()
+        self._subscribed_event = asyncio.Event()
+
+    async def _ensure_connected(self):
+        """Create the shared Redis connection and start the reader task"""
+        if self.pubsub is not None:
+            return
+
+        try:
+            redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
+            redis_client = aioredis.from_url(redis_url, decode_responses=True)
+            await redis_client.ping()
+        except Exception as e:
+            logger.error(f"Failed to connect fan-out hub to Redis: {e}")
+            # Fallback to localhost
+            try:
+                redis_client = aioredis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+                await redis_client.ping()
+            except Exception as fallback_error:
+                logger.error(f"Redis fallback also failed for fan-out hub: {fallback_error}")
+                raise Exception("Could not establish Redis connection for fan-out hub")
+
+        self.redis_client = redis_client
+        self.pubsub = redis_client.pubsub()
+        self.reader_task = asyncio.create_task(self._read_messages())
+        logger.info("Redis fan-out hub initialized")
+
+    async def aclose(self):
+        """Stop the reader task and close the Redis connection"""
+        if self.reader_task is not None and self.reader_task is not asyncio.current_task():
+            self.reader_task.cancel()
+            try:
+                await self.reader_task
+            except asyncio.CancelledError:
+                pass
+        await self._close_connection()
+
+    async def _close_connection(self):
+        """Close the pub-sub connection and client, if open"""
+        pubsub, redis_client = self.pubsub, self.redis_client
+        self.pubsub = self.redis_client = self.reader_task = None
+        self.channel_consumers.clear()
+        try:
+            if pubsub is not None:
+                await pubsub.aclose()
+            if redis_client is not None:
+                await redis_client.aclose()
+        except Exception as e:
+            logger.error(f"Error closing fan-out hub Redis connection: {e}")
+
+    def _discard(self):
+        """Release a hub left behind when the process moved to another event loop"""
+        if self.pubsub is None:
+            return  # Never connected, or the reader closed it when asyncio.run() cancelled it
+        if self.loop.is_closed():
+            logger.warning("Fan-out hub Redis connection left open on a closed event loop")
+            return
+        asyncio.run_coroutine_threadsafe(self.aclose(), self.loop)
+
+    async def subscribe(self, consumer, channels):
+        """Register a consumer for channels, subscribing Redis to new ones"""
+        async with self._lock:
+            await self._ensure_connected()
+
+            new_channels = []
+            for channel_name in channels:
+                consumers = self.channel_consumers.setdefault(channel_name, set())
+                if not consumers:
+                    new_channels.append(channel_name)
+                consumers.add(consumer)
+
+            if new_channels:
+                await self.pubsub.subscribe(*new_channels)
+                logger.debug(f"Fan-out hub subscribed to Redis channels: {new_channels}")
+
+            if self.channel_consumers:
+                self._subscribed_event.set()
+
+    async def unsubscribe(self, consumer, channels=None):
+        """Remove a consumer from channels (all if None), dropping unused ones"""
+        async with self._lock:
+            if channels is None:
+                channels = list(self.channel_consumers.keys())
+
+            empty_channels = []
+            for channel_name in channels:
+                consumers = self.channel_consumers.get(channel_name)
+                if not consumers or consumer not in consumers:
+                    continue
+                consumers.discard(consumer)
+                if not consumers:
+                    del self.channel_consumers[channel_name]
+                    empty_channels.append(channel_name)
+
+            if empty_channels and self.pubsub is not None:
+                await self.pubsub.unsubscribe(*empty_channels)
+                logger.debug(f"Fan-out hub unsubscribed from Redis channels: {empty_channels}")
+
+    async def get_snapshots(self, channels):
+        """Last cached message per channel, skipping channels with no fresh snapshot"""
+        async with self._lock:
+            await self._ensure_connected()
+        
+        messages = await self.redis_client.mget([get_snapshot_key(channel_name) for channel_name in channels])
+        return {channel_name: message for channel_name, message in zip(channels, messages) if message}
+    
+    async def _read_messages(self):
+        """Read each Redis message once and fan it out to local consumers"""
+        logger.info("Starting Redis fan-out hub reader")
+
+        while True:
+            try:
+                # Wait without polling until some channel is subscribed
+                if not self.pubsub.subscribed:
+                    self._subscribed_event.clear()
+                    await self._subscribed_event.wait()
+                    continue
+
+                # listen() returns once every channel is unsubscribed
+                async for message in self.pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+
+                    consumers = self.channel_consumers.get(message['channel'])
+                    if not consumers:
+                        continue
+
+                    # Publishers emit the final client envelope, so it is forwarded unchanged
+                    text_data = message['data']
+
+                    for consumer in tuple(consumers):
+                        try:
+                            await consumer.forward_message(message['channel'], text_data)
+                        except Exception as e:
+                            logger.error(f"Error forwarding message to consumer {consumer.consumer_id}: {e}")
+
+            except asyncio.CancelledError:
+                logger.info("Redis fan-out hub reader cancelled")
+                # Also reached when asyncio.run() shuts the loop down; do not leak the connection
+                if self.reader_task is asyncio.current_task():
+                    await self._close_connection()
+                break
+            except Exception as e:
+                logger.error(f"Error in Redis fan-out hub reader: {e}")
+                await asyncio.sleep(0.1)  # Prevent cpu spinning on error
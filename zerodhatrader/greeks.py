@@ -0,0 +1,146 @@
+# zerodhatrader/greeks.py
+import logging
+import time
+import threading
+import numpy as np
+from datetime import date
+from .calculations import OptionsCalculator
+from .models import Instrument
+
+logger = logging.getLogger(__name__)
+
+class GreeksEnricher:
+    """
+    Computes IV and Greeks for option ticks inside the ticker pipeline.
+
+    Keeps the latest spot per underlying index and, for each batch of option
+    ticks, prices every eligible token in one vectorized pass. Each token is
+    throttled to at most one computation per throttle interval so CPU cost
+    stays bounded during market open bursts.
+    """
+
+    def __init__(self, underlying_tokens, throttle_seconds=1.0, options_calculator=None):
+        # underlying name (e.g. 'NIFTY') -> index instrument token
+        self.underlying_tokens = {name: int(token) for name, token in underlying_tokens.items()}
+        self.underlying_by_token = {token: name for name, token in self.underlying_tokens.items()}
+        self.throttle_seconds = throttle_seconds
+        self.calc = options_calculator or OptionsCalculator()
+
+        # Latest spot per underlying name
+        self.spots = {}
+
+        # Option token -> (underlying, strike, expiry 'YYYY-MM-DD', option type)
+        self.options = {}
+
+        # Option token -> monotonic time of the last computation
+        self.last_computed = {}
+
+        # Expiry -> years to expiry, valid for self._expiry_cache_date only
+        self._expiry_cache = {}
+        self._expiry_cache_date = None
+
+        self._lock = threading.Lock()
+
+    def register_tokens(self, instrument_tokens):
+        """Load option metadata for tokens not seen before (runs a DB query)"""
+        tokens = [int(token) for token in instrument_tokens]
+        with self._lock:
+            new_tokens = [token for token in tokens
+                          if token not in self.options and token not in self.underlying_by_token]
+        if not new_tokens:
+            return
+
+        rows = Instrument.objects.filter(
+            instrument_token__in=new_tokens,
+            segment='NFO-OPT',
+            underlying__in=list(self.underlying_tokens.keys())
+        ).values_list('instrument_token', 'underlying', 'strike', 'expiry', 'instrument_type')
+
+        with self._lock:
+            for token, name, strike, expiry, instrument_type in rows:
+                if strike is None or expiry is None:
+                    continue
+                self.options[token] = (name, float(strike), expiry.isoformat(), instrument_type)
+
+        logger.debug(f"Registered {len(rows)} option tokens for greeks enrichment")
+
+    def get_underlying_tokens(self):
+        """Index tokens that must stay subscribed for spot updates"""
+        return list(self.underlying_by_token.keys())
+
+    def _get_time_to_expiry(self, expiry):
+        """Years to expiry, cached per expiry for the current day"""
+        today = date.today()
+        if self._expiry_cache_date != today:
+            self._expiry_cache = {}
+            self._expiry_cache_date = today
+
+        if expiry not in self._expiry_cache:
+            days_to_expiry = self.calc.calculate_days_to_expiry(expiry)
+            self._expiry_cache[expiry] = self.calc.calculate_time_to_expiry(days_to_expiry)
+        return self._expiry_cache[expiry]
+
+    def process(self, ticks):
+        """
+        Update spots from index ticks and compute Greeks for option ticks.
+        Returns a list of (instrument_token, payload) pairs to publish.
+        """
+        now = time.monotonic()
+        eligible = []
+
+        with self._lock:
+            # Update spots first so options in the same batch see them
+            for tick in ticks:
+                underlying = self.underlying_by_token.get(tick.get('instrument_token'))
+                if underlying is not None and tick.get('last_price'):
+                    self.spots[underlying] = float(tick['last_price'])
+
+            for tick in ticks:
+                token = tick.get('instrument_token')
+                option = self.options.get(token)
+                if option is None or not tick.get('last_price'):
+                    continue
+                if option[0] not in self.spots:
+                    continue
+                if now - self.last_computed.get(token, float('-inf')) < self.throttle_seconds:
+                    continue
+
+                self.last_computed[token] = now
+                eligible.append((tick, option))
+
+            spots = dict(self.spots)
+
+        if not eligible:
+            return []
+
+        option_price = np.array([float(tick['last_price']) for tick, _ in eligible])
+        spot = np.array([spots[option[0]] for _, option in eligible])
+        strike = np.array([option[1] for _, option in eligible])
+        time_to_expiry = np.array([self._get_time_to_expiry(option[2]) for _, option in eligible])
+        option_type = np.array([option[3] for _, option in eligible])
+
+        iv_result = self.calc.calculate_implied_volatility_batch(option_price, spot, strike,
+                                                                 time_to_expiry, option_type)
+        greeks = self.calc.black_scholes_batch(spot, strike, time_to_expiry, iv_result['iv'], option_type)
+
+        enriched = []
+        for i, (tick, option) in enumerate(eligible):
+            token = tick['instrument_token']
+            enriched.append((token, {
+                'instrument_token': token,
+                'underlying': option[0],
+                'spot': float(spot[i]),
+                'strike': option[1],
+                'expiry': option[2],
+                'option_type': option[3],
+                'last_price': float(option_price[i]),
+                'iv': float(iv_result['iv'][i]),
+                'iv_converged': bool(iv_result['converged'][i]),
+                'delta': float(greeks['delta'][i]),
+                'gamma': float(greeks['gamma'][i]),
+                'theta': float(greeks['theta'][i]),
+                'vega': float(greeks['vega'][i]),
+                'timestamp': tick.get('exchange_timestamp') or tick.get('timestamp')
+            }))
+
+        return enriched
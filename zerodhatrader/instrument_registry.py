@@ -0,0 +1,331 @@
+# zerodhatrader/instrument_registry.py
+import logging
+import threading
+import time
+import numpy as np
+import redis
+from datetime import date
+from django.conf import settings
+from .models import Instrument
+from .instrument_snapshot import LabelTable, build_snapshot_arrays, read_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Categorical text columns are stored as codes into a shared label table
+LABEL_FIELDS = ('name', 'instrument_type', 'segment', 'exchange', 'underlying')
+
+OPTION_TYPES = ('CE', 'PE')
+
+_redis_client = None
+
+def _get_settings():
+    defaults = {
+        'VERSION_KEY': 'instruments:version',
+        'CHECK_SECONDS': 5.0,
+        'SNAPSHOT_PATH': str(settings.BASE_DIR / 'instrument_data' / 'instruments.snap'),
+    }
+    return {**defaults, **getattr(settings, 'INSTRUMENT_REGISTRY', {})}
+
+def _get_redis_client():
+    """Lazily created sync Redis client for the master version counter"""
+    global _redis_client
+    if _redis_client is None:
+        redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
+        _redis_client = redis.from_url(redis_url, decode_responses=True)
+    return _redis_client
+
+def registry_dtype(symbol_width):
+    """Row layout of the registry array; tradingsymbol is fixed-width ASCII"""
+    return np.dtype([
+        ('instrument_token', '<i8'),
+        ('exchange_token', '<i4'),
+        ('tradingsymbol', f'S{symbol_width}'),
+        ('last_price', '<f8'),
+        ('expiry', '<M8[D]'),
+        ('strike', '<f8'),
+        ('tick_size', '<f8'),
+        ('lot_size', '<i4'),
+        ('name', '<u4'),
+        ('instrument_type', '<u4'),
+        ('segment', '<u4'),
+        ('exchange', '<u4'),
+        ('underlying', '<u4'),
+    ])
+
+def build_registry_arrays():
+    """
+    Read the Instrument table once into (rows, labels): a structured array
+    sorted by instrument_token and the sorted label list its text codes index.
+    """
+    fields = ('instrument_token', 'exchange_token', 'tradingsymbol', 'last_price', 'expiry', 'strike',
+              'tick_size', 'lot_size') + LABEL_FIELDS
+    columns = dict(zip(fields, zip(*Instrument.objects.order_by('instrument_token').values_list(*fields)
+                                                      .iterator(chunk_size=10000))))
+    count = len(columns.get('instrument_token', ()))
+
+    symbols = [symbol.encode('ascii', 'replace') for symbol in columns.get('tradingsymbol', ())]
+    rows = np.zeros(count, dtype=registry_dtype(max(map(len, symbols), default=1)))
+    if not count:
+        return rows, ['']
+
+    rows['instrument_token'] = columns['instrument_token']
+    rows['exchange_token'] = [value or 0 for value in columns['exchange_token']]
+    rows['tradingsymbol'] = symbols
+    for field in ('last_price', 'strike', 'tick_size'):
+        rows[field] = [float(value or 0) for value in columns[field]]
+    rows['expiry'] = np.array(columns['expiry'], dtype='datetime64[D]')
+    rows['lot_size'] = [value or 0 for value in columns['lot_size']]
+
+    # One sorted label table shared by every text column
+    values = {field: [value or '' for value in columns[field]] for field in LABEL_FIELDS}
+    labels = sorted(set().union(*values.values()))
+    codes = {label: code for code, label in enumerate(labels)}
+    for field in LABEL_FIELDS:
+        rows[field] = [codes[value] for value in values[field]]
+    return rows, labels
+
+def new_version():
+    """Unique, increasing snapshot version"""
+    return str(time.time_ns())
+
+class InstrumentRegistry:
+    """
+    Process-wide, read-only view of the instrument master for hot paths.
+
+    Rows live in one NumPy structured array sorted by token, with repeated
+    text stored once in a sorted label table. Token and EXCHANGE:symbol
+    lookups binary-search contiguous key arrays; (underlying, expiry) maps
+    to sorted strikes with aligned CE/PE tokens. None of them touch the
+    database.
+
+    The arrays come from a snapshot file that every worker on the host maps
+    read-only (see instrument_snapshot), so the page cache holds one copy.
+    A sync writes a new snapshot, renames it into place and publishes its
+    version in Redis. get_instance() checks that version at most every
+    CHECK_SECONDS and remaps the file when it changed.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+    _checked_at = 0.0
+
+    @classmethod
+    def get_instance(cls):
+        """Current registry, remapped if the instrument master changed"""
+        now = time.monotonic()
+        if cls._instance is not None and now - cls._checked_at < _get_settings()['CHECK_SECONDS']:
+            return cls._instance
+
+        with cls._lock:
+            if cls._instance is not None and now - cls._checked_at < _get_settings()['CHECK_SECONDS']:
+                return cls._instance
+            cls._checked_at = now
+
+            version = cls._get_master_version()
+            if cls._instance is None or (version and version != cls._instance.version):
+                cls._instance = cls._load(version)
+        return cls._instance
+
+    @classmethod
+    def _get_master_version(cls):
+        """Published snapshot version, '' before the first publish, or None when Redis is down"""
+        try:
+            return _get_redis_client().get(_get_settings()['VERSION_KEY']) or ''
+        except Exception as e:
+            logger.error(f"Error reading instrument master version: {e}")
+            return None
+
+    @classmethod
+    def _load(cls, version):
+        """
+        Map the local snapshot if it is at version (any version when none is
+        published), otherwise rebuild it from the database first. Rebuilds
+        happen on hosts that do not share the syncing host's snapshot file.
+        """
+        path = _get_settings()['SNAPSHOT_PATH']
+        try:
+            registry = cls.from_snapshot(path)
+        except Exception as e:
+            logger.error(f"Error reading instrument snapshot {path}: {e}")
+            registry = None
+
+        if registry is None or (version and registry.version != version):
+            registry = cls._rebuild(path, version or new_version())
+        logger.info(f"Instrument registry loaded {len(registry)} instruments (version {registry.version})")
+        return registry
+
+    @classmethod
+    def _rebuild(cls, path, version):
+        """
+        Build the arrays from the database and map them through a new
+        snapshot at path. When the snapshot cannot be written the registry
+        is kept in this process's memory instead.
+        """
+        arrays = build_snapshot_arrays(*build_registry_arrays())
+        try:
+            write_snapshot(path, arrays, version)
+            return cls.from_snapshot(path)
+        except Exception as e:
+            logger.error(f"Error writing instrument snapshot {path}, keeping the registry in memory: {e}")
+            return cls(arrays, version)
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """Registry over a memory-mapped snapshot file, or None if there is none"""
+        snapshot = read_snapshot(path)
+        if snapshot is None:
+            return None
+        version, arrays = snapshot
+        return cls(arrays, version)
+
+    @classmethod
+    def notify_changed(cls):
+        """
+        Write a new snapshot from the database and publish its version so
+        every process remaps it; call after a sync commits.
+        """
+        version = new_version()
+        try:
+            registry = cls._rebuild(_get_settings()['SNAPSHOT_PATH'], version)
+        except Exception as e:
+            logger.error(f"Error rebuilding instrument registry: {e}")
+            registry = None
+
+        with cls._lock:
+            cls._instance = registry
+            cls._checked_at = time.monotonic()
+
+        # Published even without a local snapshot so other processes reload
+        try:
+            _get_redis_client().set(_get_settings()['VERSION_KEY'], version)
+        except Exception as e:
+            logger.error(f"Error publishing instrument master version: {e}")
+
+    def __init__(self, arrays, version=None):
+        self.arrays = arrays
+        self.rows = arrays['rows']
+        self.tokens = arrays['tokens']
+        self.symbol_keys = arrays['symbol_keys']
+        self.symbol_rows = arrays['symbol_rows']
+        self.labels = LabelTable(arrays['label_offsets'], arrays['label_data'])
+        self.version = version
+
+        self._option_type_codes = {}
+        for option_type in OPTION_TYPES:
+            code = self.labels.index(option_type)
+            if code is not None:
+                self._option_type_codes[code] = option_type
+        self.chains = self._build_chains()
+
+    def _build_chains(self):
+        """(underlying, expiry) -> {'strikes', 'CE', 'PE'} with tokens aligned to strikes (-1 if absent)"""
+        rows = self.rows
+        is_option = np.isin(rows['instrument_type'], list(self._option_type_codes)) & ~np.isnat(rows['expiry'])
+        option_rows = np.flatnonzero(is_option)
+        order = option_rows[np.lexsort((rows['strike'][option_rows], rows['expiry'][option_rows],
+                                        rows['underlying'][option_rows]))]
+
+        keys = np.stack([rows['underlying'][order].astype(np.int64),
+                         rows['expiry'][order].astype(np.int64)], axis=1)
+        boundaries = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+
+        chains = {}
+        for group in np.split(order, boundaries) if len(order) else []:
+            strikes, positions = np.unique(rows['strike'][group], return_inverse=True)
+            chain = {'strikes': strikes}
+            for code, option_type in self._option_type_codes.items():
+                tokens = np.full(len(strikes), -1, dtype=np.int64)
+                mask = rows['instrument_type'][group] == code
+                tokens[positions[mask]] = rows['instrument_token'][group][mask]
+                chain[option_type] = tokens
+
+            first = group[0]
+            key = (self.labels[rows['underlying'][first]], rows['expiry'][first].astype(object))
+            chains[key] = chain
+        return chains
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _row_dict(self, i):
+        """One row as plain Python values, in the InstrumentsView JSON shape"""
+        (token, exchange_token, tradingsymbol, last_price, expiry, strike, tick_size, lot_size,
+         name, instrument_type, segment, exchange, underlying) = self.rows[i].tolist()
+        labels = self.labels
+        return {
+            'instrument_token': token,
+            'exchange_token': exchange_token,
+            'tradingsymbol': tradingsymbol.decode(),
+            'name': labels[name],
+            'last_price': last_price or None,
+            'expiry': expiry.isoformat() if expiry else None,
+            'strike': strike or None,
+            'tick_size': tick_size or None,
+            'lot_size': lot_size,
+            'instrument_type': labels[instrument_type],
+            'segment': labels[segment],
+            'exchange': labels[exchange],
+            'underlying': labels[underlying],
+        }
+
+    def _find(self, keys, key):
+        """Position of key in a sorted key array, or None"""
+        i = int(np.searchsorted(keys, key))
+        return i if i < len(keys) and keys[i] == key else None
+
+    def get(self, instrument_token):
+        """Row dict of a token, or None"""
+        i = self._find(self.tokens, int(instrument_token))
+        return None if i is None else self._row_dict(i)
+
+    def get_token(self, tradingsymbol, exchange='NFO'):
+        """Token of EXCHANGE:tradingsymbol, or None"""
+        i = self._find(self.symbol_keys, f"{exchange}:{tradingsymbol}".encode())
+        return None if i is None else int(self.tokens[self.symbol_rows[i]])
+
+    def get_expiries(self, underlying):
+        """Sorted option expiries of an underlying"""
+        return sorted(expiry for name, expiry in self.chains if name == underlying)
+
+    def get_chain(self, underlying, expiry):
+        """Sorted strikes and aligned CE/PE token arrays, or None; expiry may be a date or 'YYYY-MM-DD'"""
+        if isinstance(expiry, str):
+            expiry = date.fromisoformat(expiry[:10])
+        return self.chains.get((underlying, expiry))
+
+    def get_strikes(self, underlying, expiry):
+        """Sorted strike array of one expiry (empty when unknown)"""
+        chain = self.get_chain(underlying, expiry)
+        return chain['strikes'] if chain else np.empty(0)
+
+    def get_options(self, underlying, expiry=None, strikes=None):
+        """Option row dicts of an underlying, optionally for one expiry and a set of strikes"""
+        expiries = [expiry] if expiry else self.get_expiries(underlying)
+        wanted = None if strikes is None else {float(strike) for strike in strikes}
+
+        results = []
+        for chain_expiry in expiries:
+            chain = self.get_chain(underlying, chain_expiry)
+            if not chain:
+                continue
+            for position, strike in enumerate(chain['strikes'].tolist()):
+                if wanted is not None and strike not in wanted:
+                    continue
+                for option_type in OPTION_TYPES:
+                    if option_type in chain and chain[option_type][position] >= 0:
+                        results.append(self.get(int(chain[option_type][position])))
+        return results
+
+    def all(self):
+        """Every row dict, in token order"""
+        return [self._row_dict(i) for i in range(len(self.rows))]
+
+    def get_stats(self):
+        """Size of the registry arrays"""
+        return {
+            'version': self.version,
+            'instruments': len(self.rows),
+            'chains': len(self.chains),
+            'array_bytes': int(self.rows.nbytes),
+            'snapshot_bytes': sum(int(array.nbytes) for array in self.arrays.values()),
+        }
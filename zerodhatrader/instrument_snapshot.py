@@ -0,0 +1,144 @@
+# zerodhatrader/instrument_snapshot.py
+import bisect
+import json
+import os
+import struct
+import numpy as np
+from datetime import datetime
+from functools import lru_cache
+from numpy.lib.format import descr_to_dtype, dtype_to_descr
+
+SNAPSHOT_MAGIC = b'TPINSTR1'
+
+# Each section starts on this boundary so the mapped arrays are aligned
+SECTION_ALIGN = 64
+
+# Arrays of a snapshot, in file order
+SECTIONS = ('rows', 'tokens', 'symbol_keys', 'symbol_rows', 'label_offsets', 'label_data')
+
+def _aligned(position):
+    return -(-position // SECTION_ALIGN) * SECTION_ALIGN
+
+class LabelTable:
+    """
+    Sorted, interned strings stored as one UTF-8 blob plus an offset table.
+    Strings are decoded on access, so the table can stay memory-mapped.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+        self._decode = lru_cache(maxsize=4096)(self._decode_label)
+
+    @staticmethod
+    def build(strings):
+        """(offsets, data) arrays for a sorted list of strings"""
+        encoded = [string.encode() for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        return offsets, np.frombuffer(b''.join(encoded), dtype='u1')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _decode_label(self, code):
+        return self.data[self.offsets[code]:self.offsets[code + 1]].tobytes().decode()
+
+    def __getitem__(self, code):
+        return self._decode(int(code))
+
+    def index(self, value):
+        """Code of value, or None"""
+        code = bisect.bisect_left(self, value)
+        return code if code < len(self) and self[code] == value else None
+
+def build_snapshot_arrays(rows, labels):
+    """
+    Snapshot sections for registry rows sorted by token and their sorted
+    label list: the rows themselves, a contiguous token column, sorted
+    EXCHANGE:tradingsymbol keys with their row numbers, and the label table.
+    """
+    label_bytes = np.array([label.encode() for label in labels] or [b''])
+    keys = np.char.add(np.char.add(label_bytes[rows['exchange']], b':'), rows['tradingsymbol'])
+    order = np.argsort(keys, kind='stable')
+    label_offsets, label_data = LabelTable.build(labels)
+    return {
+        'rows': rows,
+        'tokens': np.ascontiguousarray(rows['instrument_token']),
+        'symbol_keys': keys[order],
+        'symbol_rows': order.astype('<i4'),
+        'label_offsets': label_offsets,
+        'label_data': label_data,
+    }
+
+def write_snapshot(path, arrays, version):
+    """
+    Write the arrays as a versioned snapshot file and atomically rename it
+    over path. Processes that still map the previous file keep reading it
+    until they remap.
+    """
+    sections = {}
+    position = 0
+    for name in SECTIONS:
+        position = _aligned(position)
+        array = arrays[name]
+        sections[name] = {'offset': position, 'dtype': dtype_to_descr(array.dtype), 'shape': list(array.shape)}
+        position += array.nbytes
+
+    header = json.dumps({
+        'version': version,
+        'created_at': datetime.now().isoformat(),
+        'sections': sections,
+    }).encode()
+    data_start = _aligned(len(SNAPSHOT_MAGIC) + 4 + len(header))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{version}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC + struct.pack('<I', len(header)) + header)
+            for name in SECTIONS:
+                f.seek(data_start + sections[name]['offset'])
+                f.write(np.ascontiguousarray(arrays[name]).tobytes())
+            f.truncate(data_start + position)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def read_snapshot(path):
+    """
+    Memory-map a snapshot read-only. Returns (version, arrays), or None when
+    there is no snapshot at path. Every section maps the same file, so a
+    concurrent rename cannot mix two versions.
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+
+    with f:
+        prefix = f.read(len(SNAPSHOT_MAGIC) + 4)
+        if len(prefix) < len(SNAPSHOT_MAGIC) + 4 or not prefix.startswith(SNAPSHOT_MAGIC):
+            raise ValueError(f"Not an instrument snapshot: {path}")
+        header_length, = struct.unpack('<I', prefix[len(SNAPSHOT_MAGIC):])
+        header = json.loads(f.read(header_length))
+        data_start = _aligned(len(SNAPSHOT_MAGIC) + 4 + header_length)
+
+        arrays = {}
+        for name in SECTIONS:
+            section = header['sections'][name]
+            dtype = descr_to_dtype(section['dtype'])
+            shape = tuple(section['shape'])
+            if dtype.itemsize * int(np.prod(shape, dtype=np.int64)) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                # Plain ndarray views over the shared mapping
+                arrays[name] = np.asarray(np.memmap(f, dtype=dtype, mode='r',
+                                                    offset=data_start + section['offset'], shape=shape))
+    return header['version'], arrays
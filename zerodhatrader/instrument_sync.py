@@ -0,0 +1,317 @@
+# zerodhatrader/instrument_sync.py
+import csv
+import logging
+import re
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+from urllib.parse import urljoin
+from django.db import connection, transaction
+from .models import Instrument
+from .instrument_registry import InstrumentRegistry
+
+logger = logging.getLogger(__name__)
+
+# Instrument columns compared and written by the sync, besides the token;
+# underlying is derived, the rest come from the dump
+SYNC_FIELDS = ('exchange_token', 'tradingsymbol', 'name', 'last_price', 'expiry', 'strike',
+               'tick_size', 'lot_size', 'instrument_type', 'segment', 'exchange', 'underlying')
+
+# Index tradingsymbols whose derivatives trade under a different name
+INDEX_UNDERLYINGS = {
+    'NIFTY 50': 'NIFTY',
+    'NIFTY BANK': 'BANKNIFTY',
+    'NIFTY FIN SERVICE': 'FINNIFTY',
+    'NIFTY MID SELECT': 'MIDCPNIFTY',
+    'NIFTY NEXT 50': 'NIFTYNXT50',
+    'SENSEX': 'SENSEX',
+    'BANKEX': 'BANKEX',
+}
+
+DERIVATIVE_TYPES = ('CE', 'PE', 'FUT')
+
+# Leading symbol of a derivative tradingsymbol, e.g. NIFTY in NIFTY25OCT24000CE
+SYMBOL_PREFIX = re.compile(r'^[A-Z&-]+')
+
+DECIMAL_FIELDS = ('last_price', 'strike', 'tick_size')
+
+# Matches decimal_places of the Instrument decimal fields
+DECIMAL_QUANTUM = Decimal('0.0001')
+
+# Downloaded dumps stay in memory up to this size, then spill to a temp file
+SPOOL_MAX_BYTES = 4 * 1024 * 1024
+
+def _to_decimal(value):
+    """Decimal as stored in the database, so dump and table values compare equal"""
+    if value is None or value == '':
+        return None
+    return Decimal(str(value)).quantize(DECIMAL_QUANTUM)
+
+def _to_date(value):
+    if not value:
+        return None
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+def derive_underlying(tradingsymbol, name, segment, instrument_type):
+    """
+    Normalized underlying of an instrument: the derivative symbol for options
+    and futures (Kite's name field), the matching derivative symbol for index
+    rows, and the tradingsymbol for everything else.
+    """
+    if segment == 'INDICES':
+        return INDEX_UNDERLYINGS.get(tradingsymbol, tradingsymbol.replace(' ', ''))
+    if instrument_type in DERIVATIVE_TYPES:
+        if name:
+            return name.strip().upper()
+        match = SYMBOL_PREFIX.match(tradingsymbol)
+        return match.group(0) if match else tradingsymbol
+    return tradingsymbol
+
+def instrument_values(instr):
+    """Normalized SYNC_FIELDS values of one kite.instruments() row"""
+    return (
+        int(instr.get('exchange_token') or 0),
+        instr['tradingsymbol'],
+        instr.get('name') or '',
+        _to_decimal(instr.get('last_price', 0)),
+        _to_date(instr.get('expiry')),
+        _to_decimal(instr.get('strike', 0)),
+        _to_decimal(instr.get('tick_size', 0)) or Decimal(0),
+        int(instr.get('lot_size') or 0),
+        instr.get('instrument_type') or '',
+        instr.get('segment') or '',
+        instr.get('exchange') or '',
+        derive_underlying(instr['tradingsymbol'], instr.get('name') or '', instr.get('segment') or '',
+                          instr.get('instrument_type') or ''),
+    )
+
+def _stored_values(values):
+    """Normalize a values_list row from the table the same way"""
+    values = list(values)
+    for index, field in enumerate(SYNC_FIELDS):
+        if field in DECIMAL_FIELDS:
+            values[index] = _to_decimal(values[index])
+    return tuple(values)
+
+def _sync_batch(batch, batch_size):
+    """Diff one batch of the dump against the table and write the changes"""
+    current = {
+        row[0]: _stored_values(row[1:])
+        for row in Instrument.objects.filter(instrument_token__in=list(batch))
+                                     .values_list('instrument_token', *SYNC_FIELDS)
+    }
+
+    to_create = []
+    to_update = []
+    for token, values in batch.items():
+        existing = current.get(token)
+        if existing == values:
+            continue
+        instrument = Instrument(instrument_token=token, **dict(zip(SYNC_FIELDS, values)))
+        if existing is None:
+            to_create.append(instrument)
+        else:
+            to_update.append(instrument)
+
+    if to_update:
+        Instrument.objects.bulk_update(to_update, SYNC_FIELDS, batch_size=batch_size)
+    if to_create:
+        Instrument.objects.bulk_create(to_create, batch_size=batch_size)
+    return len(to_create), len(to_update)
+
+def _sync_result(total, inserted, updated, deleted, started):
+    result = {
+        'total': total,
+        'inserted': inserted,
+        'updated': updated,
+        'deleted': deleted,
+        'unchanged': total - inserted - updated,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Instrument sync: {result['inserted']} inserted, {result['updated']} updated, "
+                f"{result['deleted']} deleted, {result['unchanged']} unchanged in {result['seconds']}s")
+    if inserted or updated or deleted:
+        # New registry snapshot for every worker once the new master is visible
+        transaction.on_commit(InstrumentRegistry.notify_changed)
+    return result
+
+def sync_instruments(all_instruments, batch_size=1000):
+    """
+    Bring the Instrument table in line with a full instruments dump.
+
+    all_instruments may be a list or a generator of kite.instruments()-style
+    rows (CSV rows as strings work too). It is consumed in fixed-size
+    batches. Each batch is diffed against the table by instrument_token and
+    only the differences are written. Tokens missing from the dump are
+    deleted at the end. Memory stays at one batch plus the set of tokens
+    seen. Everything runs in one transaction, so readers see either the old
+    or the new master, never a partly loaded one. Returns counts of each
+    kind of change.
+    """
+    started = time.perf_counter()
+    seen = set()
+    inserted = updated = 0
+
+    with transaction.atomic():
+        batch = {}
+        for instr in all_instruments:
+            token = int(instr['instrument_token'])
+            batch[token] = instrument_values(instr)
+            if len(batch) >= batch_size:
+                created, changed = _sync_batch(batch, batch_size)
+                inserted, updated = inserted + created, updated + changed
+                seen.update(batch)
+                batch = {}
+        if batch:
+            created, changed = _sync_batch(batch, batch_size)
+            inserted, updated = inserted + created, updated + changed
+            seen.update(batch)
+
+        to_delete = [token for token in Instrument.objects.values_list('instrument_token', flat=True)
+                     .iterator(chunk_size=10000) if token not in seen]
+        for i in range(0, len(to_delete), batch_size):
+            Instrument.objects.filter(instrument_token__in=to_delete[i:i + batch_size]).delete()
+
+    return _sync_result(len(seen), inserted, updated, len(to_delete), started)
+
+def iter_instruments_csv(csv_file):
+    """Rows of an instruments CSV dump (file object or iterable of lines) as dicts"""
+    return csv.DictReader(csv_file)
+
+def _open_instruments_response(kite, exchange=None):
+    """
+    Streaming GET of the instruments CSV dump, or None when the client does
+    not expose what this needs. KiteConnect has no public streaming call, so
+    this is the one place that relies on its internals (_routes,
+    _user_agent(), reqsession, kite_header_version), as of kiteconnect 5.0.1
+    pinned in requirements.txt; recheck it when upgrading.
+    """
+    try:
+        if exchange:
+            route = kite._routes['market.instruments'].format(exchange=exchange)
+        else:
+            route = kite._routes['market.instruments.all']
+        headers = {
+            'X-Kite-Version': kite.kite_header_version,
+            'User-Agent': kite._user_agent(),
+            'Authorization': f"token {kite.api_key}:{kite.access_token}",
+        }
+        session = kite.reqsession
+    except (AttributeError, KeyError) as e:
+        logger.warning(f"KiteConnect client cannot stream the instruments dump ({e}), using kite.instruments()")
+        return None
+
+    response = session.get(urljoin(kite.root, route), headers=headers, stream=True,
+                           timeout=kite.timeout, proxies=kite.proxies, verify=not kite.disable_ssl)
+    response.raise_for_status()
+    response.encoding = response.encoding or 'utf-8'
+    return response
+
+def download_instruments_csv(kite, exchange=None, chunk_size=64 * 1024):
+    """
+    Download the instruments CSV of an authenticated KiteConnect client into
+    a temporary file, without parsing it into a list like kite.instruments().
+    The file is rewound and ready to read; close it when done.
+
+    The dump is fetched completely before anything is synced: the sync then
+    holds its transaction only as long as the database work takes, a
+    truncated download fails before touching the table, and the COPY path
+    gets the file object it needs.
+    """
+    # Spills to disk past a few MB, so the dump is never held in memory whole
+    dump = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode='w+', newline='')
+    try:
+        response = _open_instruments_response(kite, exchange)
+        if response is None:
+            rows = kite.instruments(exchange) if exchange else kite.instruments()
+            if rows:
+                writer = csv.DictWriter(dump, fieldnames=list(rows[0].keys()))
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with response:
+                for chunk in response.iter_content(chunk_size=chunk_size, decode_unicode=True):
+                    dump.write(chunk)
+    except BaseException:
+        dump.close()
+        raise
+    dump.seek(0)
+    return dump
+
+def copy_sync_instruments(csv_file):
+    """
+    PostgreSQL fast path of sync_instruments for a CSV dump: COPY the file
+    into a temporary staging table, then apply deletes, updates and inserts
+    with three set-based statements in the same transaction.
+    """
+    started = time.perf_counter()
+    table = connection.ops.quote_name(Instrument._meta.db_table)
+    columns = ('instrument_token',) + SYNC_FIELDS
+
+    header = next(csv.reader([csv_file.readline()]))
+    unknown = [name for name in header if name not in columns]
+    if unknown or 'instrument_token' not in header:
+        raise ValueError(f"Unexpected instruments CSV columns: {header}")
+
+    # NOT NULL columns get the same defaults the ORM path writes for blanks
+    values = {name: f"s.{name}" for name in columns}
+    for name in ('tradingsymbol', 'name', 'instrument_type', 'segment', 'exchange'):
+        values[name] = f"COALESCE(s.{name}, '')"
+    for name in ('exchange_token', 'tick_size', 'lot_size'):
+        values[name] = f"COALESCE(s.{name}, 0)"
+
+    # derive_underlying() in SQL; the dump has no underlying column
+    index_cases = ' '.join(f"WHEN '{symbol}' THEN '{underlying}'" for symbol, underlying in INDEX_UNDERLYINGS.items())
+    derivative_types = ', '.join(f"'{instrument_type}'" for instrument_type in DERIVATIVE_TYPES)
+    values['underlying'] = (
+        f"CASE WHEN s.segment = 'INDICES' THEN "
+        f"CASE s.tradingsymbol {index_cases} ELSE REPLACE(s.tradingsymbol, ' ', '') END "
+        f"WHEN s.instrument_type IN ({derivative_types}) THEN "
+        f"COALESCE(UPPER(NULLIF(TRIM(s.name), '')), SUBSTRING(s.tradingsymbol FROM '^[A-Z&-]+'), s.tradingsymbol) "
+        f"ELSE s.tradingsymbol END"
+    )
+
+    column_list = ', '.join(columns)
+    value_list = ', '.join(values[name] for name in columns)
+    assignments = ', '.join(f"{name} = {values[name]}" for name in SYNC_FIELDS)
+    target_fields = ', '.join(f"t.{name}" for name in SYNC_FIELDS)
+    source_fields = ', '.join(values[name] for name in SYNC_FIELDS)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE instrument_staging ON COMMIT DROP AS "
+                       f"SELECT {column_list} FROM {table} WITH NO DATA")
+        cursor.cursor.copy_expert(f"COPY instrument_staging ({', '.join(header)}) FROM STDIN WITH (FORMAT csv)",
+                                  csv_file)
+        cursor.execute("ANALYZE instrument_staging")
+
+        cursor.execute("SELECT COUNT(*) FROM instrument_staging")
+        total = cursor.fetchone()[0]
+
+        cursor.execute(f"DELETE FROM {table} t WHERE NOT EXISTS "
+                       f"(SELECT 1 FROM instrument_staging s WHERE s.instrument_token = t.instrument_token)")
+        deleted = cursor.rowcount
+
+        cursor.execute(f"UPDATE {table} t SET {assignments} FROM instrument_staging s "
+                       f"WHERE t.instrument_token = s.instrument_token "
+                       f"AND ({target_fields}) IS DISTINCT FROM ({source_fields})")
+        updated = cursor.rowcount
+
+        cursor.execute(f"INSERT INTO {table} ({column_list}) SELECT {value_list} FROM instrument_staging s "
+                       f"WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.instrument_token = s.instrument_token)")
+        inserted = cursor.rowcount
+
+    return _sync_result(total, inserted, updated, deleted, started)
+
+def sync_instruments_csv(csv_file, batch_size=1000, use_copy=None):
+    """
+    Sync from an instruments CSV dump. Uses COPY on PostgreSQL (unless
+    use_copy is False) and streams rows through sync_instruments otherwise.
+    """
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    if use_copy:
+        return copy_sync_instruments(csv_file)
+    return sync_instruments(iter_instruments_csv(csv_file), batch_size=batch_size)
@@ -0,0 +1,77 @@
+# zerodhatrader/management/commands/benchmark_calculations.py
+import os
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from zerodhatrader.benchmarks import (BENCHMARK_TRADE_DATE, build_benchmarks, run_benchmark, build_report,
+                                      save_report, load_report, latest_report_path, compare_reports,
+                                      get_git_commit)
+
+class Command(BaseCommand):
+    help = 'Benchmark the options math and strategy calculators and check for regressions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', default=None, help='Run only cases whose name contains this text')
+        parser.add_argument('--min-time', type=float, default=1.0, help='Seconds to spend on each case')
+        parser.add_argument('--strikes', type=int, default=100,
+                            help='Strikes on each side of the money in the synthetic chain')
+        parser.add_argument('--trade-date', default=BENCHMARK_TRADE_DATE.isoformat(),
+                            help='Trade date (YYYY-MM-DD) the synthetic chain is priced as of')
+        parser.add_argument('--results-dir', default=os.path.join(settings.BASE_DIR, 'benchmark_results'),
+                            help='Directory holding one JSON result file per run')
+        parser.add_argument('--baseline', default=None,
+                            help='Result file to compare against (default: latest run in --results-dir)')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed slowdown before failing, as a fraction (0.2 = 20%%)')
+        parser.add_argument('--no-save', action='store_true', help='Do not store this run')
+
+    def handle(self, *args, **options):
+        try:
+            trade_date = date.fromisoformat(options['trade_date'])
+        except ValueError:
+            raise CommandError(f"Invalid --trade-date {options['trade_date']}, expected YYYY-MM-DD")
+
+        benchmarks = build_benchmarks(strikes_each_side=options['strikes'], trade_date=trade_date)
+        if options['only']:
+            benchmarks = {name: case for name, case in benchmarks.items() if options['only'] in name}
+            if not benchmarks:
+                raise CommandError(f"No benchmark matches '{options['only']}'")
+
+        baseline_path = options['baseline'] or latest_report_path(options['results_dir'])
+        if options['baseline'] and not os.path.exists(baseline_path):
+            raise CommandError(f'Baseline {baseline_path} does not exist')
+
+        results = {}
+        self.stdout.write(f"{'case':<40} {'runs':>7} {'ops/s':>12} {'items/s':>13} {'p50 us':>11} {'p99 us':>11}")
+        for name, (function, items) in benchmarks.items():
+            result = run_benchmark(function, items, min_time=options['min_time'])
+            results[name] = result
+            self.stdout.write(f"{name:<40} {result['runs']:>7} {result['ops_per_sec']:>12.1f} "
+                              f"{result['items_per_sec']:>13.0f} {result['p50_us']:>11.1f} {result['p99_us']:>11.1f}")
+
+        report = build_report(results, get_git_commit(settings.BASE_DIR), trade_date)
+        if not options['no_save']:
+            path = save_report(report, options['results_dir'])
+            self.stdout.write(f'Saved results to {path}')
+
+        if not baseline_path:
+            self.stdout.write('No baseline to compare against')
+            return
+
+        baseline = load_report(baseline_path)
+        regressions = compare_reports(report, baseline, options['threshold'])
+        self.stdout.write(f"Compared with {os.path.basename(baseline_path)} (commit {baseline.get('commit')})")
+        if baseline.get('trade_date') != report['trade_date']:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline was priced as of {baseline.get('trade_date')}, this run as of {report['trade_date']}"
+            ))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f"No regressions beyond {options['threshold']:.0%}"))
+            return
+
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"  {regression['name']} {regression['metric']}: {regression['baseline']:.1f} -> "
+                f"{regression['current']:.1f} ({regression['change']:+.0%})"
+            ))
+        raise CommandError(f'{len(regressions)} benchmark regression(s) beyond {options["threshold"]:.0%}')
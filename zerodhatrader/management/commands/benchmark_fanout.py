@@ -0,0 +1,235 @@
+# zerodhatrader/management/commands/benchmark_fanout.py
+import gc
+import os
+import time
+import random
+import asyncio
+import logging
+import resource
+import threading
+import orjson
+import numpy as np
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from channels.testing import WebsocketCommunicator
+from zerodhatrader.benchmarks import BENCHMARK_TRADE_DATE
+from zerodhatrader.replay import ReplayTicker, TickReplayer, SENT_AT_KEY
+from zerodhatrader.synthetic import DEFAULT_UNDERLYINGS, SyntheticMarket, build_instrument_universe
+from zerodhatrader.ticker import KiteTickerManager, TICK_MODES
+from zerodhatrader.ticker_intents import EMBEDDED
+
+logger = logging.getLogger(__name__)
+
+# Quiet period after the last batch before clients stop listening
+DRAIN_SECONDS = 2.0
+
+# Clients connected concurrently while ramping up
+CONNECT_CHUNK = 200
+
+def _rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class Command(BaseCommand):
+    help = 'Load test the tradingapp.asgi WebSocket fan-out in-process with simulated clients and synthetic ticks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000, help='Simulated ws/ticker/ connections')
+        parser.add_argument('--tokens-per-client', type=int, default=50, help='Tokens each client subscribes to')
+        parser.add_argument('--strikes', type=int, default=20,
+                            help='Strikes on each side of the money in the synthetic NIFTY universe')
+        parser.add_argument('--trade-date', default=BENCHMARK_TRADE_DATE.isoformat(),
+                            help='Trade date (YYYY-MM-DD) the synthetic universe is built for')
+        parser.add_argument('--mode', default='quote', choices=TICK_MODES, help='Tick mode clients request')
+        parser.add_argument('--seconds', type=float, default=30.0, help='Seconds of ticks to drive')
+        parser.add_argument('--step-ms', type=int, default=250, help='Time between tick batches')
+        parser.add_argument('--ticks-per-step', type=int, default=500, help='Option ticks per batch (approximate)')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Speed multiplier for batch pacing; 0 drives as fast as possible')
+        parser.add_argument('--redis-url', default=None,
+                            help='Redis to publish through (default REDIS_URL, e.g. a local redis-server)')
+        parser.add_argument('--fake-redis', action='store_true',
+                            help='Start an in-process fakeredis server as the Redis stand-in (needs fakeredis)')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for client token selection')
+
+    def handle(self, *args, **options):
+        try:
+            trade_date = date.fromisoformat(options['trade_date'])
+        except ValueError:
+            raise CommandError(f"Invalid --trade-date {options['trade_date']}, expected YYYY-MM-DD")
+
+        server = None
+        if options['fake_redis']:
+            try:
+                from fakeredis import TcpFakeServer
+            except ImportError:
+                raise CommandError('--fake-redis needs the fakeredis package')
+            server = TcpFakeServer(('127.0.0.1', 0), server_type='redis')
+            # Connection handler threads must not keep the process alive at exit
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='fake-redis', daemon=True).start()
+            host, port = server.server_address
+            settings.REDIS_URL = f'redis://{host}:{port}/0'
+        elif options['redis_url']:
+            settings.REDIS_URL = options['redis_url']
+
+        # Clients talk to the in-process manager, never to a run_ticker daemon
+        settings.TICKER_INGEST = dict(getattr(settings, 'TICKER_INGEST', {}), MODE=EMBEDDED)
+
+        # Imported late so REDIS_URL and the ingest mode are in place first
+        from tradingapp.asgi import application
+
+        underlyings = {'NIFTY': DEFAULT_UNDERLYINGS['NIFTY']}
+        rows = build_instrument_universe(trade_date, underlyings, weekly_expiries=2, monthly_expiries=1,
+                                         strikes_each_side=options['strikes'])
+        market = SyntheticMarket(rows, trade_date, underlyings)
+        tokens = market.tokens.tolist()
+
+        ticker_manager = KiteTickerManager.get_instance()
+        ticker_manager.ticker_class = ReplayTicker
+        if not ticker_manager.initialize_ticker(api_key='benchmark', access_token='benchmark'):
+            raise CommandError('Could not start replay ticker shards')
+
+        batches = market.iter_batches(options['seconds'], options['step_ms'] / 1000.0, options['ticks_per_step'],
+                                      with_depth=options['mode'] == 'full')
+        replayer = TickReplayer(ticker_manager, batches, speed=options['speed'])
+
+        self.stdout.write(f"Fan-out benchmark: {options['clients']} clients x {options['tokens_per_client']} tokens "
+                          f"({len(tokens)} token universe as of {trade_date}, mode {options['mode']}) "
+                          f"via {settings.REDIS_URL}")
+
+        try:
+            results = asyncio.run(self._run(application, replayer, tokens, options))
+        finally:
+            ticker_manager.disconnect_ticker()
+            if server is not None:
+                ticker_manager.redis_client.close()
+                server.shutdown()
+                server.server_close()
+
+        self._report(results, replayer.stats, ticker_manager.get_publish_stats(), options)
+
+    async def _connect(self, application, client_tokens, mode):
+        """Open one ws/ticker/ connection and subscribe it"""
+        communicator = WebsocketCommunicator(application, '/ws/ticker/')
+        connected, _ = await communicator.connect(timeout=30)
+        if not connected:
+            raise CommandError('Simulated client could not connect')
+        await communicator.receive_from(timeout=30)  # connection_established
+        await communicator.send_json_to({'action': 'subscribe', 'tokens': client_tokens, 'mode': mode})
+        return communicator
+
+    async def _run(self, application, replayer, tokens, options):
+        """Ramp up clients, drive ticks in a worker thread and collect deliveries"""
+        rng = random.Random(options['seed'])
+        per_client = min(options['tokens_per_client'], len(tokens))
+
+        gc.collect()
+        rss_before = _rss_bytes()
+        connect_started = time.perf_counter()
+
+        clients = []
+        for start in range(0, options['clients'], CONNECT_CHUNK):
+            count = min(CONNECT_CHUNK, options['clients'] - start)
+            clients.extend(await asyncio.gather(*(
+                self._connect(application, rng.sample(tokens, per_client), options['mode']) for _ in range(count)
+            )))
+
+        connect_seconds = time.perf_counter() - connect_started
+        results = {
+            'connect_seconds': connect_seconds,
+            'latencies': [],
+            'client_messages': [0] * len(clients),
+            'last_received': None,
+        }
+        replay_done = asyncio.Event()
+        collectors = [asyncio.create_task(self._collect(client, index, results, replay_done))
+                      for index, client in enumerate(clients)]
+
+        # Let subscription acks and snapshots settle before the clock starts
+        await asyncio.sleep(1.0)
+        gc.collect()
+        results['rss_per_client'] = (_rss_bytes() - rss_before) / max(len(clients), 1)
+        results['latencies'].clear()
+        results['client_messages'] = [0] * len(clients)
+
+        cpu_started = time.process_time()
+        await asyncio.get_running_loop().run_in_executor(None, replayer.run)
+        replay_done.set()
+        await asyncio.gather(*collectors)
+        results['cpu_seconds'] = time.process_time() - cpu_started
+
+        for client in clients:
+            await client.disconnect()
+        return results
+
+    async def _collect(self, communicator, index, results, replay_done):
+        """Receive until the drive is over and the socket has gone quiet"""
+        while True:
+            try:
+                # Read the ASGI output queue directly: receive_from() kills the app on timeout
+                message = await asyncio.wait_for(communicator.output_queue.get(), DRAIN_SECONDS)
+            except asyncio.TimeoutError:
+                if replay_done.is_set():
+                    return
+                continue
+
+            received_at = time.time()
+            text = message.get('text')
+            if not text:
+                continue
+
+            data = orjson.loads(text)
+            if data.get('type') != 'tick':
+                continue
+
+            results['client_messages'][index] += 1
+            results['last_received'] = received_at
+            sent_at = data.get('data', {}).get(SENT_AT_KEY)
+            if sent_at:
+                results['latencies'].append(received_at - sent_at)
+
+    def _report(self, results, replay_stats, publish_stats, options):
+        """Print latency, throughput, memory and CPU figures"""
+        clients = len(results['client_messages'])
+        delivered = sum(results['client_messages'])
+        end = results['last_received'] or replay_stats['finished_at'] or time.time()
+        seconds = max(end - replay_stats['started_at'], 1e-9)
+        per_client = np.array(results['client_messages']) / seconds
+
+        self.stdout.write(self.style.SUCCESS('Fan-out benchmark complete'))
+        self.stdout.write(f"  connect          : {clients} clients in {results['connect_seconds']:.2f}s")
+        self.stdout.write(f"  ticks dispatched : {replay_stats['ticks_dispatched']} in {replay_stats['batches']} batches, "
+                          f"max schedule lag {replay_stats['max_schedule_lag_ms']:.1f} ms")
+        self.stdout.write(f"  delivered        : {delivered} messages ({delivered / seconds:.0f} msgs/s total)")
+        if clients:
+            p1, p50, p99 = np.percentile(per_client, [1, 50, 99])
+            self.stdout.write(f"  per client msgs/s: p1 {p1:.1f}  p50 {p50:.1f}  p99 {p99:.1f}  "
+                              f"idle clients {int((per_client == 0).sum())}")
+
+        latencies = np.array(results['latencies']) * 1000
+        if latencies.size:
+            p50, p90, p99, p999 = np.percentile(latencies, [50, 90, 99, 99.9])
+            self.stdout.write(f"  latency ms       : p50 {p50:.2f}  p90 {p90:.2f}  p99 {p99:.2f}  "
+                              f"p99.9 {p999:.2f}  max {latencies.max():.2f}")
+        else:
+            self.stdout.write(self.style.WARNING('  no tick messages reached the clients'))
+
+        self.stdout.write(f"  memory           : {results['rss_per_client'] / 1024:.1f} KiB RSS per connection")
+
+        # Process CPU covers the publisher, fan-out hub, consumers and the simulated clients together
+        ticks = max(replay_stats['ticks_dispatched'], 1)
+        self.stdout.write(f"  cpu              : {results['cpu_seconds']:.2f}s process CPU, "
+                          f"{results['cpu_seconds'] * 1e6 / ticks:.0f} us per tick, "
+                          f"{results['cpu_seconds'] * 1e6 / max(delivered, 1):.1f} us per delivered message")
+
+        buffer_stats = publish_stats['buffer']
+        self.stdout.write(f"  publish          : {publish_stats['batches']} batches, "
+                          f"avg {publish_stats['avg_publish_ms']:.2f} ms, max {publish_stats['max_publish_ms']:.2f} ms")
+        self.stdout.write(f"  tick buffer      : max depth {buffer_stats['max_depth']}, "
+                          f"conflated {buffer_stats['conflated_ticks']}, dropped {buffer_stats['dropped_ticks']}")
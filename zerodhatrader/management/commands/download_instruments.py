@@ -3,69 +3,54 @@ import logging
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from kiteconnect import KiteConnect
-from zerodhatrader.models import ApiCredential, Instrument
+from zerodhatrader.models import ApiCredential
+from zerodhatrader.instrument_sync import download_instruments_csv, sync_instruments_csv
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
     help = 'Download and update instruments from Kite Connect API'
     
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None, help='Load a saved instruments CSV instead of downloading')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per diff and write batch')
+        parser.add_argument('--no-copy', action='store_true', help='Do not use PostgreSQL COPY even when available')
+    
     def handle(self, *args, **options):
         try:
-            # Get active API credentials
-            cred = ApiCredential.objects.filter(is_active=True).first()
-            if not cred or not cred.access_token:
-                self.stdout.write(self.style.ERROR('No active API credentials found with access token'))
-                return
-            
-            # Initialize Kite client
-            kite = KiteConnect(api_key=cred.api_key)
-            kite.set_access_token(cred.access_token)
-            
-            self.stdout.write('Downloading instruments...')
-            
-            # Download instruments
-            all_instruments = kite.instruments()
-            
-            self.stdout.write(f'Downloaded {len(all_instruments)} instruments')
-            
-            # Clear existing instruments
-            Instrument.objects.all().delete()
-            
-            self.stdout.write('Creating instruments in database...')
-            
-            # Bulk create new instruments
-            instruments_to_create = []
-            for instr in all_instruments:
-                # Handle None values for expiry
-                expiry = None
-                if instr.get('expiry') and instr['expiry'] != '':
-                    expiry = instr['expiry']
-                    
-                instruments_to_create.append(Instrument(
-                    instrument_token=instr['instrument_token'],
-                    exchange_token=instr.get('exchange_token', 0),
-                    tradingsymbol=instr['tradingsymbol'],
-                    name=instr.get('name', ''),
-                    last_price=instr.get('last_price', 0),
-                    expiry=expiry,
-                    strike=instr.get('strike', 0),
-                    tick_size=instr.get('tick_size', 0),
-                    lot_size=instr.get('lot_size', 0),
-                    instrument_type=instr.get('instrument_type', ''),
-                    segment=instr.get('segment', ''),
-                    exchange=instr.get('exchange', '')
-                ))
-            
-            # Insert in batches to avoid memory issues
-            batch_size = 1000
-            for i in range(0, len(instruments_to_create), batch_size):
-                batch = instruments_to_create[i:i+batch_size]
-                Instrument.objects.bulk_create(batch)
-                self.stdout.write(f'Inserted batch {i//batch_size + 1}/{(len(instruments_to_create)-1)//batch_size + 1}')
-            
-            self.stdout.write(self.style.SUCCESS(f'Successfully imported {len(instruments_to_create)} instruments'))
+            if options['file']:
+                self.stdout.write(f"Loading instruments from {options['file']}...")
+                with open(options['file'], newline='') as dump:
+                    result = self._sync(dump, options)
+            else:
+                # Get active API credentials
+                cred = ApiCredential.objects.filter(is_active=True).first()
+                if not cred or not cred.access_token:
+                    self.stdout.write(self.style.ERROR('No active API credentials found with access token'))
+                    return
+                
+                # Initialize Kite client
+                kite = KiteConnect(api_key=cred.api_key)
+                kite.set_access_token(cred.access_token)
+                
+                self.stdout.write('Downloading instruments...')
+                
+                # Stream the CSV dump to a temporary file instead of parsing it into a list
+                with download_instruments_csv(kite) as dump:
+                    result = self._sync(dump, options)
+            
+            self.stdout.write(
+                f"Inserted {result['inserted']}, updated {result['updated']}, deleted {result['deleted']}, "
+                f"unchanged {result['unchanged']} in {result['seconds']}s"
+            )
+            self.stdout.write(self.style.SUCCESS(f"Successfully synced {result['total']} instruments"))
             
         except Exception as e:
             logger.error(f"Error downloading instruments: {e}")
-            self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
\ No newline at end of file
+            self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
+    
+    def _sync(self, dump, options):
+        """Apply only the differences so the table is never empty mid-load"""
+        self.stdout.write('Syncing instruments with the database...')
+        return sync_instruments_csv(dump, batch_size=options['batch_size'],
+                                    use_copy=False if options['no_copy'] else None)
@@ -0,0 +1,75 @@
+# zerodhatrader/management/commands/generate_market_data.py
+import logging
+import time
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from zerodhatrader.synthetic import (DEFAULT_UNDERLYINGS, SyntheticMarket,
+                                     build_instrument_universe, load_instruments)
+from zerodhatrader.tick_recorder import TickRecorder
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic NFO option universe and correlated tick history for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--underlyings', default='NIFTY,BANKNIFTY,FINNIFTY',
+                            help=f"Comma separated underlyings from {', '.join(DEFAULT_UNDERLYINGS)}")
+        parser.add_argument('--date', default=None, help='Trading date (YYYY-MM-DD, default today)')
+        parser.add_argument('--strikes', type=int, default=100, help='Strikes on each side of the money')
+        parser.add_argument('--weekly', type=int, default=4, help='Weekly expiries per underlying')
+        parser.add_argument('--monthly', type=int, default=3, help='Monthly expiries per underlying')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed')
+        parser.add_argument('--load-instruments', action='store_true',
+                            help='Replace synthetic rows (tokens from 3000000000 up) in the Instrument table')
+        parser.add_argument('--record', nargs='?', const='', default=None, metavar='ROOT',
+                            help="Write ticks in tick recorder format (default root TICK_RECORDER['ROOT'])")
+        parser.add_argument('--seconds', type=float, default=60.0, help='Simulated market seconds to record')
+        parser.add_argument('--step-ms', type=int, default=250, help='Simulated time between tick batches')
+        parser.add_argument('--ticks-per-step', type=int, default=500, help='Option ticks per batch (approximate)')
+
+    def handle(self, *args, **options):
+        names = [name.strip().upper() for name in options['underlyings'].split(',') if name.strip()]
+        unknown = [name for name in names if name not in DEFAULT_UNDERLYINGS]
+        if unknown:
+            raise CommandError(f"Unknown underlyings: {', '.join(unknown)}")
+        underlyings = {name: DEFAULT_UNDERLYINGS[name] for name in names}
+
+        trade_date = date.fromisoformat(options['date']) if options['date'] else date.today()
+        rows = build_instrument_universe(trade_date, underlyings, options['weekly'],
+                                         options['monthly'], options['strikes'])
+        options_count = sum(1 for row in rows if row['segment'] == 'NFO-OPT')
+        self.stdout.write(f'Built {len(rows)} instruments ({options_count} options) for {trade_date}')
+
+        if options['load_instruments']:
+            load_instruments(rows)
+            self.stdout.write(self.style.SUCCESS(f'Loaded {len(rows)} instruments into the database'))
+
+        if options['record'] is None:
+            return
+
+        root = options['record'] or getattr(settings, 'TICK_RECORDER', {}).get('ROOT')
+        if not root:
+            raise CommandError("No tick data directory; pass --record ROOT or set TICK_RECORDER['ROOT']")
+
+        market = SyntheticMarket(rows, trade_date, underlyings, seed=options['seed'])
+        try:
+            recorder = TickRecorder(root, start_writer=False)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        recorder.partitions.update(market.partition_map())
+
+        started = time.perf_counter()
+        step_seconds = options['step_ms'] / 1000.0
+        for _, ticks in market.iter_batches(options['seconds'], step_seconds, options['ticks_per_step']):
+            recorder.record(ticks, received_at=market.clock)
+            if recorder.get_stats()['queued_batches'] >= 100:
+                recorder.flush()
+        recorder.close()
+
+        stats = recorder.get_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Recorded {stats['recorded_ticks']} ticks to {root} in {time.perf_counter() - started:.1f}s "
+            f"(replay with: replay_ticks --date {trade_date} --underlying {names[0]})"
+        ))
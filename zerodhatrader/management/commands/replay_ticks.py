@@ -0,0 +1,167 @@
+# zerodhatrader/management/commands/replay_ticks.py
+import asyncio
+import logging
+import random
+import time
+import orjson
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from channels.testing import WebsocketCommunicator
+from zerodhatrader.consumers import TickerConsumer
+from zerodhatrader.replay import (ReplayTicker, TickReplayer, SENT_AT_KEY,
+                                  get_recorded_tokens, iter_recorded_batches)
+from zerodhatrader.ticker import KiteTickerManager, TICK_MODES
+from zerodhatrader.ticker_intents import EMBEDDED
+from zerodhatrader.tick_recorder import list_partitions
+
+logger = logging.getLogger(__name__)
+
+# Quiet period after the replay ends before clients stop listening
+DRAIN_SECONDS = 2.0
+
+class Command(BaseCommand):
+    help = 'Replay recorded ticks through KiteTickerManager and simulated WebSocket clients, offline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', default=None,
+                            help="Tick data directory (default TICK_RECORDER['ROOT'])")
+        parser.add_argument('--date', help='Trading date to replay (YYYY-MM-DD)')
+        parser.add_argument('--underlying', help='Underlying partition to replay, e.g. NIFTY')
+        parser.add_argument('--list', action='store_true', help='List recorded partitions and exit')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Replay speed multiplier, e.g. 1 or 10; 0 replays as fast as possible')
+        parser.add_argument('--clients', type=int, default=10, help='Simulated WebSocket clients')
+        parser.add_argument('--tokens-per-client', type=int, default=0,
+                            help='Tokens each client subscribes to (0 = all tokens in the recording)')
+        parser.add_argument('--mode', default='full', choices=TICK_MODES, help='Tick mode clients request')
+        parser.add_argument('--limit', type=int, default=None, help='Replay at most this many ticks')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for client token selection')
+
+    def handle(self, *args, **options):
+        root = options['root'] or getattr(settings, 'TICK_RECORDER', {}).get('ROOT')
+        if not root:
+            raise CommandError("No tick data directory; pass --root or set TICK_RECORDER['ROOT']")
+
+        if options['list']:
+            for trading_date, underlying in list_partitions(root):
+                self.stdout.write(f'{trading_date}  {underlying}')
+            return
+
+        if not options['date'] or not options['underlying']:
+            raise CommandError('--date and --underlying are required')
+
+        tokens = get_recorded_tokens(root, options['date'], options['underlying'], options['limit'])
+        if not tokens:
+            raise CommandError(f"No recorded ticks for {options['underlying']} on {options['date']} in {root}")
+
+        # The replay drives an in-process manager; clients must not send intents to a daemon
+        settings.TICKER_INGEST = dict(getattr(settings, 'TICKER_INGEST', {}), MODE=EMBEDDED)
+
+        ticker_manager = KiteTickerManager.get_instance()
+        ticker_manager.ticker_class = ReplayTicker
+        if not ticker_manager.initialize_ticker(api_key='replay', access_token='replay'):
+            raise CommandError('Could not start replay ticker shards')
+
+        batches = iter_recorded_batches(root, options['date'], options['underlying'], options['limit'])
+        replayer = TickReplayer(ticker_manager, batches, speed=options['speed'])
+
+        self.stdout.write(
+            f"Replaying {options['underlying']} {options['date']} ({len(tokens)} tokens) "
+            f"at {'max' if options['speed'] <= 0 else str(options['speed']) + 'x'} speed "
+            f"to {options['clients']} clients"
+        )
+
+        try:
+            results = asyncio.run(self._run(replayer, tokens, options))
+        finally:
+            ticker_manager.disconnect_ticker()
+
+        self._report(results, replayer.stats, ticker_manager.get_publish_stats())
+
+    async def _run(self, replayer, tokens, options):
+        """Connect clients, replay in a worker thread and collect latencies"""
+        rng = random.Random(options['seed'])
+        per_client = options['tokens_per_client']
+
+        clients = []
+        for _ in range(options['clients']):
+            communicator = WebsocketCommunicator(TickerConsumer.as_asgi(), '/ws/ticker/')
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise CommandError('Simulated client could not connect')
+            await communicator.receive_from()  # connection_established
+
+            client_tokens = rng.sample(tokens, per_client) if 0 < per_client < len(tokens) else tokens
+            await communicator.send_json_to({'action': 'subscribe', 'tokens': client_tokens, 'mode': options['mode']})
+            clients.append(communicator)
+
+        results = {'latencies': [], 'messages': 0, 'first_received': None, 'last_received': None}
+        replay_done = asyncio.Event()
+        collectors = [asyncio.create_task(self._collect(client, results, replay_done)) for client in clients]
+
+        # Let subscription acks and snapshots settle before the clock starts
+        await asyncio.sleep(0.5)
+        results['latencies'].clear()
+        results['messages'] = 0
+
+        await asyncio.get_running_loop().run_in_executor(None, replayer.run)
+        replay_done.set()
+        await asyncio.gather(*collectors)
+
+        for client in clients:
+            await client.disconnect()
+        return results
+
+    async def _collect(self, communicator, results, replay_done):
+        """Receive until the replay is over and the socket has gone quiet"""
+        while True:
+            try:
+                # Read the ASGI output queue directly: receive_from() kills the app on timeout
+                message = await asyncio.wait_for(communicator.output_queue.get(), DRAIN_SECONDS)
+            except asyncio.TimeoutError:
+                if replay_done.is_set():
+                    return
+                continue
+
+            received_at = time.time()
+            text = message.get('text')
+            if not text:
+                continue
+
+            data = orjson.loads(text)
+            results['messages'] += 1
+            if results['first_received'] is None:
+                results['first_received'] = received_at
+            results['last_received'] = received_at
+
+            sent_at = data.get('data', {}).get(SENT_AT_KEY) if data.get('type') == 'tick' else None
+            if sent_at:
+                results['latencies'].append(received_at - sent_at)
+
+    def _report(self, results, replay_stats, publish_stats):
+        """Print throughput and latency percentiles"""
+        replay_seconds = (replay_stats['finished_at'] or time.time()) - replay_stats['started_at']
+        self.stdout.write(self.style.SUCCESS('Replay complete'))
+        self.stdout.write(f"  ticks dispatched : {replay_stats['ticks_dispatched']} in {replay_seconds:.2f}s "
+                          f"({replay_stats['ticks_dispatched'] / max(replay_seconds, 1e-9):.0f} ticks/s)")
+        self.stdout.write(f"  max schedule lag : {replay_stats['max_schedule_lag_ms']:.1f} ms")
+
+        if results['first_received'] is not None:
+            delivery_seconds = results['last_received'] - replay_stats['started_at']
+            self.stdout.write(f"  messages received: {results['messages']} "
+                              f"({results['messages'] / max(delivery_seconds, 1e-9):.0f} msgs/s across clients)")
+
+        latencies = np.array(results['latencies']) * 1000
+        if latencies.size:
+            p50, p90, p99, p999 = np.percentile(latencies, [50, 90, 99, 99.9])
+            self.stdout.write(f"  latency ms       : p50 {p50:.2f}  p90 {p90:.2f}  p99 {p99:.2f}  "
+                              f"p99.9 {p999:.2f}  max {latencies.max():.2f}")
+        else:
+            self.stdout.write(self.style.WARNING('  no tick messages reached the clients'))
+
+        buffer_stats = publish_stats['buffer']
+        self.stdout.write(f"  publish          : {publish_stats['batches']} batches, "
+                          f"avg {publish_stats['avg_publish_ms']:.2f} ms, max {publish_stats['max_publish_ms']:.2f} ms")
+        self.stdout.write(f"  tick buffer      : max depth {buffer_stats['max_depth']}, "
+                          f"conflated {buffer_stats['conflated_ticks']}, dropped {buffer_stats['dropped_ticks']}")
@@ -0,0 +1,63 @@
+# zerodhatrader/management/commands/run_ticker.py
+import logging
+import time
+from django.core.management.base import BaseCommand
+from zerodhatrader.ticker import KiteTickerManager
+from zerodhatrader.ticker_intents import TickerIntentListener, STANDALONE, _get_ingest_settings
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Run the standalone KiteTicker ingest daemon fed by web worker intents via Redis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stats-interval', type=float, default=60,
+                            help='Seconds between stats log lines (0 disables)')
+
+    def handle(self, *args, **options):
+        if _get_ingest_settings()['MODE'] != STANDALONE:
+            self.stdout.write(self.style.WARNING(
+                "TICKER_INGEST['MODE'] is not 'standalone'; web workers will keep their own ticker connections"
+            ))
+
+        KiteTickerManager.ingest_daemon = True
+        ticker_manager = KiteTickerManager.get_instance()
+        if not ticker_manager.initialize_ticker():
+            self.stdout.write(self.style.ERROR('Could not start KiteTicker, check the active API credentials'))
+            return
+
+        listener = TickerIntentListener(ticker_manager)
+        listener.announce()
+
+        worker_ttl = listener.settings['WORKER_TTL_SECONDS']
+        stats_interval = options['stats_interval']
+        last_reap = last_stats = time.monotonic()
+
+        self.stdout.write(self.style.SUCCESS('Ticker daemon running, waiting for subscription intents'))
+
+        try:
+            while True:
+                listener.run_once(timeout=1)
+
+                now = time.monotonic()
+                if now - last_reap >= worker_ttl:
+                    listener.reap_dead_workers()
+                    last_reap = now
+
+                if stats_interval and now - last_stats >= stats_interval:
+                    shard_stats = ticker_manager.get_shard_stats()
+                    publish_stats = ticker_manager.get_publish_stats()
+                    logger.info(
+                        f"Ticker daemon: {listener.stats['intents_processed']} intents, "
+                        f"{len(listener.worker_consumers)} workers, "
+                        f"{shard_stats['placed_tokens']} tokens on {len(shard_stats['shards'])} shards "
+                        f"({shard_stats['pending_tokens']} pending), "
+                        f"{publish_stats['ticks_published']} ticks published"
+                    )
+                    last_stats = now
+
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping ticker daemon...')
+
+        finally:
+            ticker_manager.disconnect_ticker()
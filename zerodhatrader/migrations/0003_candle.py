@@ -0,0 +1,31 @@
+# Generated by Django 5.0.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zerodhatrader', '0002_featureaccess_subscriptionplan_adminactivitylog_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Candle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('instrument_token', models.BigIntegerField()),
+                ('interval', models.CharField(choices=[('1s', '1 second'), ('1m', '1 minute'), ('5m', '5 minutes'), ('15m', '15 minutes')], max_length=8)),
+                ('start', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=4, max_digits=20)),
+                ('high', models.DecimalField(decimal_places=4, max_digits=20)),
+                ('low', models.DecimalField(decimal_places=4, max_digits=20)),
+                ('close', models.DecimalField(decimal_places=4, max_digits=20)),
+                ('volume', models.BigIntegerField(default=0)),
+                ('oi', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('instrument_token', 'interval', 'start')},
+            },
+        ),
+    ]
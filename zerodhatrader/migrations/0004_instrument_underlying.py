@@ -0,0 +1,60 @@
+# Generated by Django 5.0.8 on 2026-10-18 11:21
+
+import re
+from django.db import migrations, models
+
+# Frozen copy of instrument_sync.derive_underlying for the backfill
+INDEX_UNDERLYINGS = {
+    'NIFTY 50': 'NIFTY',
+    'NIFTY BANK': 'BANKNIFTY',
+    'NIFTY FIN SERVICE': 'FINNIFTY',
+    'NIFTY MID SELECT': 'MIDCPNIFTY',
+    'NIFTY NEXT 50': 'NIFTYNXT50',
+    'SENSEX': 'SENSEX',
+    'BANKEX': 'BANKEX',
+}
+
+
+def derive_underlying(tradingsymbol, name, segment, instrument_type):
+    if segment == 'INDICES':
+        return INDEX_UNDERLYINGS.get(tradingsymbol, tradingsymbol.replace(' ', ''))
+    if instrument_type in ('CE', 'PE', 'FUT'):
+        if name:
+            return name.strip().upper()
+        match = re.match(r'^[A-Z&-]+', tradingsymbol)
+        return match.group(0) if match else tradingsymbol
+    return tradingsymbol
+
+
+def backfill_underlying(apps, schema_editor):
+    Instrument = apps.get_model('zerodhatrader', 'Instrument')
+    batch = []
+    for instrument in Instrument.objects.only('tradingsymbol', 'name', 'segment', 'instrument_type').iterator(chunk_size=5000):
+        instrument.underlying = derive_underlying(instrument.tradingsymbol, instrument.name,
+                                                  instrument.segment, instrument.instrument_type)
+        batch.append(instrument)
+        if len(batch) >= 5000:
+            Instrument.objects.bulk_update(batch, ['underlying'])
+            batch = []
+    if batch:
+        Instrument.objects.bulk_update(batch, ['underlying'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zerodhatrader', '0003_candle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instrument',
+            name='underlying',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(backfill_underlying, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='instrument',
+            index=models.Index(fields=['underlying', 'segment', 'expiry', 'strike'], name='instrument_chain_idx'),
+        ),
+    ]
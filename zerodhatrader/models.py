@@ -20,9 +20,16 @@ class Instrument(models.Model):
     instrument_type = models.CharField(max_length=32)
     segment = models.CharField(max_length=32)
     exchange = models.CharField(max_length=16)
+    # Normalized underlying (e.g. NIFTY for NIFTY options and the NIFTY 50 index), set at load time
+    underlying = models.CharField(max_length=64, blank=True, default='')
     
     def __str__(self):
         return self.tradingsymbol
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['underlying', 'segment', 'expiry', 'strike'], name='instrument_chain_idx'),
+        ]
 
 class ApiCredential(models.Model):
     api_key = models.CharField(max_length=64)
@@ -193,4 +200,29 @@ class AdminActivityLog(models.Model):
         return f"{self.admin_user.username} - {self.action} - {self.timestamp}"
     
     class Meta:
-        ordering = ['-timestamp']
\ No newline at end of file
+        ordering = ['-timestamp']
+
+# OHLCV candles built from live ticks
+class Candle(models.Model):
+    INTERVALS = [
+        ('1s', '1 second'),
+        ('1m', '1 minute'),
+        ('5m', '5 minutes'),
+        ('15m', '15 minutes'),
+    ]
+    
+    instrument_token = models.BigIntegerField()
+    interval = models.CharField(max_length=8, choices=INTERVALS)
+    start = models.DateTimeField()
+    open = models.DecimalField(max_digits=20, decimal_places=4)
+    high = models.DecimalField(max_digits=20, decimal_places=4)
+    low = models.DecimalField(max_digits=20, decimal_places=4)
+    close = models.DecimalField(max_digits=20, decimal_places=4)
+    volume = models.BigIntegerField(default=0)
+    oi = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.instrument_token} {self.interval} {self.start}"
+    
+    class Meta:
+        unique_together = ('instrument_token', 'interval', 'start')
@@ -0,0 +1,207 @@
+# zerodhatrader/replay.py
+import logging
+import time
+import numpy as np
+from .tick_recorder import load_ticks
+
+logger = logging.getLogger(__name__)
+
+# Key stamped on replayed ticks so receivers can measure end-to-end latency
+SENT_AT_KEY = 'replay_sent_at'
+
+# Rows converted to tick dicts at a time while streaming a recording
+CHUNK_ROWS = 50000
+
+# Fields an LTP mode packet carries
+LTP_FIELDS = ('tradable', 'mode', 'instrument_token', 'last_price', SENT_AT_KEY)
+
+class ReplayTicker:
+    """
+    Offline stand-in for KiteTicker with the same API and callbacks.
+
+    connect() succeeds immediately without touching the network. dispatch()
+    delivers a batch through on_ticks(ws, ticks) the way Kite's reader does,
+    keeping only subscribed tokens and trimming each tick to its mode.
+    """
+    MODE_FULL = 'full'
+    MODE_QUOTE = 'quote'
+    MODE_LTP = 'ltp'
+
+    def __init__(self, api_key=None, access_token=None, **kwargs):
+        self.api_key = api_key
+        self.subscribed_tokens = {}
+        self.connected = False
+
+        self.on_ticks = None
+        self.on_connect = None
+        self.on_close = None
+        self.on_error = None
+        self.on_reconnect = None
+        self.on_noreconnect = None
+
+    def connect(self, threaded=False, **kwargs):
+        """Report the connection as open right away"""
+        self.connected = True
+        if self.on_connect:
+            self.on_connect(self, {'replay': True})
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self, code=None, reason=None):
+        self.connected = False
+        if self.on_close:
+            self.on_close(self, code, reason)
+
+    def subscribe(self, instrument_tokens):
+        for token in instrument_tokens:
+            self.subscribed_tokens[token] = self.MODE_QUOTE
+        return True
+
+    def unsubscribe(self, instrument_tokens):
+        for token in instrument_tokens:
+            self.subscribed_tokens.pop(token, None)
+        return True
+
+    def set_mode(self, mode, instrument_tokens):
+        for token in instrument_tokens:
+            self.subscribed_tokens[token] = mode
+        return True
+
+    def dispatch(self, ticks):
+        """Deliver the subscribed part of a batch through on_ticks"""
+        if not self.connected or not self.on_ticks:
+            return 0
+
+        batch = []
+        for tick in ticks:
+            mode = self.subscribed_tokens.get(tick['instrument_token'])
+            if mode is None:
+                continue
+            if mode == self.MODE_LTP:
+                tick = {key: tick[key] for key in LTP_FIELDS if key in tick}
+            elif mode == self.MODE_QUOTE and 'depth' in tick:
+                tick = {key: value for key, value in tick.items() if key != 'depth'}
+            batch.append(tick)
+
+        if batch:
+            self.on_ticks(self, batch)
+        return len(batch)
+
+def _columns_to_ticks(columns):
+    """Rebuild Kite-style FULL mode tick dicts from recorded columns"""
+    tokens = columns['instrument_token'].tolist()
+    exchange_timestamps = columns['exchange_timestamp'].astype('datetime64[ms]').tolist()
+    last_prices = columns['last_price'].tolist()
+    last_quantities = columns['last_traded_quantity'].tolist()
+    volumes = columns['volume_traded'].tolist()
+    ois = columns['oi'].tolist()
+
+    has_depth = (np.asarray(columns['bid_price']).any(axis=1) | np.asarray(columns['ask_price']).any(axis=1)).tolist()
+    depth_columns = {name: columns[name].tolist() for name in
+                     ('bid_price', 'bid_quantity', 'bid_orders', 'ask_price', 'ask_quantity', 'ask_orders')}
+
+    ticks = []
+    for i, token in enumerate(tokens):
+        tick = {
+            'tradable': True,
+            'mode': 'full',
+            'instrument_token': token,
+            'last_price': last_prices[i],
+            'last_traded_quantity': last_quantities[i],
+            'volume_traded': volumes[i],
+            'oi': ois[i],
+            'exchange_timestamp': exchange_timestamps[i],
+        }
+        if has_depth[i]:
+            tick['depth'] = {
+                'buy': [{'price': price, 'quantity': quantity, 'orders': orders} for price, quantity, orders in
+                        zip(depth_columns['bid_price'][i], depth_columns['bid_quantity'][i], depth_columns['bid_orders'][i])],
+                'sell': [{'price': price, 'quantity': quantity, 'orders': orders} for price, quantity, orders in
+                         zip(depth_columns['ask_price'][i], depth_columns['ask_quantity'][i], depth_columns['ask_orders'][i])],
+            }
+        ticks.append(tick)
+    return ticks
+
+def get_recorded_tokens(root, trading_date, underlying, limit=None):
+    """Distinct instrument tokens in a recorded partition"""
+    columns = load_ticks(root, trading_date, underlying)
+    if not columns:
+        return []
+    return np.unique(columns['instrument_token'][:limit]).tolist()
+
+def iter_recorded_batches(root, trading_date, underlying, limit=None):
+    """
+    Yield (received epoch seconds, ticks) per original on_ticks batch of a
+    recorded partition, streaming it in chunks.
+    """
+    columns = load_ticks(root, trading_date, underlying)
+    if not columns:
+        return
+
+    rows = len(columns['instrument_token'])
+    if limit:
+        rows = min(rows, limit)
+
+    for chunk_start in range(0, rows, CHUNK_ROWS):
+        chunk = slice(chunk_start, min(chunk_start + CHUNK_ROWS, rows))
+        received = columns['received_at'][chunk].astype('int64')
+        ticks = _columns_to_ticks({name: column[chunk] for name, column in columns.items()})
+
+        # Consecutive rows with the same receive time came in one batch
+        boundaries = (np.flatnonzero(np.diff(received)) + 1).tolist()
+        for batch_start, batch_end in zip([0] + boundaries, boundaries + [len(received)]):
+            yield received[batch_start] / 1000.0, ticks[batch_start:batch_end]
+
+class TickReplayer:
+    """
+    Drives KiteTickerManager from a stream of (epoch seconds, ticks) batches
+    through its ReplayTicker shards, preserving the original inter-batch
+    gaps divided by speed (speed 0 replays as fast as possible).
+    """
+
+    def __init__(self, ticker_manager, batches, speed=1.0):
+        self.ticker_manager = ticker_manager
+        self.batches = batches
+        self.speed = speed
+
+        self.stats = {
+            'batches': 0,
+            'ticks_read': 0,
+            'ticks_dispatched': 0,
+            'max_schedule_lag_ms': 0.0,
+            'started_at': None,
+            'finished_at': None,
+        }
+
+    def run(self):
+        """Replay every batch; blocks until the stream ends"""
+        started = time.monotonic()
+        self.stats['started_at'] = time.time()
+        first_timestamp = None
+
+        for timestamp, ticks in self.batches:
+            if first_timestamp is None:
+                first_timestamp = timestamp
+
+            if self.speed > 0:
+                delay = (timestamp - first_timestamp) / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.stats['max_schedule_lag_ms'] = max(self.stats['max_schedule_lag_ms'], -delay * 1000)
+
+            sent_at = time.time()
+            for tick in ticks:
+                tick[SENT_AT_KEY] = sent_at
+
+            for shard in list(self.ticker_manager.shards):
+                if isinstance(shard.ticker, ReplayTicker):
+                    self.stats['ticks_dispatched'] += shard.ticker.dispatch(ticks)
+
+            self.stats['batches'] += 1
+            self.stats['ticks_read'] += len(ticks)
+
+        self.stats['finished_at'] = time.time()
+        logger.info(f"Replay finished: {self.stats['ticks_dispatched']} ticks in {self.stats['batches']} batches")
+        return self.stats
@@ -0,0 +1,85 @@
+# zerodhatrader/snapshots.py
+import logging
+import json
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+
+def get_snapshot_key(channel_name):
+    """Redis key holding the last message published on a channel"""
+    prefix = getattr(settings, 'PUBSUB_SETTINGS', {}).get('SNAPSHOT_KEY_PREFIX', 'snapshot:')
+    return f"{prefix}{channel_name}"
+
+def _get_redis_client():
+    """Lazily created sync Redis client for snapshot reads"""
+    global _redis_client
+    if _redis_client is None:
+        redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
+        _redis_client = redis.from_url(redis_url, decode_responses=True)
+    return _redis_client
+
+def get_tick_snapshots(instrument_tokens):
+    """
+    Latest cached tick per token, keyed by the token as a string like
+    kite.quote(). Tokens without a fresh snapshot are left out.
+    """
+    tokens = [str(token) for token in instrument_tokens]
+    if not tokens:
+        return {}
+
+    try:
+        messages = _get_redis_client().mget([get_snapshot_key(f"tick:{token}") for token in tokens])
+    except Exception as e:
+        logger.error(f"Error reading tick snapshots: {e}")
+        return {}
+
+    snapshots = {}
+    for token, message in zip(tokens, messages):
+        if message:
+            snapshots[token] = json.loads(message)['data']
+    return snapshots
+
+# Tick modes whose snapshots carry enough fields to stand in for kite.quote()
+QUOTE_MODES = ('quote', 'full')
+
+def tick_to_quote(tick):
+    """
+    Map a KiteTicker tick to the kite.quote() schema. Fields ticks never
+    carry (circuit limits) are None; quote-mode ticks have no depth or OI.
+    """
+    ohlc = tick.get('ohlc') or {}
+    last_price = tick.get('last_price')
+    close = ohlc.get('close')
+    return {
+        'instrument_token': tick['instrument_token'],
+        'timestamp': tick.get('exchange_timestamp'),
+        'last_trade_time': tick.get('last_trade_time'),
+        'last_price': last_price,
+        'last_quantity': tick.get('last_traded_quantity', 0),
+        'buy_quantity': tick.get('total_buy_quantity', 0),
+        'sell_quantity': tick.get('total_sell_quantity', 0),
+        'volume': tick.get('volume_traded', 0),
+        'average_price': tick.get('average_traded_price', 0),
+        'oi': tick.get('oi', 0),
+        'oi_day_high': tick.get('oi_day_high', 0),
+        'oi_day_low': tick.get('oi_day_low', 0),
+        'net_change': last_price - close if close and last_price is not None else 0,
+        'lower_circuit_limit': None,
+        'upper_circuit_limit': None,
+        'ohlc': ohlc,
+        'depth': tick.get('depth') or {'buy': [], 'sell': []},
+    }
+
+def get_quote_snapshots(instrument_tokens):
+    """
+    Fresh quote/full mode tick snapshots mapped to the kite.quote() schema,
+    keyed by token string. LTP-only snapshots are left out.
+    """
+    return {
+        token: tick_to_quote(tick)
+        for token, tick in get_tick_snapshots(instrument_tokens).items()
+        if tick.get('mode') in QUOTE_MODES
+    }
@@ -0,0 +1,302 @@
+# zerodhatrader/synthetic.py
+import logging
+import calendar
+import numpy as np
+from datetime import date, datetime, time as dt_time, timedelta
+from .calculations import OptionsCalculator
+from django.db import transaction
+from .models import Instrument
+from .instrument_registry import InstrumentRegistry
+from .instrument_sync import derive_underlying
+from .trading_calendar import TradingCalendar
+
+logger = logging.getLogger(__name__)
+
+# Synthetic index and option tokens live far above real Kite tokens but still
+# fit the unsigned 32-bit field of the Kite binary protocol and the tick
+# recorder. Real instruments are never written or deleted.
+SYNTHETIC_TOKEN_BASE = 3_000_000_000
+
+# Underlying definitions: index tradingsymbol, spot, strike step, lot size,
+# ATM vol, smile skew/curvature and daily volatility of the index
+DEFAULT_UNDERLYINGS = {
+    'NIFTY': {'tradingsymbol': 'NIFTY 50', 'spot': 24000.0, 'strike_step': 50,
+              'lot_size': 75, 'atm_vol': 0.13, 'skew': -0.25, 'smile': 1.2},
+    'BANKNIFTY': {'tradingsymbol': 'NIFTY BANK', 'spot': 52000.0, 'strike_step': 100,
+                  'lot_size': 35, 'atm_vol': 0.16, 'skew': -0.3, 'smile': 1.0},
+    'FINNIFTY': {'tradingsymbol': 'NIFTY FIN SERVICE', 'spot': 23500.0, 'strike_step': 50,
+                 'lot_size': 65, 'atm_vol': 0.15, 'skew': -0.25, 'smile': 1.0},
+}
+
+# Correlation of index returns (NIFTY, BANKNIFTY, FINNIFTY order of the spec)
+DEFAULT_CORRELATION = 0.8
+
+# Trading session used for tick timestamps and annualizing spot moves
+SESSION_OPEN = dt_time(9, 15)
+SESSION_SECONDS = 6.25 * 3600
+TRADING_DAYS_PER_YEAR = 252
+
+MONTH_CODES = {10: 'O', 11: 'N', 12: 'D'}
+
+def _weekday_expiries(trade_date, weekly, monthly, weekday=calendar.THURSDAY):
+    """
+    (expiry, is_monthly) for the next weekly and monthly expiries on a
+    weekday; an expiry falling on an exchange holiday moves to the trading
+    day before it.
+    """
+    trading_calendar = TradingCalendar.get_instance()
+    expiries = {}
+
+    day = trade_date + timedelta(days=(weekday - trade_date.weekday()) % 7)
+    for _ in range(weekly):
+        expiries[trading_calendar.previous_trading_day(day)] = False
+        day += timedelta(days=7)
+
+    year, month = trade_date.year, trade_date.month
+    while len([e for e, m in expiries.items() if m]) < monthly:
+        last_day = date(year, month, calendar.monthrange(year, month)[1])
+        monthly_expiry = last_day - timedelta(days=(last_day.weekday() - weekday) % 7)
+        monthly_expiry = trading_calendar.previous_trading_day(monthly_expiry)
+        if monthly_expiry >= trade_date:
+            expiries[monthly_expiry] = True
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+    return sorted(expiries.items())
+
+def _option_symbol(name, expiry, is_monthly, strike, option_type):
+    """Kite style tradingsymbol, e.g. NIFTY25OCT24000CE or NIFTY25O0924000CE"""
+    if is_monthly:
+        return f"{name}{expiry:%y}{expiry:%b}".upper() + f"{int(strike)}{option_type}"
+    month_code = MONTH_CODES.get(expiry.month, str(expiry.month))
+    return f"{name}{expiry:%y}{month_code}{expiry:%d}{int(strike)}{option_type}"
+
+def build_instrument_universe(trade_date=None, underlyings=None, weekly_expiries=4,
+                              monthly_expiries=3, strikes_each_side=100):
+    """
+    Synthetic NFO universe in the kite.instruments() row format: one index
+    row per underlying plus CE/PE contracts for every expiry and strike, all
+    with tokens from SYNTHETIC_TOKEN_BASE up.
+    """
+    trade_date = trade_date or date.today()
+    underlyings = underlyings or DEFAULT_UNDERLYINGS
+
+    rows = []
+    token = SYNTHETIC_TOKEN_BASE
+    for name, spec in underlyings.items():
+        rows.append({
+            'instrument_token': token,
+            'exchange_token': token >> 8,
+            'tradingsymbol': spec['tradingsymbol'],
+            'name': spec['tradingsymbol'],
+            'last_price': spec['spot'],
+            'expiry': None,
+            'strike': 0,
+            'tick_size': 0.0,
+            'lot_size': 0,
+            'instrument_type': 'EQ',
+            'segment': 'INDICES',
+            'exchange': 'NSE',
+        })
+        token += 1
+
+        step = spec['strike_step']
+        atm = round(spec['spot'] / step) * step
+        strikes = [atm + step * i for i in range(-strikes_each_side, strikes_each_side + 1)]
+
+        for expiry, is_monthly in _weekday_expiries(trade_date, weekly_expiries, monthly_expiries):
+            for strike in strikes:
+                for option_type in ('CE', 'PE'):
+                    rows.append({
+                        'instrument_token': token,
+                        'exchange_token': token >> 8,
+                        'tradingsymbol': _option_symbol(name, expiry, is_monthly, strike, option_type),
+                        'name': name,
+                        'last_price': 0.0,
+                        'expiry': expiry,
+                        'strike': float(strike),
+                        'tick_size': 0.05,
+                        'lot_size': spec['lot_size'],
+                        'instrument_type': option_type,
+                        'segment': 'NFO-OPT',
+                        'exchange': 'NFO',
+                    })
+                    token += 1
+
+    return rows
+
+def load_instruments(rows, batch_size=1000):
+    """
+    Replace previously loaded synthetic rows in the Instrument table. Only
+    tokens from SYNTHETIC_TOKEN_BASE up are touched.
+    """
+    real = [row['tradingsymbol'] for row in rows if row['instrument_token'] < SYNTHETIC_TOKEN_BASE]
+    if real:
+        raise ValueError(f"Refusing to load rows with real instrument tokens: {', '.join(real[:5])}")
+
+    instruments = [
+        Instrument(underlying=derive_underlying(row['tradingsymbol'], row['name'], row['segment'],
+                                                row['instrument_type']), **row)
+        for row in rows
+    ]
+    with transaction.atomic():
+        Instrument.objects.filter(instrument_token__gte=SYNTHETIC_TOKEN_BASE).delete()
+        Instrument.objects.bulk_create(instruments, batch_size=batch_size)
+        # Same registry refresh a sync triggers
+        transaction.on_commit(InstrumentRegistry.notify_changed)
+    logger.info(f"Loaded {len(instruments)} synthetic instruments")
+    return len(instruments)
+
+class SyntheticMarket:
+    """
+    Correlated tick streams for a synthetic universe.
+
+    Index spots follow correlated geometric Brownian motion. Every option is
+    priced with Black-Scholes at a volatility from a per-underlying smile
+    (skew and curvature in log-moneyness, flatter for later expiries), so
+    implied volatility recovered from the LTP reproduces the smile. OI follows
+    a lot-sized random walk around a bell curve centred at the money.
+    """
+
+    def __init__(self, rows, trade_date=None, underlyings=None, seed=7,
+                 correlation=DEFAULT_CORRELATION, options_calculator=None):
+        self.trade_date = trade_date or date.today()
+        self.underlyings = underlyings or DEFAULT_UNDERLYINGS
+        self.calc = options_calculator or OptionsCalculator()
+        self.rng = np.random.default_rng(seed)
+
+        self.names = [name for name in self.underlyings if any(row['name'] == name for row in rows)]
+        index_rows = {row['tradingsymbol']: row['instrument_token'] for row in rows if row['segment'] == 'INDICES'}
+        self.index_tokens = np.array([index_rows[self.underlyings[name]['tradingsymbol']] for name in self.names],
+                                     dtype=np.int64)
+        self.spots = np.array([self.underlyings[name]['spot'] for name in self.names])
+        self.daily_vols = np.array([self.underlyings[name]['atm_vol'] for name in self.names]) / np.sqrt(TRADING_DAYS_PER_YEAR)
+
+        size = len(self.names)
+        correlation_matrix = np.full((size, size), correlation) + np.eye(size) * (1 - correlation)
+        self.cholesky = np.linalg.cholesky(correlation_matrix)
+
+        options = [row for row in rows if row['segment'] == 'NFO-OPT' and row['name'] in self.names]
+        self.tokens = np.array([row['instrument_token'] for row in options], dtype=np.int64)
+        self.underlying_index = np.array([self.names.index(row['name']) for row in options], dtype=np.int64)
+        self.strikes = np.array([row['strike'] for row in options])
+        self.option_types = np.array([row['instrument_type'] for row in options])
+        self.lot_sizes = np.array([row['lot_size'] for row in options], dtype=np.int64)
+        self.expiries = np.array([row['expiry'] for row in options], dtype='datetime64[D]')
+        self.time_to_expiry = np.maximum(
+            np.busday_count(np.datetime64(self.trade_date, 'D'), self.expiries,
+                            busdaycal=self.calc.trading_calendar.busdaycal), 1
+        ) / TRADING_DAYS_PER_YEAR
+
+        self.atm_vols = np.array([self.underlyings[self.names[i]]['atm_vol'] for i in self.underlying_index])
+        self.skews = np.array([self.underlyings[self.names[i]]['skew'] for i in self.underlying_index])
+        self.smiles = np.array([self.underlyings[self.names[i]]['smile'] for i in self.underlying_index])
+
+        moneyness = np.log(self.strikes / self.spots[self.underlying_index])
+        bell = np.exp(-(moneyness / 0.03) ** 2)
+        self.oi = (self.lot_sizes * np.round(50 + 5000 * bell * self.rng.uniform(0.5, 1.5, len(self.tokens)))).astype(np.int64)
+        self.volume = np.zeros(len(self.tokens), dtype=np.int64)
+
+        # Activity weight: near-the-money strikes tick far more often
+        self.activity = 0.05 + 0.95 * bell
+
+        self.clock = datetime.combine(self.trade_date, SESSION_OPEN)
+        self.prices = self._price_options()
+
+    def smile_volatility(self, spot=None):
+        """Implied volatility of every option under the current spots"""
+        spot = self.spots[self.underlying_index] if spot is None else spot
+        moneyness = np.log(self.strikes / spot)
+        # Wings flatten with time: scale skew and curvature by 1/sqrt(T in months)
+        term = 1.0 / np.sqrt(np.maximum(self.time_to_expiry * 12, 0.25))
+        return np.maximum(self.atm_vols + term * (self.skews * moneyness + self.smiles * moneyness ** 2), 0.03)
+
+    def _price_options(self):
+        """Tick-rounded option prices at the current spots"""
+        spot = self.spots[self.underlying_index]
+        prices = self.calc.black_scholes_batch(spot, self.strikes, self.time_to_expiry,
+                                               self.smile_volatility(spot), self.option_types)['price']
+        return np.maximum(np.round(prices / 0.05) * 0.05, 0.05)
+
+    def chain_arrays(self):
+        """Current chain as arrays for OptionsCalculator batch methods"""
+        return {
+            'instrument_token': self.tokens,
+            'spot': self.spots[self.underlying_index],
+            'strike': self.strikes,
+            'time_to_expiry': self.time_to_expiry,
+            'option_type': self.option_types,
+            'volatility': self.smile_volatility(),
+            'price': self.prices,
+        }
+
+    def partition_map(self):
+        """Token -> underlying name, for recording ticks per underlying"""
+        partitions = dict(zip(self.tokens.tolist(), (self.names[i] for i in self.underlying_index)))
+        partitions.update(zip(self.index_tokens.tolist(), self.names))
+        return partitions
+
+    def _depth(self, price):
+        """Five-level book around a price"""
+        spread = 0.05 * int(self.rng.integers(1, 4))
+        bid = max(price - spread / 2, 0.05)
+        return {
+            'buy': [{'price': round(max(bid - 0.05 * level, 0.05), 2), 'quantity': int(self.rng.integers(1, 40)) * 25,
+                     'orders': int(self.rng.integers(1, 10))} for level in range(5)],
+            'sell': [{'price': round(bid + spread + 0.05 * level, 2), 'quantity': int(self.rng.integers(1, 40)) * 25,
+                      'orders': int(self.rng.integers(1, 10))} for level in range(5)],
+        }
+
+    def step(self, dt_seconds=1.0, ticks_per_step=500, with_depth=True):
+        """
+        Advance the market by dt_seconds and return one Kite FULL mode tick
+        batch: every index plus about ticks_per_step option ticks.
+        """
+        dt_days = dt_seconds / SESSION_SECONDS
+        shocks = self.cholesky @ self.rng.standard_normal(len(self.names))
+        self.spots *= np.exp(-0.5 * self.daily_vols ** 2 * dt_days + self.daily_vols * np.sqrt(dt_days) * shocks)
+        self.clock += timedelta(seconds=dt_seconds)
+
+        self.prices = self._price_options()
+
+        probability = np.minimum(self.activity * ticks_per_step / self.activity.sum(), 1.0)
+        active = np.flatnonzero(self.rng.random(len(self.tokens)) < probability)
+
+        traded = self.lot_sizes[active] * self.rng.integers(1, 20, len(active))
+        self.volume[active] += traded
+        self.oi[active] = np.maximum(self.oi[active] + self.lot_sizes[active] * self.rng.integers(-5, 6, len(active)), 0)
+
+        ticks = []
+        for i, name in enumerate(self.names):
+            ticks.append({
+                'tradable': False,
+                'mode': 'full',
+                'instrument_token': int(self.index_tokens[i]),
+                'last_price': round(float(self.spots[i]), 2),
+                'exchange_timestamp': self.clock,
+            })
+
+        for position, i in enumerate(active.tolist()):
+            price = round(float(self.prices[i]), 2)
+            tick = {
+                'tradable': True,
+                'mode': 'full',
+                'instrument_token': int(self.tokens[i]),
+                'last_price': price,
+                'last_traded_quantity': int(traded[position]),
+                'volume_traded': int(self.volume[i]),
+                'oi': int(self.oi[i]),
+                'exchange_timestamp': self.clock,
+            }
+            if with_depth:
+                tick['depth'] = self._depth(price)
+            ticks.append(tick)
+
+        return ticks
+
+    def iter_batches(self, seconds, step_seconds=0.25, ticks_per_step=500, with_depth=True):
+        """Yield (epoch seconds, ticks) for TickReplayer over a simulated span"""
+        for _ in range(int(seconds / step_seconds)):
+            ticks = self.step(step_seconds, ticks_per_step, with_depth)
+            yield self.clock.timestamp(), ticks
@@ -0,0 +1,125 @@
+# zerodhatrader/tests/test_calculations.py
+import numpy as np
+from django.test import SimpleTestCase
+from scipy.stats import norm
+from zerodhatrader.calculations import OptionsCalculator
+
+def scalar_greeks(calc, spot, strike, t, vol, option_type):
+    """The per-contract formulas black_scholes_batch replaced, for comparison"""
+    r = calc.risk_free_rate
+    d1 = (np.log(spot / strike) + (r + 0.5 * vol ** 2) * t) / (vol * np.sqrt(t))
+    d2 = d1 - vol * np.sqrt(t)
+    discounted_strike = strike * np.exp(-r * t)
+    decay = -spot * norm.pdf(d1) * vol / (2 * np.sqrt(t))
+    if option_type == 'CE':
+        price = spot * norm.cdf(d1) - discounted_strike * norm.cdf(d2)
+        delta = norm.cdf(d1)
+        theta = decay - r * discounted_strike * norm.cdf(d2)
+        rho = strike * t * np.exp(-r * t) * norm.cdf(d2) / 100
+    else:
+        price = discounted_strike * norm.cdf(-d2) - spot * norm.cdf(-d1)
+        delta = norm.cdf(d1) - 1
+        theta = decay + r * discounted_strike * norm.cdf(-d2)
+        rho = -strike * t * np.exp(-r * t) * norm.cdf(-d2) / 100
+    return {
+        'price': price,
+        'delta': delta,
+        'gamma': norm.pdf(d1) / (spot * vol * np.sqrt(t)),
+        'theta': theta / calc.trading_days_per_year,
+        'vega': spot * norm.pdf(d1) * np.sqrt(t) / 100,
+        'rho': rho,
+    }
+
+class BlackScholesBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.calc = OptionsCalculator()
+        strikes = np.arange(21000, 27001, 250, dtype=float)
+        self.strike = np.concatenate([strikes, strikes])
+        self.option_type = np.array(['CE'] * len(strikes) + ['PE'] * len(strikes))
+        self.spot = 24000.0
+        self.t = np.linspace(1, 60, len(self.strike)) / 252
+        self.vol = np.linspace(0.08, 0.6, len(self.strike))
+
+    def test_matches_scalar_formulas(self):
+        result = self.calc.black_scholes_batch(self.spot, self.strike, self.t, self.vol, self.option_type)
+        for i in range(len(self.strike)):
+            expected = scalar_greeks(self.calc, self.spot, self.strike[i], self.t[i], self.vol[i], self.option_type[i])
+            for name, value in expected.items():
+                self.assertAlmostEqual(result[name][i], value, places=8, msg=f"{name} at {i}")
+
+    def test_scalar_methods_round_price_to_tick(self):
+        price = self.calc.black_scholes_price(self.spot, 24100, 10 / 252, 0.15, 'CE')
+        expected = scalar_greeks(self.calc, self.spot, 24100, 10 / 252, 0.15, 'CE')['price']
+        self.assertAlmostEqual(price, round(expected / 0.05) * 0.05, places=9)
+        self.assertAlmostEqual(self.calc.calculate_delta(self.spot, 24100, 10 / 252, 0.15, 'PE'),
+                               scalar_greeks(self.calc, self.spot, 24100, 10 / 252, 0.15, 'PE')['delta'], places=12)
+
+    def test_lowercase_option_type(self):
+        upper = self.calc.black_scholes_batch(self.spot, 24000, 0.1, 0.2, 'PE')
+        lower = self.calc.black_scholes_batch(self.spot, 24000, 0.1, 0.2, 'pe')
+        self.assertEqual(float(upper['price']), float(lower['price']))
+
+    def test_expired_options_are_intrinsic(self):
+        strike = np.array([23000.0, 24000.0, 25000.0] * 2)
+        option_type = np.array(['CE'] * 3 + ['PE'] * 3)
+        for t in (0.0, -0.01):
+            result = self.calc.black_scholes_batch(24000.0, strike, t, 0.2, option_type)
+            np.testing.assert_array_equal(result['price'], [1000, 0, 0, 0, 0, 1000])
+            np.testing.assert_array_equal(result['delta'], [1, 0, 0, 0, 0, -1])
+            for name in ('gamma', 'theta', 'vega', 'rho'):
+                np.testing.assert_array_equal(result[name], np.zeros(6))
+
+    def test_expired_and_live_in_one_batch(self):
+        result = self.calc.black_scholes_batch(24000.0, 23500.0, np.array([0.0, 0.1]), 0.2, 'CE')
+        self.assertEqual(result['price'][0], 500.0)
+        self.assertAlmostEqual(result['price'][1],
+                               scalar_greeks(self.calc, 24000.0, 23500.0, 0.1, 0.2, 'CE')['price'], places=8)
+
+class ImpliedVolatilityBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.calc = OptionsCalculator()
+
+    def test_recovers_volatility_across_the_chain(self):
+        strike = np.tile(np.arange(22000, 26001, 200, dtype=float), 2)
+        option_type = np.repeat(['CE', 'PE'], len(strike) // 2)
+        vol = np.linspace(0.05, 1.5, len(strike))
+        t = 20 / 252
+        price = self.calc.black_scholes_batch(24000.0, strike, t, vol, option_type)['price']
+
+        result = self.calc.calculate_implied_volatility_batch(price, 24000.0, strike, t, option_type)
+
+        self.assertTrue(result['converged'].all())
+        # Convergence is on price, so only strikes whose price moves with volatility pin it down
+        sensitive = self.calc.black_scholes_batch(24000.0, strike, t, vol, option_type)['vega'] > 0.1
+        self.assertGreater(sensitive.sum(), len(strike) * 3 // 4)
+        np.testing.assert_allclose(result['iv'][sensitive], vol[sensitive], atol=1e-4)
+        self.assertTrue((result['iterations'] <= 100).all())
+        np.testing.assert_allclose(self.calc.black_scholes_batch(24000.0, strike, t, result['iv'], option_type)['price'],
+                                   price, atol=1e-4)
+
+    def test_no_solution_strikes_stay_in_the_bracket(self):
+        t = 20 / 252
+        good_price = float(self.calc.black_scholes_batch(24000.0, 24000.0, t, 0.2, 'CE')['price'])
+        # Below intrinsic value and above the spot: no volatility reproduces them
+        price = np.array([good_price, 1.0, 30000.0])
+        strike = np.array([24000.0, 22000.0, 24000.0])
+
+        result = self.calc.calculate_implied_volatility_batch(price, 24000.0, strike, t, 'CE')
+
+        np.testing.assert_array_equal(result['converged'], [True, False, False])
+        self.assertAlmostEqual(result['iv'][0], 0.2, places=3)
+        self.assertTrue(((result['iv'] >= 0.01) & (result['iv'] <= 5.0)).all())
+        self.assertAlmostEqual(result['iv'][1], 0.01, places=6)
+        self.assertAlmostEqual(result['iv'][2], 5.0, places=6)
+
+    def test_expired_options_are_not_solved(self):
+        result = self.calc.calculate_implied_volatility_batch(np.array([100.0, 300.0]), 24000.0, 23900.0,
+                                                              np.array([0.0, 10 / 252]), 'CE')
+        self.assertFalse(result['converged'][0])
+        self.assertEqual(result['iterations'][0], 0)
+        self.assertTrue(result['converged'][1])
+
+    def test_scalar_wrapper(self):
+        price = float(self.calc.black_scholes_batch(24000.0, 24500.0, 0.05, 0.25, 'PE')['price'])
+        self.assertAlmostEqual(self.calc.calculate_implied_volatility(price, 24000.0, 24500.0, 0.05, 'PE'), 0.25,
+                               places=3)
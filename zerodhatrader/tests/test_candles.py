@@ -0,0 +1,103 @@
+# zerodhatrader/tests/test_candles.py
+import threading
+from datetime import datetime
+from unittest import mock
+from django.test import SimpleTestCase
+from zerodhatrader.candles import IST, CandleAggregator, START, OPEN, LOW, CLOSE, VOLUME
+
+def tick(second, price, volume=None, oi=None, minute=15, token=1):
+    return {
+        'instrument_token': token,
+        'last_price': price,
+        'volume_traded': volume,
+        'oi': oi,
+        'exchange_timestamp': datetime(2025, 1, 2, 9, minute, second),
+    }
+
+def epoch(minute, second=0):
+    return int(datetime(2025, 1, 2, 9, minute, second, tzinfo=IST).timestamp())
+
+class CandleAggregatorTests(SimpleTestCase):
+    def setUp(self):
+        # No worker thread: bars are only closed and published when the test says so
+        with mock.patch.object(threading.Thread, 'start'):
+            self.aggregator = CandleAggregator(mock.MagicMock(), lambda kind, payload: payload,
+                                               intervals=('1m', '5m'))
+
+    def bar(self, interval='1m', token=1):
+        return self.aggregator.bars[(interval, token)]
+
+    def test_ohlc_within_a_bar(self):
+        self.aggregator.update([tick(1, 100, oi=5), tick(20, 103), tick(30, 99, oi=7), tick(50, 101)])
+        self.assertEqual(self.bar(), [epoch(15), 100, 103, 99, 101, 0, 7])
+        self.assertEqual(self.aggregator.stats['ticks_aggregated'], 4)
+
+    def test_rollover_closes_the_previous_bar(self):
+        self.aggregator.update([tick(10, 100), tick(50, 102)])
+        self.aggregator.update([tick(5, 101, minute=16)])
+
+        (key, closed), = self.aggregator.closed_to_publish
+        self.assertEqual(key, ('1m', 1))
+        self.assertEqual(closed[START:CLOSE + 1], [epoch(15), 100, 102, 100, 102])
+        self.assertEqual(self.bar()[START:CLOSE + 1], [epoch(16), 101, 101, 101, 101])
+        self.assertEqual(self.aggregator.closed_to_persist, self.aggregator.closed_to_publish)
+        self.assertEqual(self.aggregator.stats['bars_closed'], 1)
+        # The 5 minute bar spans both ticks
+        self.assertEqual(self.bar('5m')[START:CLOSE + 1], [epoch(15), 100, 102, 100, 101])
+
+    def test_late_ticks_for_closed_bars_are_ignored(self):
+        self.aggregator.update([tick(10, 100), tick(5, 101, minute=16)])
+        self.aggregator.update([tick(55, 90)])
+
+        self.assertEqual(self.bar()[START:CLOSE + 1], [epoch(16), 101, 101, 101, 101])
+        self.assertEqual(self.aggregator.closed_to_publish[0][1][LOW], 100)
+        self.assertEqual(self.bar('5m')[LOW], 90)
+
+    def test_volume_is_the_change_in_cumulative_volume(self):
+        self.aggregator.update([tick(1, 100, volume=1000), tick(30, 100, volume=1030)])
+        self.aggregator.update([tick(5, 100, volume=1080, minute=16), tick(6, 100, minute=16)])
+        self.assertEqual(self.aggregator.closed_to_publish[0][1][VOLUME], 30)
+        self.assertEqual(self.bar()[VOLUME], 50)
+        self.assertEqual(self.bar('5m')[VOLUME], 80)
+
+        # A lower cumulative volume (new session) restarts the count without a negative delta
+        self.aggregator.update([tick(10, 100, volume=20, minute=16), tick(11, 100, volume=25, minute=16)])
+        self.assertEqual(self.bar()[VOLUME], 55)
+
+    def test_ticks_without_price_are_skipped(self):
+        self.aggregator.update([tick(1, 0), tick(2, None)])
+        self.assertEqual(self.aggregator.bars, {})
+
+    def test_stale_bars_close_after_the_grace_period(self):
+        self.aggregator.update([tick(10, 100)])
+        self.aggregator.close_stale_bars(now=epoch(16, 1))
+        self.assertIn(('1m', 1), self.aggregator.bars)
+        self.aggregator.close_stale_bars(now=epoch(16, 2))
+        self.assertNotIn(('1m', 1), self.aggregator.bars)
+        self.assertEqual(self.aggregator.stats['bars_closed'], 1)
+
+    def test_submitted_batches_are_folded_by_drain(self):
+        self.aggregator.max_pending_batches = 2
+        self.aggregator.submit([tick(1, 100)])
+        self.aggregator.submit([tick(2, 101)])
+        self.aggregator.submit([tick(3, 102)])
+        self.assertEqual(self.aggregator.bars, {})
+        self.assertEqual(self.aggregator.get_stats()['pending_batches'], 2)
+
+        self.aggregator.drain()
+        self.assertEqual(self.bar()[OPEN], 101)
+        stats = self.aggregator.get_stats()
+        self.assertEqual((stats['dropped_batches'], stats['pending_batches']), (1, 0))
+
+    def test_publish_updates_sends_closed_and_open_bars(self):
+        self.aggregator.update([tick(10, 100, oi=3), tick(5, 101, minute=16)])
+        self.aggregator.publish_updates()
+
+        pipe = self.aggregator.redis_client.pipeline.return_value
+        published = [call.args for call in pipe.publish.call_args_list]
+        self.assertEqual(len(published), 3)
+        closed = [payload for channel, payload in published if payload['closed']]
+        self.assertEqual(closed[0]['start'], '2025-01-02 09:15:00')
+        self.assertEqual(closed[0]['oi'], 3)
+        self.assertEqual({channel for channel, _ in published}, {'candle:1m:1', 'candle:5m:1'})
+        self.assertEqual(self.aggregator.dirty, set())
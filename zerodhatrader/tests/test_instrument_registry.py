@@ -0,0 +1,156 @@
+# zerodhatrader/tests/test_instrument_registry.py
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+import numpy as np
+from django.test import TestCase, override_settings
+from zerodhatrader import instrument_registry
+from zerodhatrader.instrument_registry import InstrumentRegistry, build_registry_arrays
+from zerodhatrader.instrument_snapshot import SECTIONS, build_snapshot_arrays, read_snapshot, write_snapshot
+from zerodhatrader.models import Instrument
+
+EXPIRY = date(2025, 1, 30)
+
+class FakeVersionStore:
+    """The two Redis calls the registry makes for its version key"""
+
+    def __init__(self):
+        self.values = {}
+        self.down = False
+
+    def get(self, key):
+        if self.down:
+            raise ConnectionError('redis down')
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+def make_instrument(token, tradingsymbol, instrument_type, strike, expiry=EXPIRY, exchange='NFO'):
+    return Instrument(instrument_token=token, exchange_token=token // 256, tradingsymbol=tradingsymbol,
+                      name='NIFTY', last_price=Decimal('10.5'), expiry=expiry, strike=Decimal(strike),
+                      tick_size=Decimal('0.05'), lot_size=75, instrument_type=instrument_type,
+                      segment='NFO-OPT', exchange=exchange, underlying='NIFTY')
+
+class InstrumentRegistryTests(TestCase):
+    def setUp(self):
+        Instrument.objects.bulk_create([
+            make_instrument(2001, 'NIFTY25JAN24000CE', 'CE', 24000),
+            make_instrument(2002, 'NIFTY25JAN24000PE', 'PE', 24000),
+            make_instrument(2003, 'NIFTY25JAN24100CE', 'CE', 24100),
+            Instrument(instrument_token=256265, exchange_token=1001, tradingsymbol='NIFTY 50', name='',
+                       last_price=None, expiry=None, strike=None, tick_size=Decimal('0'), lot_size=0,
+                       instrument_type='EQ', segment='INDICES', exchange='NSE', underlying='NIFTY'),
+        ])
+
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'instruments.snap')
+        self.store = FakeVersionStore()
+
+        self.addCleanup(self.tempdir.cleanup)
+        self.enterContext(override_settings(INSTRUMENT_REGISTRY={
+            'VERSION_KEY': 'instruments:version', 'CHECK_SECONDS': 0, 'SNAPSHOT_PATH': self.path,
+        }))
+        self.enterContext(mock.patch.object(instrument_registry, '_get_redis_client', return_value=self.store))
+
+        InstrumentRegistry._instance = None
+        self.addCleanup(setattr, InstrumentRegistry, '_instance', None)
+
+    def test_snapshot_round_trip(self):
+        arrays = build_snapshot_arrays(*build_registry_arrays())
+        write_snapshot(self.path, arrays, 'v1')
+
+        version, mapped = read_snapshot(self.path)
+        self.assertEqual(version, 'v1')
+        for name in SECTIONS:
+            # Byte comparison, since NaT expiries never compare equal
+            self.assertEqual(mapped[name].dtype, arrays[name].dtype, msg=name)
+            self.assertEqual(mapped[name].tobytes(), np.ascontiguousarray(arrays[name]).tobytes(), msg=name)
+
+        registry = InstrumentRegistry.from_snapshot(self.path)
+        self.assertEqual(len(registry), 4)
+        self.assertEqual(registry.get(2002), {
+            'instrument_token': 2002,
+            'exchange_token': 7,
+            'tradingsymbol': 'NIFTY25JAN24000PE',
+            'name': 'NIFTY',
+            'last_price': 10.5,
+            'expiry': '2025-01-30',
+            'strike': 24000.0,
+            'tick_size': 0.05,
+            'lot_size': 75,
+            'instrument_type': 'PE',
+            'segment': 'NFO-OPT',
+            'exchange': 'NFO',
+            'underlying': 'NIFTY',
+        })
+        self.assertIsNone(registry.get(9999))
+        self.assertEqual(registry.get(256265)['expiry'], None)
+        self.assertEqual(registry.get_token('NIFTY25JAN24100CE'), 2003)
+        self.assertEqual(registry.get_token('NIFTY 50', exchange='NSE'), 256265)
+        self.assertIsNone(registry.get_token('NIFTY 50'))
+
+        chain = registry.get_chain('NIFTY', '2025-01-30')
+        np.testing.assert_array_equal(chain['strikes'], [24000, 24100])
+        np.testing.assert_array_equal(chain['CE'], [2001, 2003])
+        np.testing.assert_array_equal(chain['PE'], [2002, -1])
+        self.assertEqual(registry.get_expiries('NIFTY'), [EXPIRY])
+        self.assertEqual([row['instrument_token'] for row in registry.get_options('NIFTY', strikes=[24000])],
+                         [2001, 2002])
+
+    def test_missing_and_corrupt_snapshots(self):
+        self.assertIsNone(read_snapshot(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot')
+        with self.assertRaises(ValueError):
+            read_snapshot(self.path)
+
+    def test_reloads_when_the_version_key_changes(self):
+        registry = InstrumentRegistry.get_instance()
+        self.assertEqual(len(registry), 4)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertIs(InstrumentRegistry.get_instance(), registry)
+
+        # A sync elsewhere on the host writes a new snapshot and publishes its version
+        Instrument.objects.bulk_create([make_instrument(2004, 'NIFTY25JAN24100PE', 'PE', 24100)])
+        with mock.patch.object(InstrumentRegistry, '_instance', registry):
+            InstrumentRegistry.notify_changed()
+        published = self.store.values['instruments:version']
+        self.assertNotEqual(published, registry.version)
+
+        reloaded = InstrumentRegistry.get_instance()
+        self.assertIsNot(reloaded, registry)
+        self.assertEqual(reloaded.version, published)
+        self.assertEqual(reloaded.get_token('NIFTY25JAN24100PE'), 2004)
+
+        # The old mapping keeps serving readers that still hold it
+        self.assertIsNone(registry.get(2004))
+        self.assertEqual(len(registry), 4)
+
+    def test_rebuilds_when_the_snapshot_is_behind_the_published_version(self):
+        InstrumentRegistry.get_instance()
+        Instrument.objects.filter(instrument_token=2003).delete()
+        self.store.set('instruments:version', 'from-another-host')
+
+        registry = InstrumentRegistry.get_instance()
+        self.assertEqual(registry.version, 'from-another-host')
+        self.assertIsNone(registry.get(2003))
+        self.assertEqual(read_snapshot(self.path)[0], 'from-another-host')
+
+    def test_keeps_the_current_registry_while_redis_is_down(self):
+        registry = InstrumentRegistry.get_instance()
+        self.store.down = True
+        with self.assertLogs('zerodhatrader.instrument_registry', level='ERROR'):
+            self.assertIs(InstrumentRegistry.get_instance(), registry)
+
+    def test_falls_back_to_memory_when_the_snapshot_cannot_be_written(self):
+        blocker = os.path.join(self.tempdir.name, 'blocker')
+        open(blocker, 'w').close()
+        with override_settings(INSTRUMENT_REGISTRY={'CHECK_SECONDS': 0,
+                                                    'SNAPSHOT_PATH': os.path.join(blocker, 'instruments.snap')}):
+            with self.assertLogs('zerodhatrader.instrument_registry', level='ERROR'):
+                registry = InstrumentRegistry.get_instance()
+        self.assertEqual(len(registry), 4)
+        self.assertEqual(registry.get_token('NIFTY25JAN24000CE'), 2001)
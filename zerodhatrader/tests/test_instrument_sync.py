@@ -0,0 +1,107 @@
+# zerodhatrader/tests/test_instrument_sync.py
+import io
+from datetime import date
+from decimal import Decimal
+from django.test import SimpleTestCase, TestCase
+from zerodhatrader.instrument_registry import InstrumentRegistry
+from zerodhatrader.instrument_sync import derive_underlying, sync_instruments, sync_instruments_csv
+from zerodhatrader.models import Instrument
+
+CSV_HEADER = ('instrument_token,exchange_token,tradingsymbol,name,last_price,expiry,strike,tick_size,'
+              'lot_size,instrument_type,segment,exchange\n')
+
+def dump_row(token, tradingsymbol, last_price='0', expiry='2025-01-30', strike='24000', instrument_type='CE',
+             name='NIFTY', segment='NFO-OPT', exchange='NFO'):
+    """One kite.instruments()-style row as read from the CSV dump"""
+    return {
+        'instrument_token': str(token),
+        'exchange_token': str(token // 256),
+        'tradingsymbol': tradingsymbol,
+        'name': name,
+        'last_price': last_price,
+        'expiry': expiry,
+        'strike': strike,
+        'tick_size': '0.05',
+        'lot_size': '75',
+        'instrument_type': instrument_type,
+        'segment': segment,
+        'exchange': exchange,
+    }
+
+class DeriveUnderlyingTests(SimpleTestCase):
+    def test_index_rows_map_to_derivative_symbol(self):
+        self.assertEqual(derive_underlying('NIFTY 50', '', 'INDICES', 'EQ'), 'NIFTY')
+        self.assertEqual(derive_underlying('NIFTY BANK', '', 'INDICES', 'EQ'), 'BANKNIFTY')
+        self.assertEqual(derive_underlying('INDIA VIX', '', 'INDICES', 'EQ'), 'INDIAVIX')
+
+    def test_derivatives_use_name(self):
+        self.assertEqual(derive_underlying('NIFTY25JAN24000CE', 'NIFTY', 'NFO-OPT', 'CE'), 'NIFTY')
+        self.assertEqual(derive_underlying('RELIANCE25JANFUT', ' reliance ', 'NFO-FUT', 'FUT'), 'RELIANCE')
+
+    def test_derivatives_without_name_use_symbol_prefix(self):
+        self.assertEqual(derive_underlying('M&M25JAN3000PE', '', 'NFO-OPT', 'PE'), 'M&M')
+        self.assertEqual(derive_underlying('BAJAJ-AUTO25JANFUT', '', 'NFO-FUT', 'FUT'), 'BAJAJ-AUTO')
+
+    def test_everything_else_uses_tradingsymbol(self):
+        self.assertEqual(derive_underlying('RELIANCE', 'RELIANCE INDUSTRIES', 'NSE', 'EQ'), 'RELIANCE')
+
+class SyncInstrumentsTests(TestCase):
+    def setUp(self):
+        self.dump = [
+            dump_row(1001, 'NIFTY25JAN24000CE'),
+            dump_row(1002, 'NIFTY25JAN24000PE', instrument_type='PE'),
+            dump_row(1003, 'NIFTY25JAN24100CE', strike='24100'),
+        ]
+        with self.captureOnCommitCallbacks():
+            sync_instruments(self.dump)
+
+    def test_initial_load(self):
+        self.assertEqual(Instrument.objects.count(), 3)
+        instrument = Instrument.objects.get(instrument_token=1003)
+        self.assertEqual(instrument.strike, Decimal('24100'))
+        self.assertEqual(instrument.expiry, date(2025, 1, 30))
+        self.assertEqual(instrument.underlying, 'NIFTY')
+
+    def test_counts_each_kind_of_change(self):
+        dump = [
+            self.dump[0],
+            dump_row(1002, 'NIFTY25JAN24000PE', last_price='12.5', instrument_type='PE'),
+            dump_row(1004, 'NIFTY 50', expiry='', strike='0', instrument_type='EQ', name='',
+                     segment='INDICES', exchange='NSE'),
+        ]
+        with self.captureOnCommitCallbacks() as callbacks:
+            result = sync_instruments(dump, batch_size=2)
+
+        self.assertEqual((result['total'], result['inserted'], result['updated'], result['deleted'],
+                          result['unchanged']), (3, 1, 1, 1, 1))
+        self.assertEqual(sorted(Instrument.objects.values_list('instrument_token', flat=True)), [1001, 1002, 1004])
+        self.assertEqual(Instrument.objects.get(instrument_token=1002).last_price, Decimal('12.5'))
+        self.assertEqual(Instrument.objects.get(instrument_token=1004).underlying, 'NIFTY')
+        self.assertEqual(callbacks, [InstrumentRegistry.notify_changed])
+
+    def test_unchanged_dump_writes_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            result = sync_instruments(iter(self.dump))
+
+        self.assertEqual((result['inserted'], result['updated'], result['deleted'], result['unchanged']),
+                         (0, 0, 0, 3))
+        self.assertEqual(callbacks, [])
+
+    def test_failed_sync_rolls_back_every_batch(self):
+        def failing_dump():
+            yield dump_row(1001, 'NIFTY25JAN24000CE', last_price='99')
+            yield dump_row(1005, 'NIFTY25JAN24200CE', strike='24200')
+            raise ConnectionError('download interrupted')
+
+        with self.assertRaises(ConnectionError):
+            sync_instruments(failing_dump(), batch_size=1)
+
+        self.assertEqual(sorted(Instrument.objects.values_list('instrument_token', flat=True)), [1001, 1002, 1003])
+        self.assertEqual(Instrument.objects.get(instrument_token=1001).last_price, Decimal('0'))
+
+    def test_csv_dump(self):
+        lines = [CSV_HEADER] + [','.join(row.values()) + '\n' for row in self.dump[:2]]
+        with self.captureOnCommitCallbacks():
+            result = sync_instruments_csv(io.StringIO(''.join(lines)), use_copy=False)
+
+        self.assertEqual((result['total'], result['deleted'], result['unchanged']), (2, 1, 2))
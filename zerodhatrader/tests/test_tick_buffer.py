@@ -0,0 +1,48 @@
+# zerodhatrader/tests/test_tick_buffer.py
+from django.test import SimpleTestCase
+from zerodhatrader.tick_buffer import CONFLATE, DROP_OLDEST, TickBuffer
+
+def tick(token, price):
+    return {'instrument_token': token, 'last_price': price}
+
+class TickBufferTests(SimpleTestCase):
+    def test_drop_oldest_discards_the_oldest_batch(self):
+        buffer = TickBuffer(max_batches=2, overflow_policy=DROP_OLDEST)
+        first, second, third = [tick(1, 10), tick(2, 20)], [tick(1, 11)], [tick(1, 12)]
+        for batch in (first, second, third):
+            buffer.put(batch)
+
+        stats = buffer.get_stats()
+        self.assertEqual((stats['enqueued_batches'], stats['enqueued_ticks']), (3, 4))
+        self.assertEqual((stats['dropped_batches'], stats['dropped_ticks']), (1, 2))
+        self.assertEqual((stats['queued_batches'], stats['max_depth']), (2, 2))
+        self.assertEqual(buffer.get(timeout=0), second)
+        self.assertEqual(buffer.get(timeout=0), third)
+        self.assertIsNone(buffer.get(timeout=0))
+
+    def test_conflate_keeps_the_latest_tick_per_token(self):
+        buffer = TickBuffer(max_batches=1, overflow_policy=CONFLATE)
+        buffer.put([tick(1, 10)])
+        buffer.put([tick(1, 11), tick(2, 20)])
+        buffer.put([tick(1, 12)])
+
+        stats = buffer.get_stats()
+        self.assertEqual((stats['conflated_ticks'], stats['conflated_pending']), (1, 2))
+        self.assertEqual((stats['dropped_batches'], stats['dropped_ticks']), (0, 0))
+
+        self.assertEqual(buffer.get(timeout=0), [tick(1, 10)])
+        # Still conflating until the merged ticks are taken, so ordering per token holds
+        buffer.put([tick(2, 21)])
+        self.assertEqual(buffer.get_stats()['conflated_ticks'], 2)
+        self.assertEqual(buffer.get(timeout=0), [tick(1, 12), tick(2, 21)])
+        self.assertIsNone(buffer.get(timeout=0))
+
+        buffer.put([tick(3, 30)])
+        self.assertEqual(buffer.get_stats()['queued_batches'], 1)
+
+    def test_get_times_out_when_empty(self):
+        self.assertIsNone(TickBuffer().get(timeout=0.01))
+
+    def test_rejects_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            TickBuffer(overflow_policy='block')
@@ -0,0 +1,40 @@
+# zerodhatrader/tests/test_trading_calendar.py
+from datetime import date, timedelta
+import numpy as np
+from django.test import SimpleTestCase
+from zerodhatrader.trading_calendar import NSE_HOLIDAYS, TradingCalendar
+
+class TradingCalendarTests(SimpleTestCase):
+    def setUp(self):
+        self.calendar = TradingCalendar()
+
+    def test_skips_holidays(self):
+        # 2025-03-14 (Friday) is Holi
+        self.assertEqual(self.calendar.days_to_expiry(date(2025, 3, 17), today=date(2025, 3, 12)), 2)
+        self.assertFalse(self.calendar.is_trading_day(date(2025, 3, 14)))
+        self.assertEqual(self.calendar.previous_trading_day(date(2025, 3, 16)), date(2025, 3, 13))
+
+    def test_across_year_end(self):
+        # 24, 26, 27, 30, 31 December and 1 January; Christmas is a holiday
+        self.assertEqual(self.calendar.days_to_expiry(date(2025, 1, 2), today=date(2024, 12, 24)), 6)
+        self.assertEqual(self.calendar.days_to_expiry('2026-01-01', today=date(2025, 12, 24)), 5)
+
+    def test_at_least_one_day(self):
+        self.assertEqual(self.calendar.days_to_expiry(date(2025, 3, 12), today=date(2025, 3, 12)), 1)
+        self.assertEqual(self.calendar.days_to_expiry(date(2025, 3, 10), today=date(2025, 3, 12)), 1)
+
+    def test_matches_busday_count(self):
+        holidays = np.array(NSE_HOLIDAYS, dtype='datetime64[D]')
+        start = date(2024, 1, 1)
+        for offset in range(0, 1000, 37):
+            today = start + timedelta(days=offset)
+            expiry = today + timedelta(days=offset % 90 + 1)
+            expected = max(int(np.busday_count(today, expiry, holidays=holidays)), 1)
+            self.assertEqual(self.calendar.days_to_expiry(expiry, today=today), expected, msg=f"{today} -> {expiry}")
+
+    def test_uncovered_years_count_weekdays_and_warn_once(self):
+        with self.assertLogs('zerodhatrader.trading_calendar', level='WARNING') as logs:
+            self.assertEqual(self.calendar.days_to_expiry(date(2027, 1, 11), today=date(2026, 12, 31)), 7)
+            self.calendar.days_to_expiry(date(2027, 1, 12), today=date(2026, 12, 31))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('2027', logs.output[0])
@@ -0,0 +1,96 @@
+# zerodhatrader/tick_buffer.py
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = 'drop_oldest'
+CONFLATE = 'conflate'
+
+class TickBuffer:
+    """
+    Bounded hand-off of raw tick batches from the KiteTicker callback thread
+    to the publisher thread.
+
+    put() only appends a batch reference under a short lock, so the Kite
+    websocket reader never waits on Redis. When the buffer is full the
+    overflow policy applies:
+      - drop_oldest: the oldest queued batch is discarded
+      - conflate: incoming ticks are merged into a latest-tick-per-token map
+        that is published once the queued batches have drained
+    """
+
+    def __init__(self, max_batches=1000, overflow_policy=CONFLATE):
+        if overflow_policy not in (DROP_OLDEST, CONFLATE):
+            raise ValueError(f"Unknown tick buffer overflow policy: {overflow_policy}")
+
+        self.max_batches = max_batches
+        self.overflow_policy = overflow_policy
+
+        self._batches = deque()
+        self._conflated = {}
+        self._lock = threading.Lock()
+        self._not_empty = threading.Event()
+
+        self.stats = {
+            'enqueued_batches': 0,
+            'enqueued_ticks': 0,
+            'dropped_batches': 0,
+            'dropped_ticks': 0,
+            'conflated_ticks': 0,
+            'max_depth': 0,
+        }
+
+    def put(self, ticks):
+        """Queue a raw tick batch; never blocks on the consumer side"""
+        with self._lock:
+            self.stats['enqueued_batches'] += 1
+            self.stats['enqueued_ticks'] += len(ticks)
+
+            # Once conflation has started, keep conflating until it is
+            # flushed so a token's newer tick is never published before an
+            # older one
+            if self._conflated or len(self._batches) >= self.max_batches:
+                if self.overflow_policy == CONFLATE:
+                    for tick in ticks:
+                        token = tick['instrument_token']
+                        if token in self._conflated:
+                            self.stats['conflated_ticks'] += 1
+                        self._conflated[token] = tick
+                    self._not_empty.set()
+                    return
+
+                dropped = self._batches.popleft()
+                self.stats['dropped_batches'] += 1
+                self.stats['dropped_ticks'] += len(dropped)
+
+            self._batches.append(ticks)
+            self.stats['max_depth'] = max(self.stats['max_depth'], len(self._batches))
+
+        self._not_empty.set()
+
+    def get(self, timeout=None):
+        """Next batch to publish, or None if nothing arrived within timeout"""
+        if not self._not_empty.wait(timeout):
+            return None
+
+        with self._lock:
+            if self._batches:
+                return self._batches.popleft()
+
+            if self._conflated:
+                ticks = list(self._conflated.values())
+                self._conflated = {}
+                return ticks
+
+            self._not_empty.clear()
+            return None
+
+    def get_stats(self):
+        """Snapshot of buffer counters and current depth"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['queued_batches'] = len(self._batches)
+            stats['conflated_pending'] = len(self._conflated)
+        return stats
@@ -0,0 +1,301 @@
+# zerodhatrader/tick_recorder.py
+import fcntl
+import logging
+import os
+import re
+import json
+import time
+import threading
+import numpy as np
+from collections import deque
+from datetime import datetime
+from .models import Instrument
+
+logger = logging.getLogger(__name__)
+
+# Market depth levels in a FULL mode tick
+DEPTH_LEVELS = 5
+
+# Fixed-width columns: name -> (dtype, per-row shape)
+COLUMNS = {
+    'instrument_token': ('<u4', ()),
+    'exchange_timestamp': ('<M8[ms]', ()),
+    'received_at': ('<M8[ms]', ()),
+    'last_price': ('<f8', ()),
+    'last_traded_quantity': ('<i8', ()),
+    'volume_traded': ('<i8', ()),
+    'oi': ('<i8', ()),
+    'bid_price': ('<f8', (DEPTH_LEVELS,)),
+    'bid_quantity': ('<i8', (DEPTH_LEVELS,)),
+    'bid_orders': ('<i4', (DEPTH_LEVELS,)),
+    'ask_price': ('<f8', (DEPTH_LEVELS,)),
+    'ask_quantity': ('<i8', (DEPTH_LEVELS,)),
+    'ask_orders': ('<i4', (DEPTH_LEVELS,)),
+}
+
+SCHEMA_FILE = 'schema.json'
+
+# Held with flock by the one process allowed to append under a root
+WRITER_LOCK_FILE = '.writer.lock'
+
+def _partition_name(name):
+    """Filesystem-safe partition directory for an underlying name"""
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', name).strip('_') or 'OTHER'
+
+def _to_datetime64(value):
+    """Tick datetime to numpy ms precision (NaT when missing)"""
+    if isinstance(value, datetime):
+        return np.datetime64(value.replace(tzinfo=None), 'ms')
+    return np.datetime64('NaT', 'ms')
+
+def _depth_rows(ticks, side, field):
+    """(rows, DEPTH_LEVELS) list for one depth field; zeros when a tick has no depth"""
+    empty = [0] * DEPTH_LEVELS
+    rows = []
+    for tick in ticks:
+        levels = (tick.get('depth') or {}).get(side) or ()
+        row = [level.get(field, 0) for level in levels[:DEPTH_LEVELS]]
+        rows.append(row + empty[len(row):])
+    return rows
+
+def ticks_to_columns(ticks, received_at):
+    """Convert raw Kite ticks into fixed-width column arrays"""
+    columns = {
+        'instrument_token': [tick['instrument_token'] for tick in ticks],
+        'exchange_timestamp': [_to_datetime64(tick.get('exchange_timestamp')) for tick in ticks],
+        'received_at': received_at,
+        'last_price': [tick.get('last_price') or 0.0 for tick in ticks],
+        'last_traded_quantity': [tick.get('last_traded_quantity') or 0 for tick in ticks],
+        'volume_traded': [tick.get('volume_traded') or 0 for tick in ticks],
+        'oi': [tick.get('oi') or 0 for tick in ticks],
+        'bid_price': _depth_rows(ticks, 'buy', 'price'),
+        'bid_quantity': _depth_rows(ticks, 'buy', 'quantity'),
+        'bid_orders': _depth_rows(ticks, 'buy', 'orders'),
+        'ask_price': _depth_rows(ticks, 'sell', 'price'),
+        'ask_quantity': _depth_rows(ticks, 'sell', 'quantity'),
+        'ask_orders': _depth_rows(ticks, 'sell', 'orders'),
+    }
+    arrays = {}
+    for name, (dtype, shape) in COLUMNS.items():
+        arrays[name] = np.asarray(columns[name], dtype=dtype).reshape((len(ticks),) + shape)
+    return arrays
+
+def _row_bytes(dtype, shape):
+    """Bytes per row of a column"""
+    return np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+
+def _complete_rows(path):
+    """Rows present in every column file of a partition (0 if any is missing)"""
+    rows = None
+    for name, (dtype, shape) in COLUMNS.items():
+        file_path = os.path.join(path, f"{name}.bin")
+        if not os.path.exists(file_path):
+            return 0
+        file_rows = os.path.getsize(file_path) // _row_bytes(dtype, shape)
+        rows = file_rows if rows is None else min(rows, file_rows)
+    return rows or 0
+
+def load_ticks(root, trading_date, underlying):
+    """
+    Memory-map the recorded columns of one day and underlying, read-only.
+    Columns are trimmed to the shortest one so a torn final write is ignored.
+    """
+    path = os.path.join(root, str(trading_date), _partition_name(underlying))
+    if not os.path.isdir(path):
+        return {}
+
+    rows = _complete_rows(path)
+    if not rows:
+        return {}
+
+    return {
+        name: np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode='r', shape=(rows,) + shape)
+        for name, (dtype, shape) in COLUMNS.items()
+    }
+
+def list_partitions(root):
+    """Recorded (trading_date, underlying) partitions, oldest first"""
+    if not os.path.isdir(root):
+        return []
+    partitions = []
+    for trading_date in sorted(os.listdir(root)):
+        day_path = os.path.join(root, trading_date)
+        if os.path.isdir(day_path):
+            partitions.extend((trading_date, underlying) for underlying in sorted(os.listdir(day_path)))
+    return partitions
+
+class TickRecorder:
+    """
+    Optional history stage of the ticker pipeline.
+
+    record() only appends the raw batch to a bounded deque under a short
+    lock, so it is safe to call from the KiteTicker callback thread. A
+    writer thread drains the
+    deque every flush interval, converts the ticks into fixed-width columns
+    and appends each column to <root>/<YYYY-MM-DD>/<underlying>/<column>.bin
+    in one sequential write per partition. The files are raw little-endian
+    arrays readable with load_ticks() (np.memmap).
+    """
+
+    def __init__(self, root, flush_seconds=5.0, max_batches=10000, start_writer=True):
+        self.root = root
+
+        # Single writer per root: concurrent appenders would duplicate rows,
+        # interleave column writes and truncate each other's partitions
+        os.makedirs(root, exist_ok=True)
+        self._lock_file = open(os.path.join(root, WRITER_LOCK_FILE), 'a')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            raise RuntimeError(f"Another process is already recording ticks to {root}")
+
+        self.flush_seconds = flush_seconds
+        self.max_batches = max_batches
+
+        # (receive time, raw ticks); the oldest batch is dropped when full
+        self._batches = deque()
+
+        # Guards the batch queue and stats; flushes are serialized separately
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        # Token -> partition name, resolved from Instrument on first sight
+        self.partitions = {}
+
+        # Partition paths already aligned since this recorder started
+        self._open_paths = set()
+
+        self.stats = {
+            'recorded_ticks': 0,
+            'flushes': 0,
+            'last_flush_ms': 0.0,
+            'dropped_batches': 0,
+            'write_errors': 0,
+        }
+
+        # Offline writers (e.g. the synthetic data generator) call flush() themselves
+        self.writer_thread = None
+        if start_writer:
+            self.writer_thread = threading.Thread(target=self._run_writer, name='tick-recorder', daemon=True)
+            self.writer_thread.start()
+        logger.info(f"Tick recorder writing to {root}")
+
+    def record(self, ticks, received_at=None):
+        """Queue a raw tick batch for the writer thread"""
+        batch = (received_at or datetime.now(), ticks)
+        with self._lock:
+            if len(self._batches) >= self.max_batches:
+                self._batches.popleft()
+                self.stats['dropped_batches'] += 1
+            self._batches.append(batch)
+
+    def close(self):
+        """Stop the writer thread, flush what is queued and give up the writer lock"""
+        self._stop.set()
+        if self.writer_thread is not None:
+            self.writer_thread.join()
+            self.writer_thread = None
+        self.flush()
+        if not self._lock_file.closed:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+
+    def get_stats(self):
+        """Snapshot of recorder counters"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['queued_batches'] = len(self._batches)
+        return stats
+
+    def _resolve_partitions(self, tokens):
+        """Look up the underlying of tokens not seen before"""
+        new_tokens = [token for token in tokens if token not in self.partitions]
+        if not new_tokens:
+            return
+
+        rows = Instrument.objects.filter(instrument_token__in=new_tokens).values_list('instrument_token', 'underlying', 'name')
+        for token, underlying, name in rows:
+            self.partitions[token] = _partition_name(underlying or name or '')
+        for token in new_tokens:
+            self.partitions.setdefault(token, 'OTHER')
+
+    def _align_columns(self, path):
+        """Truncate columns left uneven by an interrupted write so appends stay row-aligned"""
+        rows = _complete_rows(path)
+        for name, (dtype, shape) in COLUMNS.items():
+            file_path = os.path.join(path, f"{name}.bin")
+            if os.path.exists(file_path):
+                os.truncate(file_path, rows * _row_bytes(dtype, shape))
+
+    def _write_partition(self, trading_date, underlying, arrays):
+        """Append column arrays to one partition"""
+        path = os.path.join(self.root, trading_date, underlying)
+        os.makedirs(path, exist_ok=True)
+
+        schema_path = os.path.join(path, SCHEMA_FILE)
+        if not os.path.exists(schema_path):
+            with open(schema_path, 'w') as f:
+                json.dump({name: {'dtype': dtype, 'shape': list(shape)}
+                           for name, (dtype, shape) in COLUMNS.items()}, f)
+
+        if path not in self._open_paths:
+            self._align_columns(path)
+            self._open_paths.add(path)
+
+        for name in COLUMNS:
+            with open(os.path.join(path, f"{name}.bin"), 'ab') as f:
+                f.write(arrays[name].tobytes())
+
+    def flush(self):
+        """Write everything queued so far"""
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        """Drain the queue and append it to the partitions (flush lock held)"""
+        with self._lock:
+            batches = self._batches
+            self._batches = deque()
+        if not batches:
+            return
+
+        started = time.perf_counter()
+
+        # Group ticks by (trading day, underlying)
+        grouped = {}
+        for received_at, ticks in batches:
+            self._resolve_partitions({tick['instrument_token'] for tick in ticks})
+            trading_date = received_at.date().isoformat()
+            received = np.datetime64(received_at, 'ms')
+            for tick in ticks:
+                key = (trading_date, self.partitions[tick['instrument_token']])
+                grouped.setdefault(key, ([], []))
+                grouped[key][0].append(tick)
+                grouped[key][1].append(received)
+
+        recorded = errors = 0
+        for (trading_date, underlying), (ticks, received) in grouped.items():
+            try:
+                self._write_partition(trading_date, underlying, ticks_to_columns(ticks, received))
+                recorded += len(ticks)
+            except Exception as e:
+                errors += 1
+                logger.error(f"Error recording {len(ticks)} ticks for {underlying} on {trading_date}: {e}")
+
+        with self._lock:
+            self.stats['recorded_ticks'] += recorded
+            self.stats['write_errors'] += errors
+            self.stats['flushes'] += 1
+            self.stats['last_flush_ms'] = (time.perf_counter() - started) * 1000
+
+    def _run_writer(self):
+        """Writer thread: flush on a fixed cadence until close()"""
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                with self._lock:
+                    self.stats['write_errors'] += 1
+                logger.error(f"Error in tick recorder thread: {e}")
@@ -1,13 +1,21 @@
 # zerodhatrader/ticker.py
 import logging
 import threading
+import time
 import json
+import orjson
 import redis
 from datetime import datetime
 from django.utils import timezone
 from django.conf import settings
 from kiteconnect import KiteTicker
 from .models import ApiCredential
+from .greeks import GreeksEnricher
+from .tick_buffer import TickBuffer
+from .tick_recorder import TickRecorder
+from .candles import CandleAggregator
+from .ticker_shard import TickerShard
+from .snapshots import get_snapshot_key
 
 logger = logging.getLogger(__name__)
 
@@ -18,22 +26,75 @@ class DateTimeEncoder(json.JSONEncoder):
             return obj.strftime('%Y-%m-%d %H:%M:%S')
         return super().default(obj)
 
+def _serialize_default(obj):
+    """orjson fallback keeping the DateTimeEncoder datetime format"""
+    if isinstance(obj, datetime):
+        return obj.strftime('%Y-%m-%d %H:%M:%S')
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+# KiteTicker streaming modes, lowest to highest packet size
+TICK_MODES = ('ltp', 'quote', 'full')
+
+# Shard balancing policies
+LEAST_LOADED = 'least_loaded'
+FILL_FIRST = 'fill_first'
+
+def build_wire_message(message_type, data):
+    """
+    Serialize the final WebSocket envelope for a message once, as bytes.
+    Consumers forward it to clients unchanged.
+    """
+    return orjson.dumps({'type': message_type, 'data': data},
+                        default=_serialize_default,
+                        option=orjson.OPT_PASSTHROUGH_DATETIME)
+
 class KiteTickerManager:
-    """Singleton manager for KiteTicker instance with Redis pub-sub"""
+    """Singleton manager for sharded KiteTicker connections with Redis pub-sub"""
     _instance = None
     _lock = threading.Lock()
     
-    # Ticker instance and status
-    ticker = None
-    is_connected = False
-    last_connected = None
+    # Ticker shards (one KiteTicker connection each) and token placement
+    shards = []
+    token_shards = {}
+    shard_lock = threading.RLock()
     
-    # Subscriber management (now tracks channels instead of queues)
+    # Credentials used to open new shards
+    api_key = None
+    access_token = None
+    
+    # Connection class each shard instantiates (replaced by ReplayTicker for offline runs)
+    ticker_class = KiteTicker
+    
+    # Set by `manage.py run_ticker`: the one process allowed several Kite
+    # connections and the single-writer stages (recorder, candles)
+    ingest_daemon = False
+    
+    # Subscriber management (now tracks channels instead of queues):
+    # token -> {consumer_id: mode requested by that consumer}
     subscribers = {}
     
+    # token -> mode currently set on the KiteTicker connection
+    token_modes = {}
+    
     # Redis client for pub-sub
     redis_client = None
     
+    # Optional live Greeks enrichment stage
+    greeks_enricher = None
+    
+    # Raw tick batches handed from the KiteTicker thread to the publisher thread
+    tick_buffer = None
+    publisher_thread = None
+    
+    # Optional on-disk tick history stage
+    tick_recorder = None
+    
+    # Optional live OHLCV candle stage
+    candle_aggregator = None
+    
+    # Publish metrics, updated once per tick batch (created per instance)
+    publish_stats = None
+    
     @classmethod
     def get_instance(cls):
         """Get or create the singleton instance"""
@@ -63,35 +124,115 @@ class KiteTickerManager:
                 except Exception as fallback_error:
                     logger.error(f"Redis fallback also failed: {fallback_error}")
                     raise Exception("Could not establish Redis connection for pub-sub")
+        
+        self.publish_stats = {
+            'batches': 0,
+            'ticks_published': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_publish_ms': 0.0,
+            'max_publish_ms': 0.0,
+            'total_publish_ms': 0.0,
+            'publish_errors': 0,
+        }
+        
+        if self.greeks_enricher is None:
+            greeks_settings = getattr(settings, 'GREEKS_STREAM', {})
+            if greeks_settings.get('ENABLED', False):
+                self.greeks_enricher = GreeksEnricher(
+                    greeks_settings.get('UNDERLYING_TOKENS', {}),
+                    throttle_seconds=greeks_settings.get('THROTTLE_SECONDS', 1.0)
+                )
+                logger.info("Live greeks enrichment enabled for ticker manager")
+        
+        if self.tick_recorder is None:
+            recorder_settings = getattr(settings, 'TICK_RECORDER', {})
+            if recorder_settings.get('ENABLED', False) and not self.ingest_daemon:
+                # Embedded web workers all see the same ticks; one recorder is enough
+                logger.warning("TICK_RECORDER is enabled but ticks are only recorded by the run_ticker daemon")
+            elif recorder_settings.get('ENABLED', False):
+                try:
+                    self.tick_recorder = TickRecorder(
+                        recorder_settings['ROOT'],
+                        flush_seconds=recorder_settings.get('FLUSH_SECONDS', 5.0),
+                        max_batches=recorder_settings.get('MAX_BATCHES', 10000)
+                    )
+                except Exception as e:
+                    logger.error(f"Tick recorder not started: {e}")
+        
+        if self.candle_aggregator is None:
+            candle_settings = getattr(settings, 'CANDLE_STREAM', {})
+            if candle_settings.get('ENABLED', False) and not self.ingest_daemon:
+                # Every embedded worker would upsert and publish the same bars
+                logger.warning("CANDLE_STREAM is enabled but candles are only built by the run_ticker daemon")
+            elif candle_settings.get('ENABLED', False):
+                self.candle_aggregator = CandleAggregator(
+                    self.redis_client,
+                    build_wire_message,
+                    intervals=candle_settings.get('INTERVALS', ('1s', '1m', '5m', '15m')),
+                    persist_intervals=candle_settings.get('PERSIST_INTERVALS', ('1m', '5m', '15m')),
+                    publish_interval=candle_settings.get('PUBLISH_INTERVAL', 0.25),
+                    flush_seconds=candle_settings.get('FLUSH_SECONDS', 5.0)
+                )
+                logger.info("Live candle aggregation enabled for ticker manager")
+        
+        sharding_settings = getattr(settings, 'TICKER_SHARDING', {})
+        # Every embedded web worker holds its own connection on the same API
+        # key, so only the ingest daemon may use the whole per-key allowance
+        self.max_connections = sharding_settings.get('MAX_CONNECTIONS', 3) if self.ingest_daemon else 1
+        self.max_tokens_per_connection = sharding_settings.get('MAX_TOKENS_PER_CONNECTION', 3000)
+        self.balancing_policy = sharding_settings.get('BALANCING_POLICY', LEAST_LOADED)
+        self.failover_seconds = sharding_settings.get('FAILOVER_SECONDS', 15)
+        if self.balancing_policy not in (LEAST_LOADED, FILL_FIRST):
+            raise ValueError(f"Unknown ticker balancing policy: {self.balancing_policy}")
+        
+        pubsub_settings = getattr(settings, 'PUBSUB_SETTINGS', {})
+        
+        # Last-value cache lifetime; snapshots older than this count as stale
+        self.snapshot_expiry = pubsub_settings.get('MESSAGE_EXPIRY', 60)
+        
+        if self.tick_buffer is None:
+            self.tick_buffer = TickBuffer(
+                max_batches=pubsub_settings.get('TICK_BUFFER_SIZE', 1000),
+                overflow_policy=pubsub_settings.get('TICK_OVERFLOW_POLICY', 'conflate')
+            )
+            self.publisher_thread = threading.Thread(
+                target=self._run_publisher, name='tick-publisher', daemon=True
+            )
+            self.publisher_thread.start()
     
-    def initialize_ticker(self):
-        """Initialize KiteTicker with credentials"""
+    def initialize_ticker(self, api_key=None, access_token=None):
+        """Open ticker shard connections with the given or the active credentials"""
         try:
-            # Get credentials
-            cred = ApiCredential.objects.filter(is_active=True).first()
-            if not cred or not cred.access_token:
-                logger.error("No API credentials with access token found")
-                return False
-            
-            # Close existing ticker if it exists
-            if self.ticker:
-                self.disconnect_ticker()
+            if not api_key or not access_token:
+                # Get credentials
+                cred = ApiCredential.objects.filter(is_active=True).first()
+                if not cred or not cred.access_token:
+                    logger.error("No API credentials with access token found")
+                    return False
+                api_key, access_token = cred.api_key, cred.access_token
             
-            # Initialize ticker
-            self.ticker = KiteTicker(cred.api_key, cred.access_token)
-            
-            # Set callbacks
-            self.ticker.on_ticks = self.on_ticks
-            self.ticker.on_connect = self.on_connect
-            self.ticker.on_close = self.on_close
-            self.ticker.on_error = self.on_error
-            self.ticker.on_reconnect = self.on_reconnect
-            self.ticker.on_noreconnect = self.on_noreconnect
-            
-            # Connect in threaded mode
-            self.ticker.connect(threaded=True)
+            with self.shard_lock:
+                # Close existing shards if they exist
+                if self.shards:
+                    self.disconnect_ticker()
+                
+                self.api_key = api_key
+                self.access_token = access_token
+                
+                # least_loaded spreads tokens over every allowed connection up
+                # front; fill_first opens the next connection once one is full
+                initial_shards = self.max_connections if self.balancing_policy == LEAST_LOADED else 1
+                for _ in range(initial_shards):
+                    self._open_shard()
+                
+                # Place tokens still needed from before a full reconnect
+                self.token_modes.clear()
+                self._place_tokens(list(self.subscribers.keys()))
+                if self.greeks_enricher and self.subscribers:
+                    self._subscribe_underlying_tokens()
             
-            logger.info("KiteTicker initialized successfully")
+            logger.info(f"KiteTicker initialized with {len(self.shards)} shard(s) ({self.balancing_policy})")
             return True
         
         except Exception as e:
@@ -99,28 +240,92 @@ class KiteTickerManager:
             return False
     
     def disconnect_ticker(self):
-        """Disconnect the ticker"""
-        if self.ticker:
-            try:
-                self.ticker.close()
-                self.ticker = None
-                self.is_connected = False
-                logger.info("KiteTicker disconnected")
-                return True
-            except Exception as e:
-                logger.error(f"Error disconnecting ticker: {e}")
-                return False
-        return True
+        """Disconnect every ticker shard"""
+        with self.shard_lock:
+            success = True
+            for shard in self.shards:
+                try:
+                    shard.disconnect()
+                except Exception as e:
+                    logger.error(f"Error disconnecting ticker shard {shard.shard_id}: {e}")
+                    success = False
+            
+            self.shards = []
+            self.token_shards.clear()
+            logger.info("KiteTicker disconnected")
+            return success
+    
+    def _open_shard(self):
+        """Start a new KiteTicker connection"""
+        # Failed shards with nothing left on them only hold stale stats
+        self.shards = [shard for shard in self.shards if not shard.failed or shard.tokens]
+        
+        shard_id = max((shard.shard_id for shard in self.shards), default=-1) + 1
+        shard = TickerShard(shard_id, self)
+        self.shards.append(shard)
+        shard.connect(self.api_key, self.access_token)
+        return shard
+    
+    def _pick_shard(self, exclude=None, connected_only=False):
+        """Choose the shard for a new token per the balancing policy, opening one if allowed"""
+        candidates = [
+            shard for shard in self.shards
+            if shard is not exclude and shard.is_available()
+            and (shard.is_connected or not connected_only)
+            and len(shard.tokens) < self.max_tokens_per_connection
+        ]
+        if candidates:
+            if self.balancing_policy == FILL_FIRST:
+                return candidates[0]
+            return min(candidates, key=lambda shard: len(shard.tokens))
+        
+        available_shards = [shard for shard in self.shards if shard.is_available()]
+        if not connected_only and self.api_key and len(available_shards) < self.max_connections:
+            return self._open_shard()
+        return None
+    
+    def _place_tokens(self, tokens):
+        """Assign unplaced tokens to shards and subscribe them; returns tokens with no room"""
+        placed = {}
+        unplaced = []
+        for token in tokens:
+            if token in self.token_shards:
+                continue
+            shard = self._pick_shard()
+            if shard is None:
+                unplaced.append(token)
+                continue
+            shard.tokens.add(token)
+            self.token_shards[token] = shard
+            placed.setdefault(shard, []).append(token)
+        
+        for shard, shard_tokens in placed.items():
+            shard.subscribe(shard_tokens)
+        
+        if unplaced:
+            logger.warning(f"No ticker shard capacity for {len(unplaced)} tokens; they stay pending")
+        return unplaced
+    
+    def _place_pending_tokens(self):
+        """Retry placing subscribed tokens that found no shard capacity earlier"""
+        pending = [token for token in self.subscribers if token not in self.token_shards]
+        if pending:
+            self._place_tokens(pending)
+            self._apply_token_modes(pending)
     
-    def subscribe(self, consumer_id, instrument_tokens):
-        """Subscribe a consumer to instrument tokens using Redis pub-sub"""
+    def subscribe(self, consumer_id, instrument_tokens, mode='full'):
+        """Subscribe a consumer to instrument tokens in the given mode (ltp, quote or full)"""
         if not instrument_tokens:
             logger.warning(f"No tokens provided for subscription by consumer {consumer_id}")
             return False
-            
-        logger.info(f"Subscribe request: consumer_id={consumer_id}, tokens={instrument_tokens}")
         
-        if not self.ticker or not self.is_connected:
+        if mode not in TICK_MODES:
+            logger.error(f"Invalid tick mode {mode} requested by consumer {consumer_id}")
+            return False
+        
+        logger.info(f"Subscribe request: consumer_id={consumer_id}, tokens={instrument_tokens}, mode={mode}")
+        
+        if not any(shard.is_available() for shard in self.shards):
             success = self.initialize_ticker()
             if not success:
                 logger.error("Failed to initialize ticker for subscription")
@@ -130,17 +335,20 @@ class KiteTickerManager:
             # Convert tokens to integers
             tokens = [int(token) for token in instrument_tokens]
             
-            # Register consumer for each token (for tracking purposes)
-            for token in tokens:
-                if token not in self.subscribers:
-                    self.subscribers[token] = set()
-                self.subscribers[token].add(consumer_id)
-            
-            logger.info(f"Subscribing to tokens: {tokens}, mode: FULL")
-            
-            # Subscribe to tokens in KiteTicker
-            self.ticker.subscribe(tokens)
-            self.ticker.set_mode(self.ticker.MODE_FULL, tokens)
+            with self.shard_lock:
+                # Register consumer and its mode for each token
+                for token in tokens:
+                    self.subscribers.setdefault(token, {})[consumer_id] = mode
+                
+                # Put new tokens on a shard; pending ones are retried as capacity frees
+                self._place_tokens(tokens)
+                
+                # Upgrade (or set) the streaming mode where this request raised it
+                self._apply_token_modes(tokens)
+                
+                if self.greeks_enricher:
+                    self.greeks_enricher.register_tokens(tokens)
+                    self._subscribe_underlying_tokens()
             
             logger.info(f"Subscribed to {len(tokens)} tokens for consumer {consumer_id}")
             return True
@@ -149,37 +357,76 @@ class KiteTickerManager:
             logger.error(f"Error subscribing to tokens: {e}")
             return False
     
+    def _target_mode(self, token):
+        """Highest mode any consumer needs for a token (LTP for greeks-only index tokens)"""
+        if token not in self.subscribers:
+            return KiteTicker.MODE_LTP
+        return max(self.subscribers[token].values(), key=TICK_MODES.index)
+    
+    def _apply_token_modes(self, tokens):
+        """Set the mode of tokens to what their subscribers need, grouped per shard and mode"""
+        tokens_by_shard_mode = {}
+        for token in tokens:
+            shard = self.token_shards.get(token)
+            if shard is None or not shard.is_connected:
+                continue  # Applied when the shard (re)connects
+            target_mode = self._target_mode(token)
+            if self.token_modes.get(token) != target_mode:
+                tokens_by_shard_mode.setdefault((shard, target_mode), []).append(token)
+        
+        for (shard, mode), mode_tokens in tokens_by_shard_mode.items():
+            logger.info(f"Setting mode {mode} on shard {shard.shard_id} for tokens: {mode_tokens}")
+            shard.set_mode(mode, mode_tokens)
+            for token in mode_tokens:
+                self.token_modes[token] = mode
+    
+    def _release_token(self, token):
+        """Unsubscribe a token from its shard and free its slot"""
+        self.token_modes.pop(token, None)
+        shard = self.token_shards.pop(token, None)
+        if shard is None:
+            return
+        shard.tokens.discard(token)
+        shard.unsubscribe([token])
+        self._place_pending_tokens()
+    
+    def _remove_subscriber(self, consumer_id, token):
+        """Drop a consumer from a token, downgrading or unsubscribing the token as needed"""
+        if token not in self.subscribers or consumer_id not in self.subscribers[token]:
+            return
+        
+        del self.subscribers[token][consumer_id]
+        
+        if self.subscribers[token]:
+            # Downgrade when the last consumer needing the higher mode has left
+            self._apply_token_modes([token])
+            return
+        
+        # If no more subscribers, unsubscribe from the token
+        logger.info(f"No more subscribers for token {token}, unsubscribing")
+        del self.subscribers[token]
+        
+        if self._is_underlying_token(token):
+            # Greeks enrichment only needs the index LTP
+            self._apply_token_modes([token])
+        else:
+            self._release_token(token)
+    
     def unsubscribe(self, consumer_id, instrument_tokens=None):
         """Unsubscribe a consumer from instrument tokens"""
         try:
-            if instrument_tokens is None:
-                # Unsubscribe from all tokens
-                tokens_to_check = list(self.subscribers.keys())
-                logger.info(f"Unsubscribing consumer {consumer_id} from all tokens")
-                
-                for token in tokens_to_check:
-                    if consumer_id in self.subscribers[token]:
-                        self.subscribers[token].remove(consumer_id)
-                        
-                        # If no more subscribers, unsubscribe from the token
-                        if not self.subscribers[token] and self.ticker and self.is_connected:
-                            logger.info(f"No more subscribers for token {token}, unsubscribing")
-                            self.ticker.unsubscribe([token])
-                            del self.subscribers[token]
-            else:
-                # Unsubscribe from specific tokens
-                tokens = [int(token) for token in instrument_tokens]
-                logger.info(f"Unsubscribing consumer {consumer_id} from tokens: {tokens}")
+            with self.shard_lock:
+                if instrument_tokens is None:
+                    # Unsubscribe from all tokens
+                    tokens = list(self.subscribers.keys())
+                    logger.info(f"Unsubscribing consumer {consumer_id} from all tokens")
+                else:
+                    # Unsubscribe from specific tokens
+                    tokens = [int(token) for token in instrument_tokens]
+                    logger.info(f"Unsubscribing consumer {consumer_id} from tokens: {tokens}")
                 
                 for token in tokens:
-                    if token in self.subscribers and consumer_id in self.subscribers[token]:
-                        self.subscribers[token].remove(consumer_id)
-                        
-                        # If no more subscribers, unsubscribe from the token
-                        if not self.subscribers[token] and self.ticker and self.is_connected:
-                            logger.info(f"No more subscribers for token {token}, unsubscribing")
-                            self.ticker.unsubscribe([token])
-                            del self.subscribers[token]
+                    self._remove_subscriber(consumer_id, token)
             
             return True
         
@@ -187,89 +434,230 @@ class KiteTickerManager:
             logger.error(f"Error unsubscribing from tokens: {e}")
             return False
     
-    def _process_datetime_in_tick(self, tick):
-        """Convert datetime objects to string format in tick data"""
-        if 'timestamp' in tick and isinstance(tick['timestamp'], datetime):
-            tick['timestamp'] = tick['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-        
-        if 'last_trade_time' in tick and isinstance(tick['last_trade_time'], datetime):
-            tick['last_trade_time'] = tick['last_trade_time'].strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Process any other datetime fields that might be in the tick data
-        for key, value in tick.items():
-            if isinstance(value, datetime):
-                tick[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-    
+    def get_shard_stats(self):
+        """Per-connection health and throughput plus placement totals"""
+        with self.shard_lock:
+            return {
+                'balancing_policy': self.balancing_policy,
+                'max_connections': self.max_connections,
+                'max_tokens_per_connection': self.max_tokens_per_connection,
+                'placed_tokens': len(self.token_shards),
+                'pending_tokens': len([token for token in self.subscribers if token not in self.token_shards]),
+                'shards': [shard.get_stats() for shard in self.shards],
+            }
+
     def _get_channel_name(self, instrument_token):
         """Get Redis channel name for an instrument token"""
         return f"tick:{instrument_token}"
     
-    # KiteTicker callbacks
-    def on_ticks(self, ws, ticks):
-        """Callback for ticks - now uses Redis pub-sub for distribution"""
-        if not ticks:
-            logger.warning("Received empty ticks")
+    def _get_greeks_channel_name(self, instrument_token):
+        """Get Redis channel name for enriched greeks of an instrument token"""
+        return f"greeks:{instrument_token}"
+    
+    def _is_underlying_token(self, token):
+        """Index tokens stay subscribed while greeks enrichment needs their spot"""
+        return bool(self.greeks_enricher) and token in self.greeks_enricher.underlying_by_token
+    
+    def _subscribe_underlying_tokens(self):
+        """Keep the underlying index tokens streaming for greeks enrichment"""
+        # Tokens already placed for a consumer keep their mode
+        underlying_tokens = [token for token in self.greeks_enricher.get_underlying_tokens()
+                             if token not in self.token_shards]
+        if underlying_tokens:
+            self._place_tokens(underlying_tokens)
+            self._apply_token_modes(underlying_tokens)
+    
+    def _publish_greeks(self, ticks):
+        """Compute greeks for a tick batch and publish them on greeks channels"""
+        try:
+            enriched = self.greeks_enricher.process(ticks)
+        except Exception as e:
+            logger.error(f"Error computing greeks for ticks: {e}")
             return
-            
-        logger.info(f"Received {len(ticks)} ticks")
         
-        # Process ticks and publish to Redis channels
+        if not enriched:
+            return
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for token, payload in enriched:
+            try:
+                channel_name = self._get_greeks_channel_name(token)
+                message = build_wire_message('greeks', payload)
+                pipe.publish(channel_name, message)
+                pipe.set(get_snapshot_key(channel_name), message, ex=self.snapshot_expiry)
+            except Exception as e:
+                logger.error(f"Error serializing greeks for token {token}: {e}")
+        
+        try:
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error publishing greeks for {len(enriched)} tokens: {e}")
+    
+    def _record_publish_stats(self, batch_size, elapsed_ms, failed=False):
+        """Update publish metrics for one tick batch"""
+        stats = self.publish_stats
+        stats['batches'] += 1
+        stats['last_batch_size'] = batch_size
+        stats['max_batch_size'] = max(stats['max_batch_size'], batch_size)
+        stats['last_publish_ms'] = elapsed_ms
+        stats['max_publish_ms'] = max(stats['max_publish_ms'], elapsed_ms)
+        stats['total_publish_ms'] += elapsed_ms
+        if failed:
+            stats['publish_errors'] += 1
+        else:
+            stats['ticks_published'] += batch_size
+    
+    def get_publish_stats(self):
+        """Snapshot of publish metrics with the average batch size and latency"""
+        stats = dict(self.publish_stats)
+        batches = stats['batches']
+        published_batches = batches - stats['publish_errors']
+        stats['avg_batch_size'] = stats['ticks_published'] / published_batches if published_batches else 0.0
+        stats['avg_publish_ms'] = stats['total_publish_ms'] / batches if batches else 0.0
+        stats['buffer'] = self.tick_buffer.get_stats()
+        if self.tick_recorder:
+            stats['recorder'] = self.tick_recorder.get_stats()
+        if self.candle_aggregator:
+            stats['candles'] = self.candle_aggregator.get_stats()
+        return stats
+    
+    def _run_publisher(self):
+        """Publisher thread: drain the tick buffer and publish to Redis"""
+        logger.info("Tick publisher thread started")
+        while True:
+            ticks = self.tick_buffer.get(timeout=1.0)
+            if not ticks:
+                continue
+            try:
+                self._publish_ticks(ticks)
+            except Exception as e:
+                logger.error(f"Error in tick publisher thread: {e}")
+    
+    def _publish_ticks(self, ticks):
+        """Publish a raw tick batch to Redis channels (publisher thread)"""
+        logger.debug(f"Publishing batch of {len(ticks)} ticks")
+        
+        # All ticks of the batch go out in one pipelined round trip
+        started = time.perf_counter()
+        pipe = self.redis_client.pipeline(transaction=False)
+        batch_size = 0
+        
+        # Subscriptions change on other threads; take the batch's view of them under the lock
+        with self.shard_lock:
+            subscribed = {tick["instrument_token"] for tick in ticks if self.subscribers.get(tick["instrument_token"])}
+        
+        # Process ticks and queue them for their Redis channels
         for tick in ticks:
             token = tick["instrument_token"]
             
             # Skip if no subscribers for this token
-            if token not in self.subscribers:
-                continue
-                
-            # Get subscribers for this token
-            subscriber_ids = list(self.subscribers[token])
-            if not subscriber_ids:
+            if token not in subscribed:
                 continue
             
-            # Convert any datetime objects to strings
-            self._process_datetime_in_tick(tick)
-            
             # Publish tick to Redis channel - this is the key optimization!
             # Instead of putting tick in multiple queues, we publish once to a channel
             try:
                 channel_name = self._get_channel_name(token)
-                tick_json = json.dumps(tick, cls=DateTimeEncoder)
                 
-                # Single publish operation instead of multiple queue puts
-                self.redis_client.publish(channel_name, tick_json)
+                # The final client envelope is built here once; consumers forward it as-is
+                message = build_wire_message('tick', tick)
+                
+                pipe.publish(channel_name, message)
                 
-                logger.debug(f"Published tick for token {token} to channel {channel_name}")
+                # Last-value cache for first paint on subscribe and QuoteView
+                pipe.set(get_snapshot_key(channel_name), message, ex=self.snapshot_expiry)
+                batch_size += 1
                 
             except Exception as e:
-                logger.error(f"Error publishing tick for token {token}: {e}")
-    
-    def on_connect(self, ws, response):
-        """Callback when connection is established"""
-        self.is_connected = True
-        self.last_connected = timezone.now()
-        logger.info(f"KiteTicker connected: {response}")
-        
-        # Resubscribe to all tokens
-        if self.subscribers:
-            all_tokens = list(self.subscribers.keys())
-            logger.info(f"Resubscribing to {len(all_tokens)} tokens")
-            self.ticker.subscribe(all_tokens)
-            self.ticker.set_mode(self.ticker.MODE_FULL, all_tokens)
-    
-    def on_close(self, ws, code, reason):
-        """Callback when connection is closed"""
-        self.is_connected = False
-        logger.warning(f"KiteTicker disconnected: {code} - {reason}")
-    
-    def on_error(self, ws, code, reason):
-        """Callback when error occurs"""
-        logger.error(f"KiteTicker error: {code} - {reason}")
-    
-    def on_reconnect(self, ws, attempts_count):
-        """Callback on reconnection attempt"""
-        logger.info(f"KiteTicker reconnecting: attempt {attempts_count}")
-    
-    def on_noreconnect(self, ws):
-        """Callback when reconnection fails"""
-        self.is_connected = False
-        logger.error("KiteTicker failed to reconnect")
\ No newline at end of file
+                logger.error(f"Error serializing tick for token {token}: {e}")
+        
+        if batch_size:
+            failed = False
+            try:
+                pipe.execute()
+            except Exception as e:
+                failed = True
+                logger.error(f"Error publishing batch of {batch_size} ticks: {e}")
+            
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._record_publish_stats(batch_size, elapsed_ms, failed)
+            logger.debug(f"Published {batch_size} ticks in {elapsed_ms:.2f} ms")
+        
+        if self.greeks_enricher:
+            self._publish_greeks(ticks)
+    
+    # Shard callbacks
+    def on_shard_connect(self, shard):
+        """Replay a shard's tokens in the modes their subscribers need"""
+        with self.shard_lock:
+            tokens = list(shard.tokens)
+            if tokens:
+                logger.info(f"Resubscribing {len(tokens)} tokens on shard {shard.shard_id}")
+                shard.subscribe(tokens)
+                for token in tokens:
+                    self.token_modes.pop(token, None)
+                self._apply_token_modes(tokens)
+            
+            # A recovered shard may have room for tokens left pending
+            self._place_pending_tokens()
+    
+    def on_shard_close(self, shard):
+        """Move a shard's tokens elsewhere if it stays down past the failover delay"""
+        timer = threading.Timer(self.failover_seconds, self._failover_shard, args=(shard,))
+        timer.daemon = True
+        timer.start()
+    
+    def on_shard_failed(self, shard):
+        """Kite gave up reconnecting the shard; move its tokens now"""
+        self._failover_shard(shard)
+    
+    def _failover_shard(self, shard):
+        """Reassign the tokens of a disconnected shard to healthy shards"""
+        with self.shard_lock:
+            if shard.is_connected or not shard.tokens or shard not in self.shards:
+                return
+            
+            moved = {}
+            for token in sorted(shard.tokens):
+                # Prefer shards that are streaming right now
+                target = self._pick_shard(exclude=shard, connected_only=True) or self._pick_shard(exclude=shard)
+                if target is None:
+                    break
+                shard.tokens.discard(token)
+                target.tokens.add(token)
+                self.token_shards[token] = target
+                self.token_modes.pop(token, None)
+                moved.setdefault(target, []).append(token)
+            
+            if not moved:
+                logger.warning(f"No capacity to fail over {len(shard.tokens)} tokens from shard {shard.shard_id}")
+                return
+            
+            shard.stats['failovers'] += 1
+            for target, tokens in moved.items():
+                # Forget them on the old socket so its reconnect does not duplicate them
+                shard.unsubscribe(tokens)
+                shard.stats['tokens_moved_out'] += len(tokens)
+                target.stats['tokens_moved_in'] += len(tokens)
+                target.subscribe(tokens)
+                self._apply_token_modes(tokens)
+                logger.warning(f"Moved {len(tokens)} tokens from shard {shard.shard_id} to shard {target.shard_id}")
+    
+    # KiteTicker callbacks
+    def on_ticks(self, ws, ticks):
+        """Callback for ticks from any shard - hands the raw batch to the publisher thread"""
+        if not ticks:
+            logger.warning("Received empty ticks")
+            return
+        
+        # Only a buffer append runs here so a Redis stall never backs up
+        # the Kite websocket; encoding and publishing happen off-thread
+        self.tick_buffer.put(ticks)
+        
+        # Recorded before any conflation so history keeps every tick
+        if self.tick_recorder:
+            self.tick_recorder.record(ticks)
+        
+        # Bars see every tick too; the aggregator folds, publishes and persists them on its own thread
+        if self.candle_aggregator:
+            self.candle_aggregator.submit(ticks)
@@ -0,0 +1,272 @@
+# zerodhatrader/ticker_intents.py
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+import json
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDED = 'embedded'
+STANDALONE = 'standalone'
+
+def _get_ingest_settings():
+    """Ticker ingest settings with defaults"""
+    ingest_settings = {
+        'MODE': EMBEDDED,
+        'INTENT_QUEUE': 'ticker:intents',
+        'EPOCH_KEY': 'ticker:daemon:epoch',
+        'WORKER_KEY_PREFIX': 'ticker:worker:',
+        'WORKER_TTL_SECONDS': 30,
+    }
+    ingest_settings.update(getattr(settings, 'TICKER_INGEST', {}))
+    return ingest_settings
+
+def _connect_redis():
+    """Sync Redis client from settings, falling back to localhost"""
+    try:
+        redis_url = getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0')
+        redis_client = redis.from_url(redis_url, decode_responses=True)
+        redis_client.ping()
+        return redis_client
+    except Exception as e:
+        logger.error(f"Failed to connect to Redis for ticker intents: {e}")
+        try:
+            redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+            redis_client.ping()
+            return redis_client
+        except Exception as fallback_error:
+            logger.error(f"Redis fallback also failed for ticker intents: {fallback_error}")
+            raise Exception("Could not establish Redis connection for ticker intents")
+
+def get_ticker_backend():
+    """
+    Object consumers subscribe through: the in-process KiteTickerManager, or
+    the intent client when a standalone run_ticker daemon owns the Kite feed.
+    Both expose subscribe(consumer_id, tokens, mode) and unsubscribe(consumer_id, tokens=None).
+    """
+    if _get_ingest_settings()['MODE'] == STANDALONE:
+        return TickerIntentClient.get_instance()
+
+    from .ticker import KiteTickerManager
+    return KiteTickerManager.get_instance()
+
+class TickerIntentClient:
+    """
+    Web worker side of the standalone ticker: queues subscribe/unsubscribe
+    intents on a Redis list for the run_ticker daemon.
+
+    The worker keeps a heartbeat key alive so the daemon can drop its
+    consumers if the process dies, and replays its current subscriptions
+    whenever the daemon restarts (seen as a new daemon epoch) or the
+    heartbeat key had expired, in which case the daemon may have reaped them.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """Get or create the per-process client"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self.settings = _get_ingest_settings()
+        self.redis_client = _connect_redis()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        # consumer_id -> {token: mode}, replayed when the daemon restarts
+        self.subscriptions = {}
+        self._subscriptions_lock = threading.Lock()
+
+        self.daemon_epoch = self.redis_client.get(self.settings['EPOCH_KEY'])
+        self._send_heartbeat()
+
+        self.heartbeat_thread = threading.Thread(
+            target=self._run_heartbeat, name='ticker-intent-heartbeat', daemon=True
+        )
+        self.heartbeat_thread.start()
+        logger.info(f"Ticker intent client started for worker {self.worker_id}")
+
+    def _push_intent(self, action, consumer_id, tokens=None, mode=None):
+        """Queue one intent for the daemon"""
+        intent = {
+            'action': action,
+            'worker_id': self.worker_id,
+            'consumer_id': consumer_id,
+            'tokens': tokens,
+            'mode': mode,
+        }
+        self.redis_client.rpush(self.settings['INTENT_QUEUE'], json.dumps(intent))
+
+    def subscribe(self, consumer_id, instrument_tokens, mode='full'):
+        """Ask the ticker daemon to stream tokens for a consumer"""
+        if not instrument_tokens:
+            logger.warning(f"No tokens provided for subscription by consumer {consumer_id}")
+            return False
+
+        try:
+            tokens = [int(token) for token in instrument_tokens]
+            self._push_intent('subscribe', consumer_id, tokens, mode)
+
+            with self._subscriptions_lock:
+                consumer_tokens = self.subscriptions.setdefault(consumer_id, {})
+                for token in tokens:
+                    consumer_tokens[token] = mode
+            return True
+
+        except Exception as e:
+            logger.error(f"Error sending subscribe intent: {e}")
+            return False
+
+    def unsubscribe(self, consumer_id, instrument_tokens=None):
+        """Tell the ticker daemon a consumer no longer needs tokens (all if None)"""
+        try:
+            tokens = None if instrument_tokens is None else [int(token) for token in instrument_tokens]
+            self._push_intent('unsubscribe', consumer_id, tokens)
+
+            with self._subscriptions_lock:
+                if tokens is None:
+                    self.subscriptions.pop(consumer_id, None)
+                else:
+                    consumer_tokens = self.subscriptions.get(consumer_id, {})
+                    for token in tokens:
+                        consumer_tokens.pop(token, None)
+                    if not consumer_tokens:
+                        self.subscriptions.pop(consumer_id, None)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error sending unsubscribe intent: {e}")
+            return False
+
+    def _send_heartbeat(self):
+        """Refresh this worker's liveness key; True when the key had to be recreated"""
+        key = f"{self.settings['WORKER_KEY_PREFIX']}{self.worker_id}"
+        ttl = self.settings['WORKER_TTL_SECONDS']
+        if self.redis_client.set(key, int(time.time()), ex=ttl, nx=True):
+            return True
+        self.redis_client.set(key, int(time.time()), ex=ttl)
+        return False
+
+    def _replay_subscriptions(self):
+        """Re-send every live subscription after a daemon restart or a missed heartbeat"""
+        with self._subscriptions_lock:
+            snapshot = {consumer_id: dict(tokens) for consumer_id, tokens in self.subscriptions.items()}
+
+        for consumer_id, consumer_tokens in snapshot.items():
+            tokens_by_mode = {}
+            for token, mode in consumer_tokens.items():
+                tokens_by_mode.setdefault(mode, []).append(token)
+            for mode, tokens in tokens_by_mode.items():
+                self._push_intent('subscribe', consumer_id, tokens, mode)
+
+        logger.info(f"Replayed subscriptions of {len(snapshot)} consumers to the ticker daemon")
+
+    def _run_heartbeat(self):
+        """Heartbeat thread: keep the worker alive and watch for daemon restarts"""
+        interval = max(self.settings['WORKER_TTL_SECONDS'] / 3, 1)
+        while True:
+            time.sleep(interval)
+            try:
+                expired = self._send_heartbeat()
+                if expired:
+                    logger.warning(f"Heartbeat of worker {self.worker_id} had expired, replaying subscriptions")
+
+                daemon_epoch = self.redis_client.get(self.settings['EPOCH_KEY'])
+                restarted = daemon_epoch and daemon_epoch != self.daemon_epoch
+                if restarted:
+                    self.daemon_epoch = daemon_epoch
+
+                if expired or restarted:
+                    self._replay_subscriptions()
+            except Exception as e:
+                logger.error(f"Error in ticker intent heartbeat: {e}")
+
+class TickerIntentListener:
+    """
+    Daemon side: applies queued intents to the KiteTickerManager, which holds
+    the authoritative per-consumer reference counts for every web worker.
+    Consumers are tracked as "<worker_id>/<consumer_id>" and dropped when
+    their worker's heartbeat key expires.
+    """
+
+    def __init__(self, ticker_manager):
+        self.settings = _get_ingest_settings()
+        self.redis_client = _connect_redis()
+        self.ticker_manager = ticker_manager
+
+        # worker_id -> {consumer key: tokens it holds} for consumers of that worker
+        self.worker_consumers = {}
+
+        self.stats = {
+            'intents_processed': 0,
+            'intent_errors': 0,
+            'workers_reaped': 0,
+        }
+
+    def announce(self):
+        """Publish a new daemon epoch so web workers replay their subscriptions"""
+        epoch = uuid.uuid4().hex
+        self.redis_client.set(self.settings['EPOCH_KEY'], epoch)
+        logger.info(f"Ticker daemon epoch {epoch}")
+        return epoch
+
+    def apply_intent(self, intent):
+        """Apply one subscribe or unsubscribe intent"""
+        worker_id = intent['worker_id']
+        consumer_key = f"{worker_id}/{intent['consumer_id']}"
+        tokens = intent.get('tokens')
+
+        if intent['action'] == 'subscribe':
+            consumers = self.worker_consumers.setdefault(worker_id, {})
+            consumers.setdefault(consumer_key, set()).update(int(token) for token in tokens or [])
+            return self.ticker_manager.subscribe(consumer_key, tokens, intent.get('mode') or 'full')
+
+        if intent['action'] == 'unsubscribe':
+            consumers = self.worker_consumers.get(worker_id)
+            if consumers and consumer_key in consumers:
+                # Forget the consumer once it holds no tokens
+                if tokens is not None:
+                    consumers[consumer_key].difference_update(int(token) for token in tokens)
+                if tokens is None or not consumers[consumer_key]:
+                    del consumers[consumer_key]
+                if not consumers:
+                    del self.worker_consumers[worker_id]
+            return self.ticker_manager.unsubscribe(consumer_key, tokens)
+
+        logger.warning(f"Unknown ticker intent action: {intent['action']}")
+        return False
+
+    def reap_dead_workers(self):
+        """Unsubscribe consumers of workers whose heartbeat has expired"""
+        for worker_id in list(self.worker_consumers.keys()):
+            if self.redis_client.exists(f"{self.settings['WORKER_KEY_PREFIX']}{worker_id}"):
+                continue
+
+            consumers = self.worker_consumers.pop(worker_id)
+            logger.warning(f"Worker {worker_id} stopped heartbeating, dropping {len(consumers)} consumers")
+            for consumer_key in consumers:
+                self.ticker_manager.unsubscribe(consumer_key)
+            self.stats['workers_reaped'] += 1
+
+    def run_once(self, timeout=1):
+        """Wait up to timeout seconds for one intent and apply it"""
+        item = self.redis_client.blpop(self.settings['INTENT_QUEUE'], timeout=timeout)
+        if item is None:
+            return False
+
+        try:
+            self.apply_intent(json.loads(item[1]))
+            self.stats['intents_processed'] += 1
+        except Exception as e:
+            self.stats['intent_errors'] += 1
+            logger.error(f"Error applying ticker intent {item[1]}: {e}")
+        return True
@@ -0,0 +1,174 @@
+# zerodhatrader/ticker_shard.py
+import logging
+import time
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Window over which per-shard throughput is measured
+THROUGHPUT_WINDOW_SECONDS = 10.0
+
+class TickerShard:
+    """
+    One KiteTicker connection owned by KiteTickerManager.
+
+    A shard streams the tokens the manager assigned to it and reports its
+    own health and throughput. Subscription calls are only sent while the
+    socket is open; on (re)connect the manager replays the shard's tokens in
+    the modes their subscribers need.
+
+    KiteTicker runs every connection on the one Twisted reactor of the
+    process, so all shards share a single network thread. Sharding lifts the
+    per-connection token cap and isolates socket failures; it does not add
+    parallelism for decoding ticks. on_ticks therefore only hands batches
+    off to other threads.
+    """
+
+    def __init__(self, shard_id, manager):
+        self.shard_id = shard_id
+        self.manager = manager
+
+        self.ticker = None
+        self.is_connected = False
+        self.last_connected = None
+
+        # Set when Kite gave up reconnecting; the shard takes no new tokens
+        self.failed = False
+
+        # Set while we close the socket ourselves so on_close is not a failure
+        self.closing = False
+
+        # Tokens currently assigned to this connection
+        self.tokens = set()
+
+        self.stats = {
+            'ticks_received': 0,
+            'tick_batches': 0,
+            'last_tick_at': None,
+            'connects': 0,
+            'disconnects': 0,
+            'errors': 0,
+            'reconnect_attempts': 0,
+            'failovers': 0,
+            'tokens_moved_out': 0,
+            'tokens_moved_in': 0,
+            'ticks_per_second': 0.0,
+        }
+        self._window_started = time.monotonic()
+        self._window_ticks = 0
+
+    def connect(self, api_key, access_token):
+        """
+        Open the KiteTicker connection in threaded mode. The first shard starts
+        the process-wide reactor thread; later shards join it.
+        """
+        self.ticker = self.manager.ticker_class(api_key, access_token)
+
+        self.ticker.on_ticks = self.on_ticks
+        self.ticker.on_connect = self.on_connect
+        self.ticker.on_close = self.on_close
+        self.ticker.on_error = self.on_error
+        self.ticker.on_reconnect = self.on_reconnect
+        self.ticker.on_noreconnect = self.on_noreconnect
+
+        self.failed = False
+        self.closing = False
+        self.ticker.connect(threaded=True)
+        logger.info(f"Ticker shard {self.shard_id} connecting")
+
+    def disconnect(self):
+        """Close the connection without triggering failover"""
+        if self.ticker:
+            self.closing = True
+            self.ticker.close()
+            self.ticker = None
+        self.is_connected = False
+
+    def is_available(self):
+        """Whether the shard can take tokens (connected or still connecting)"""
+        return self.ticker is not None and not self.failed
+
+    def subscribe(self, tokens):
+        """Subscribe tokens on the socket; replayed by on_connect otherwise"""
+        if tokens and self.is_connected:
+            self.ticker.subscribe(tokens)
+
+    def set_mode(self, mode, tokens):
+        """Set the streaming mode of tokens; replayed by on_connect otherwise"""
+        if tokens and self.is_connected:
+            self.ticker.set_mode(mode, tokens)
+
+    def unsubscribe(self, tokens):
+        """Unsubscribe tokens, or just forget them while the socket is down"""
+        if not tokens or not self.ticker:
+            return
+        if self.is_connected:
+            self.ticker.unsubscribe(tokens)
+        else:
+            # Keep Kite's own resubscribe-on-reconnect from bringing them back
+            for token in tokens:
+                self.ticker.subscribed_tokens.pop(token, None)
+
+    def get_stats(self):
+        """Health and throughput snapshot for this connection"""
+        stats = dict(self.stats)
+        stats['shard_id'] = self.shard_id
+        stats['is_connected'] = self.is_connected
+        stats['failed'] = self.failed
+        stats['last_connected'] = self.last_connected.isoformat() if self.last_connected else None
+        stats['token_count'] = len(self.tokens)
+        return stats
+
+    # KiteTicker callbacks
+    def on_ticks(self, ws, ticks):
+        """Count the batch and hand it to the manager's publish pipeline"""
+        if not ticks:
+            return
+
+        now = time.monotonic()
+        self.stats['ticks_received'] += len(ticks)
+        self.stats['tick_batches'] += 1
+        self.stats['last_tick_at'] = now
+        self._window_ticks += len(ticks)
+
+        elapsed = now - self._window_started
+        if elapsed >= THROUGHPUT_WINDOW_SECONDS:
+            self.stats['ticks_per_second'] = self._window_ticks / elapsed
+            self._window_started = now
+            self._window_ticks = 0
+
+        self.manager.on_ticks(ws, ticks)
+
+    def on_connect(self, ws, response):
+        """Callback when the shard connection is established"""
+        self.is_connected = True
+        self.last_connected = timezone.now()
+        self.stats['connects'] += 1
+        logger.info(f"Ticker shard {self.shard_id} connected: {response}")
+        self.manager.on_shard_connect(self)
+
+    def on_close(self, ws, code, reason):
+        """Callback when the shard connection is closed"""
+        self.is_connected = False
+        if self.closing:
+            return
+        self.stats['disconnects'] += 1
+        logger.warning(f"Ticker shard {self.shard_id} disconnected: {code} - {reason}")
+        self.manager.on_shard_close(self)
+
+    def on_error(self, ws, code, reason):
+        """Callback when the shard reports an error"""
+        self.stats['errors'] += 1
+        logger.error(f"Ticker shard {self.shard_id} error: {code} - {reason}")
+
+    def on_reconnect(self, ws, attempts_count):
+        """Callback on a reconnection attempt"""
+        self.stats['reconnect_attempts'] += 1
+        logger.info(f"Ticker shard {self.shard_id} reconnecting: attempt {attempts_count}")
+
+    def on_noreconnect(self, ws):
+        """Callback when Kite stops retrying; tokens move to other shards"""
+        self.is_connected = False
+        self.failed = True
+        logger.error(f"Ticker shard {self.shard_id} failed to reconnect")
+        self.manager.on_shard_failed(self)
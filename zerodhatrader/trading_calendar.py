@@ -0,0 +1,108 @@
+# zerodhatrader/trading_calendar.py
+import logging
+import threading
+import numpy as np
+from datetime import date
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# NSE equity derivatives trading holidays (weekday closures only). Update from
+# the exchange's holiday circular each December.
+NSE_HOLIDAYS = (
+    # 2024
+    '2024-01-22', '2024-01-26', '2024-03-08', '2024-03-25', '2024-03-29', '2024-04-11',
+    '2024-04-17', '2024-05-01', '2024-05-20', '2024-06-17', '2024-07-17', '2024-08-15',
+    '2024-10-02', '2024-11-01', '2024-11-15', '2024-11-20', '2024-12-25',
+    # 2025
+    '2025-02-26', '2025-03-14', '2025-03-31', '2025-04-10', '2025-04-14', '2025-04-18',
+    '2025-05-01', '2025-08-15', '2025-08-27', '2025-10-02', '2025-10-21', '2025-10-22',
+    '2025-11-05', '2025-12-25',
+    # 2026
+    '2026-01-15', '2026-01-26', '2026-03-03', '2026-03-26', '2026-03-31', '2026-04-03',
+    '2026-04-14', '2026-05-01', '2026-05-28', '2026-06-26', '2026-09-14', '2026-10-02',
+    '2026-10-20', '2026-11-10', '2026-11-24', '2026-12-25',
+)
+
+# Years with holiday data. Dates outside them count weekdays only (with a
+# warning) through np.busday_count instead of the precomputed array
+CALENDAR_START = date(int(min(NSE_HOLIDAYS)[:4]), 1, 1)
+CALENDAR_END = date(int(max(NSE_HOLIDAYS)[:4]), 12, 31)
+
+class TradingCalendar:
+    """
+    NSE trading days (Monday to Friday minus exchange holidays).
+
+    A cumulative count of trading days is precomputed for every calendar
+    date in [start, end], so the trading days between two dates is one
+    subtraction. Days to expiry are memoized per (today, expiry).
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """Get or create the shared NSE calendar"""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, holidays=NSE_HOLIDAYS, start=CALENDAR_START, end=CALENDAR_END):
+        self.holidays = np.array(sorted(holidays), dtype='datetime64[D]')
+        self.busdaycal = np.busdaycalendar(weekmask='1111100', holidays=self.holidays)
+
+        self.start = start
+        self.end = end
+        days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+
+        self._is_trading = np.is_busday(days, busdaycal=self.busdaycal)
+
+        # cumulative[i] = trading days in [start, start + i days)
+        self.cumulative = np.concatenate(([0], np.cumsum(self._is_trading)))
+
+        self._days_to_expiry = lru_cache(maxsize=8192)(self._compute_days_to_expiry)
+
+        # Years already warned about, so the warning is logged once per year
+        self._uncovered_years = set()
+
+    def _check_covered(self, *days):
+        """Warn once per year when a date has no holiday data"""
+        for day in days:
+            if not self.start <= day <= self.end and day.year not in self._uncovered_years:
+                self._uncovered_years.add(day.year)
+                logger.warning(f"No NSE holiday data for {day.year}; counting weekdays only as trading days")
+
+    def is_trading_day(self, day):
+        """Whether the exchange is open on day"""
+        if self.start <= day <= self.end:
+            return bool(self._is_trading[(day - self.start).days])
+        self._check_covered(day)
+        return bool(np.is_busday(np.datetime64(day, 'D'), busdaycal=self.busdaycal))
+
+    def previous_trading_day(self, day):
+        """day itself when the exchange is open, else the last trading day before it"""
+        self._check_covered(day)
+        rolled = np.busday_offset(np.datetime64(day, 'D'), 0, roll='backward', busdaycal=self.busdaycal)
+        return rolled.astype(object)
+
+    def trading_days_between(self, start, end):
+        """Trading days in [start, end), or minus those in [end, start) when end is earlier"""
+        if self.start <= start <= self.end and self.start <= end <= self.end:
+            return int(self.cumulative[(end - self.start).days] - self.cumulative[(start - self.start).days])
+        self._check_covered(start, end)
+        return int(np.busday_count(np.datetime64(start, 'D'), np.datetime64(end, 'D'), busdaycal=self.busdaycal))
+
+    def _compute_days_to_expiry(self, today, expiry):
+        if isinstance(expiry, str):
+            expiry = date.fromisoformat(expiry)
+        return max(self.trading_days_between(today, expiry), 1)
+
+    def days_to_expiry(self, expiry, today=None):
+        """
+        Trading days from today (inclusive) to expiry (exclusive), at least 1.
+        expiry may be a date or a 'YYYY-MM-DD' string.
+        """
+        return self._days_to_expiry(today or date.today(), expiry)
@@ -38,6 +38,9 @@ from django.contrib.sessions.models import Session
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from .calculations import OptionsStrategyManager
+from .snapshots import get_quote_snapshots
+from .instrument_sync import download_instruments_csv, sync_instruments_csv
+from .instrument_registry import InstrumentRegistry
 from decimal import Decimal
 import logging
 
@@ -111,30 +114,14 @@ class InstrumentsView(View):
         try:
             filter_type = request.GET.get('filter', None)
             
+            # Served from the in-process registry, no database queries
+            registry = InstrumentRegistry.get_instance()
             if filter_type == 'nifty':
-                instruments = Instrument.objects.filter(tradingsymbol__contains='NIFTY', segment='NFO-OPT')
+                instruments_list = [instr for instr in registry.get_options('NIFTY') if instr['segment'] == 'NFO-OPT']
             elif filter_type == 'banknifty':
-                instruments = Instrument.objects.filter(tradingsymbol__contains='BANKNIFTY', segment='NFO-OPT')
+                instruments_list = [instr for instr in registry.get_options('BANKNIFTY') if instr['segment'] == 'NFO-OPT']
             else:
-                instruments = Instrument.objects.all()
-                
-            # Convert to list of dicts for JSON response
-            instruments_list = []
-            for instr in instruments:
-                instruments_list.append({
-                    'instrument_token': instr.instrument_token,
-                    'exchange_token': instr.exchange_token,
-                    'tradingsymbol': instr.tradingsymbol,
-                    'name': instr.name,
-                    'last_price': float(instr.last_price) if instr.last_price else None,
-                    'expiry': instr.expiry.isoformat() if instr.expiry else None,
-                    'strike': float(instr.strike) if instr.strike else None,
-                    'tick_size': float(instr.tick_size) if instr.tick_size else None,
-                    'lot_size': instr.lot_size,
-                    'instrument_type': instr.instrument_type,
-                    'segment': instr.segment,
-                    'exchange': instr.exchange
-                })
+                instruments_list = registry.all()
             
             # Debug log the count
             print(f"Found {len(instruments_list)} instruments")
@@ -158,41 +145,15 @@ class InstrumentsView(View):
             if not kite:
                 return JsonResponse({'status': 'error', 'message': 'Not authenticated'})
                 
-            # Download all instruments
-            all_instruments = kite.instruments()
-            
-            # Clear existing instruments
-            Instrument.objects.all().delete()
-            
-            # Bulk create new instruments
-            instruments_to_create = []
-            for instr in all_instruments:
-                # Handle None values for expiry
-                expiry = None
-                if instr.get('expiry') and instr['expiry'] != '':
-                    expiry = instr['expiry']
-                    
-                instruments_to_create.append(Instrument(
-                    instrument_token=instr['instrument_token'],
-                    exchange_token=instr['exchange_token'],
-                    tradingsymbol=instr['tradingsymbol'],
-                    name=instr.get('name', ''),
-                    last_price=instr.get('last_price', 0),
-                    expiry=expiry,
-                    strike=instr.get('strike', 0),
-                    tick_size=instr.get('tick_size', 0),
-                    lot_size=instr.get('lot_size', 0),
-                    instrument_type=instr.get('instrument_type', ''),
-                    segment=instr.get('segment', ''),
-                    exchange=instr.get('exchange', '')
-                ))
-            
-            # Bulk create
-            Instrument.objects.bulk_create(instruments_to_create)
+            # Stream the CSV dump and apply only the differences, batch by batch
+            with download_instruments_csv(kite) as dump:
+                result = sync_instruments_csv(dump)
             
             return JsonResponse({
                 'status': 'success', 
-                'message': f'Successfully imported {len(instruments_to_create)} instruments'
+                'message': f'Successfully synced {result["total"]} instruments',
+                'count': result['total'],
+                'sync': result
             })
         except Exception as e:
             logger.error(f"Error downloading instruments: {e}")
@@ -204,9 +165,9 @@ class InstrumentsView(View):
             filter_type = request.GET.get('filter', None)
             
             if filter_type == 'nifty':
-                instruments = Instrument.objects.filter(tradingsymbol__contains='NIFTY', segment='NFO-OPT')
+                instruments = Instrument.objects.filter(underlying='NIFTY', segment='NFO-OPT')
             elif filter_type == 'banknifty':
-                instruments = Instrument.objects.filter(tradingsymbol__contains='BANKNIFTY', segment='NFO-OPT')
+                instruments = Instrument.objects.filter(underlying='BANKNIFTY', segment='NFO-OPT')
             else:
                 instruments = Instrument.objects.all()
                 
@@ -250,48 +211,15 @@ class InstrumentsView(View):
             if not kite:
                 return JsonResponse({'status': 'error', 'message': 'Not authenticated'})
                 
-            # Download all instruments
-            all_instruments = kite.instruments()
-            
-            # Clear existing instruments
-            Instrument.objects.all().delete()
-            
-            # Process and save instruments in batches
-            batch_size = 1000
-            total_count = 0
-            
-            for i in range(0, len(all_instruments), batch_size):
-                batch = all_instruments[i:i+batch_size]
-                instruments_to_create = []
-                
-                for instr in batch:
-                    # Handle None values for expiry
-                    expiry = None
-                    if instr.get('expiry') and instr['expiry'] != '':
-                        expiry = instr['expiry']
-                        
-                    instruments_to_create.append(Instrument(
-                        instrument_token=instr['instrument_token'],
-                        exchange_token=instr.get('exchange_token', 0),
-                        tradingsymbol=instr['tradingsymbol'],
-                        name=instr.get('name', ''),
-                        last_price=instr.get('last_price', 0),
-                        expiry=expiry,
-                        strike=instr.get('strike', 0),
-                        tick_size=instr.get('tick_size', 0),
-                        lot_size=instr.get('lot_size', 0),
-                        instrument_type=instr.get('instrument_type', ''),
-                        segment=instr.get('segment', ''),
-                        exchange=instr.get('exchange', '')
-                    ))
-                
-                Instrument.objects.bulk_create(instruments_to_create)
-                total_count += len(instruments_to_create)
+            # Stream the CSV dump and apply only the differences, batch by batch
+            with download_instruments_csv(kite) as dump:
+                result = sync_instruments_csv(dump)
             
             return JsonResponse({
                 'status': 'success', 
-                'message': f'Successfully imported {total_count} instruments',
-                'count': total_count
+                'message': f'Successfully synced {result["total"]} instruments',
+                'count': result['total'],
+                'sync': result
             })
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)})
@@ -587,14 +515,21 @@ class QuoteView(View):
             if not instruments or instruments[0] == '':
                 return JsonResponse({'status': 'error', 'message': 'No instruments provided'})
             
-            kite = get_kite_client()
-            if not kite:
-                return JsonResponse({'status': 'error', 'message': 'Not authenticated'})
-                
-            # Get quotes
-            quotes = kite.quote(instruments)
+            # Serve instrument tokens from the live tick cache while it is fresh,
+            # in the kite.quote() schema; LTP-only snapshots go to kite.quote()
+            quotes = get_quote_snapshots([instrument for instrument in instruments if instrument.isdigit()])
+            cached = list(quotes.keys())
+            
+            remaining = [instrument for instrument in instruments if instrument not in quotes]
+            if remaining:
+                kite = get_kite_client()
+                if not kite:
+                    return JsonResponse({'status': 'error', 'message': 'Not authenticated'})
+                    
+                # Get quotes
+                quotes.update(kite.quote(remaining))
             
-            return JsonResponse({'status': 'success', 'quotes': quotes})
+            return JsonResponse({'status': 'success', 'quotes': quotes, 'cached': cached})
         
         except Exception as e:
             logger.error(f"Error fetching quotes: {e}")
@@ -608,7 +543,7 @@ def get_nifty_options(request):
         
         # Base query for Nifty options
         query = {
-            'tradingsymbol__startswith': 'NIFTY',
+            'underlying': 'NIFTY',
             'segment': 'NFO-OPT'
         }
         
@@ -621,7 +556,7 @@ def get_nifty_options(request):
         
         # Get unique expiry dates for dropdown
         expiry_dates = Instrument.objects.filter(
-            tradingsymbol__startswith='NIFTY',
+            underlying='NIFTY',
             segment='NFO-OPT'
         ).values_list('expiry', flat=True).distinct().order_by('expiry')
         
@@ -641,7 +576,7 @@ def get_banknifty_options(request):
         
         # Base query for Bank Nifty options
         query = {
-            'tradingsymbol__startswith': 'BANKNIFTY',
+            'underlying': 'BANKNIFTY',
             'segment': 'NFO-OPT'
         }
         
@@ -654,7 +589,7 @@ def get_banknifty_options(request):
         
         # Get unique expiry dates for dropdown
         expiry_dates = Instrument.objects.filter(
-            tradingsymbol__startswith='BANKNIFTY',
+            underlying='BANKNIFTY',
             segment='NFO-OPT'
         ).values_list('expiry', flat=True).distinct().order_by('expiry')
         
@@ -783,52 +718,15 @@ def download_instruments(request):
         if not kite:
             return JsonResponse({'status': 'error', 'message': 'Not authenticated'})
             
-        # Download all instruments
-        all_instruments = kite.instruments()
-        print(f"Downloaded {len(all_instruments)} instruments from Kite API")
-        
-        # Clear existing instruments
-        Instrument.objects.all().delete()
-        print("Cleared existing instruments")
-        
-        # Process and save instruments
-        instruments_to_create = []
-        for instr in all_instruments:
-            # Handle expiry
-            expiry = None
-            if instr.get('expiry') and instr['expiry'] != '':
-                expiry = instr['expiry']
-                
-            instruments_to_create.append(Instrument(
-                instrument_token=instr['instrument_token'],
-                exchange_token=instr.get('exchange_token', 0),
-                tradingsymbol=instr['tradingsymbol'],
-                name=instr.get('name', ''),
-                last_price=instr.get('last_price', 0),
-                expiry=expiry,
-                strike=instr.get('strike', 0),
-                tick_size=instr.get('tick_size', 0),
-                lot_size=instr.get('lot_size', 0),
-                instrument_type=instr.get('instrument_type', ''),
-                segment=instr.get('segment', ''),
-                exchange=instr.get('exchange', '')
-            ))
-        
-        # Save to database in batches
-        batch_size = 1000
-        for i in range(0, len(instruments_to_create), batch_size):
-            batch = instruments_to_create[i:i+batch_size]
-            Instrument.objects.bulk_create(batch)
-            print(f"Saved batch {i//batch_size + 1}/{(len(instruments_to_create)-1)//batch_size + 1}")
-        
-        # Final count check
-        final_count = Instrument.objects.count()
-        print(f"Final count in database: {final_count}")
+        # Stream the CSV dump and apply only the differences, batch by batch
+        with download_instruments_csv(kite) as dump:
+            result = sync_instruments_csv(dump)
         
         return JsonResponse({
             'status': 'success',
-            'message': f'Successfully imported {final_count} instruments',
-            'count': final_count
+            'message': f'Successfully synced {result["total"]} instruments',
+            'count': result['total'],
+            'sync': result
         })
     except Exception as e:
         import traceback
@@ -843,9 +741,9 @@ def instruments_csv(request):
         filter_type = request.GET.get('filter', None)
         
         if filter_type == 'nifty':
-            instruments = Instrument.objects.filter(tradingsymbol__contains='NIFTY', segment='NFO-OPT')
+            instruments = Instrument.objects.filter(underlying='NIFTY', segment='NFO-OPT')
         elif filter_type == 'banknifty':
-            instruments = Instrument.objects.filter(tradingsymbol__contains='BANKNIFTY', segment='NFO-OPT')
+            instruments = Instrument.objects.filter(underlying='BANKNIFTY', segment='NFO-OPT')
         else:
             instruments = Instrument.objects.all()
             
@@ -1366,15 +1264,16 @@ def calculate_vertical_spread(request):
             # Add real-time market data if available
             try:
                 # Fetch current prices for the options
-                instruments = Instrument.objects.filter(
-                    tradingsymbol__contains=params['symbol'],
-                    strike__in=[params['long_strike'], params['short_strike']],
-                    expiry=params['expiry']
+                instruments = InstrumentRegistry.get_instance().get_options(
+                    params['symbol'],
+                    expiry=params['expiry'],
+                    strikes=[params['long_strike'], params['short_strike']]
                 )
                 
                 current_prices = {}
                 for instr in instruments:
-                    current_prices[float(instr.strike)] = float(instr.last_price or 0)
+                    if instr['segment'] == 'NFO-OPT':
+                        current_prices[instr['strike']] = instr['last_price'] or 0.0
                 
                 result['data']['current_prices'] = current_prices
             except Exception as e:
@@ -1859,15 +1758,16 @@ def calculate_vertical_spread(request):
         
         if result['status'] == 'success':
             try:
-                instruments = Instrument.objects.filter(
-                    tradingsymbol__contains=params['symbol'],
-                    strike__in=[params['long_strike'], params['short_strike']],
-                    expiry=params['expiry']
+                instruments = InstrumentRegistry.get_instance().get_options(
+                    params['symbol'],
+                    expiry=params['expiry'],
+                    strikes=[params['long_strike'], params['short_strike']]
                 )
                 
                 current_prices = {}
                 for instr in instruments:
-                    current_prices[float(instr.strike)] = float(instr.last_price or 0)
+                    if instr['segment'] == 'NFO-OPT':
+                        current_prices[instr['strike']] = instr['last_price'] or 0.0
                 
                 result['data']['current_prices'] = current_prices
             except Exception as e: